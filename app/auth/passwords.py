@@ -0,0 +1,48 @@
+# app/auth/passwords.py
+import hashlib
+import hmac
+import os
+from typing import Optional, Tuple
+from passlib.context import CryptContext
+
+# argon2id for new hashes; bcrypt is only kept so existing accounts can still log in
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    deprecated="auto",
+    argon2__type="ID",
+    argon2__time_cost=2,
+    argon2__memory_cost=19456,
+    argon2__parallelism=1,
+)
+
+# Server-side secret mixed into argon2 hashes so a leaked Users table alone is not enough
+PASSWORD_PEPPER = os.getenv("PASSWORD_PEPPER", "")
+
+
+def _pepper(password: str) -> str:
+    if not PASSWORD_PEPPER:
+        return password
+    return hmac.new(PASSWORD_PEPPER.encode(), password.encode(), hashlib.sha256).hexdigest()
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(_pepper(password))
+
+
+def verify_password(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """
+    Check a password against a stored hash.
+
+    Returns (ok, new_hash). new_hash is set when the stored hash is a legacy
+    bcrypt hash (created without the pepper) and should be replaced.
+    """
+    if pwd_context.identify(hashed) == "argon2":
+        return pwd_context.verify(_pepper(password), hashed), None
+
+    if not pwd_context.verify(password, hashed):
+        return False, None
+    return True, hash_password(password)
+
+
+# Verified against when the account does not exist so both paths cost the same
+DUMMY_PASSWORD_HASH = hash_password("dummy-password-for-timing")
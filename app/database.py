@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from urllib.parse import quote_plus
@@ -19,6 +20,13 @@ database = os.getenv("DB_NAME", "")
 driver = os.getenv("DB_DRIVER", "ODBC Driver 18 for SQL Server")
 trust_cert = os.getenv("DB_TRUST_CERT", "yes")
 
+# Pool sizing, shared by the sync and async engines. Sync handlers run on
+# Starlette's 40-thread pool, so the default 5 connections would queue them;
+# recycling stays under SQL Server / load balancer idle timeouts
+pool_size = int(os.getenv("DB_POOL_SIZE", 20))
+max_overflow = int(os.getenv("DB_MAX_OVERFLOW", 40))
+pool_recycle = int(os.getenv("DB_POOL_RECYCLE", 1800))
+
 if not password_raw:
     raise ValueError("❌ Missing DB_PASSWORD in .env file")
 
@@ -34,14 +42,34 @@ connection_string = (
 )
 
 DATABASE_URL = f"mssql+pyodbc:///?odbc_connect={quote_plus(connection_string)}"
+ASYNC_DATABASE_URL = f"mssql+aioodbc:///?odbc_connect={quote_plus(connection_string)}"
 
 # -------------------------
 # SQLAlchemy Engine & Session
 # -------------------------
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# fast_executemany: pyodbc sends executemany() parameter sets as one array
+# instead of a round trip per row (bulk inserts such as FAQ bulk_create)
+engine = create_engine(
+    DATABASE_URL,
+    pool_pre_ping=True,
+    pool_size=pool_size,
+    max_overflow=max_overflow,
+    pool_recycle=pool_recycle,
+    fast_executemany=True,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async engine for routers migrated to AsyncSession
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_pre_ping=True,
+    pool_size=pool_size,
+    max_overflow=max_overflow,
+    pool_recycle=pool_recycle,
+)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 # -------------------------
 # DB Dependency
 # -------------------------
@@ -51,3 +79,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
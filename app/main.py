@@ -1,32 +1,46 @@
 from fastapi import FastAPI, Request, HTTPException
 from app.routers import roles_features,search,auth,users,visitors,projects,news,logos,faq,statistics,products,survey,manual_guide,project_details,requests,admin,videos ,contact_us ,chatbot,metadata,dashboard,domains,admin_statistics
-from fastapi.staticfiles import StaticFiles
 from fastapi.exceptions import RequestValidationError
 from fastapi.requests import Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from app.utils.response import error_response
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from app.utils.paths import STATIC_ROOT
+from app.utils.static_files import CachedStaticFiles
+from app.utils.email import init_email_queue, close_email_queue, REDIS_URL
+from app.utils.query_guard import APP_ENV, install_query_guard
+from app.database import engine, async_engine
 # for caching on memory
 from fastapi_cache import FastAPICache
 from fastapi_cache.backends.inmemory import InMemoryBackend
 
 
     
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 
 
-# for cahcing on memory
+# Response cache: shared through Redis when REDIS_URL is set, else per worker in memory
 @app.on_event("startup")
 async def on_startup():
-    FastAPICache.init(InMemoryBackend(), prefix="fastapi-cache")
+    if REDIS_URL:
+        from redis import asyncio as aioredis
+        from fastapi_cache.backends.redis import RedisBackend
+        FastAPICache.init(RedisBackend(aioredis.from_url(REDIS_URL)), prefix="fastapi-cache")
+    else:
+        FastAPICache.init(InMemoryBackend(), prefix="fastapi-cache")
+    await init_email_queue()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await close_email_queue()
     
     
 # Ensure external static directory exists and mount it
 os.makedirs(STATIC_ROOT, exist_ok=True)
-app.mount("/static", StaticFiles(directory=STATIC_ROOT), name="static")
+app.mount("/static", CachedStaticFiles(directory=STATIC_ROOT), name="static")
 
 
 
@@ -64,10 +78,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# dev only: log repeated queries (N+1) per request
+if APP_ENV == "dev":
+    install_query_guard(app, engine, async_engine)
+
 # this for debugging 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    return JSONResponse(status_code=422, content={"detail": exc.errors(), "body": exc.body})
+    return ORJSONResponse(status_code=422, content={"detail": exc.errors(), "body": exc.body})
 
 
 
@@ -77,7 +95,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 async def http_exception_handler(request: Request, exc: HTTPException):
     # Customize error code as string of status code
     content = error_response(message_en=exc.detail, message_ar=exc.detail, error_code=str(exc.status_code))
-    return JSONResponse(status_code=exc.status_code, content=content)
+    return ORJSONResponse(status_code=exc.status_code, content=content)
 
 # Optional: catch validation errors (422) for uniform error response
 from fastapi.exceptions import RequestValidationError
@@ -92,7 +110,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
             "error": err["msg"]
         })
 
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=422,
         content=error_response("Validation Error", "422") | {"details": details}
     )
@@ -1,11 +1,15 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
 
 class ContactUs(Base):
     __tablename__ = "ContactUs"
-    __table_args__ = {"schema": "Website"}
+    __table_args__ = (
+        # Admin contact list pages newest first
+        Index("ix_contactus_createdat_desc", text("CreatedAt DESC"), text("ContactID DESC")),
+        {"schema": "Website"},
+    )
 
     ContactID = Column(Integer, primary_key=True, index=True)
     FirstName = Column(String(100), nullable=False)
@@ -19,7 +23,13 @@ class ContactUs(Base):
     PhoneNumber = Column(String(50), nullable=True)
     ReplyStatus = Column(Boolean, default=False)
 
-    Responses = relationship("ContactUsResponse", back_populates="Contact")
+    # lazy="raise": load explicitly (joinedload/selectinload) so N+1 access fails loudly
+    Responses = relationship(
+        "ContactUsResponse",
+        back_populates="Contact",
+        order_by="ContactUsResponse.CreatedAt",
+        lazy="raise",
+    )
 
 
 
@@ -1,11 +1,16 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Unicode, UnicodeText ,Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Unicode, UnicodeText ,Boolean, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
 
 class FAQ(Base):
     __tablename__ = "FAQ"
-    __table_args__ = {"schema": "Website"}
+    # Filtered indexes skip soft-deleted rows and match ORDER BY CreatedAt DESC
+    __table_args__ = (
+        Index("ix_faq_active_category", "CategoryID", text("CreatedAt DESC"), mssql_where=text("IsDelete = 0")),
+        Index("ix_faq_active_createdat", text("CreatedAt DESC"), mssql_where=text("IsDelete = 0")),
+        {"schema": "Website"},
+    )
 
     FAQID = Column(Integer, primary_key=True, index=True)
     QuestionEn = Column(Text, nullable=False)
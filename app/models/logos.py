@@ -1,11 +1,15 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Unicode, UnicodeText
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Unicode, UnicodeText, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
 
 class Logo(Base):
     __tablename__ = "Logos"
-    __table_args__ = {"schema": "Website"}
+    __table_args__ = (
+        # Public list: WHERE Category = ? ORDER BY CreatedAt DESC
+        Index("ix_logos_category_created", "Category", text("CreatedAt DESC")),
+        {"schema": "Website"},
+    )
 
     LogoID = Column(Integer, primary_key=True, index=True)
     NameEn = Column(String(150), nullable=False)
@@ -1,11 +1,15 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey ,UnicodeText  
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey ,UnicodeText, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
 
 class ManualGuide(Base):
     __tablename__ = "ManualGuide"
-    __table_args__ = {"schema": "Website"}
+    # Filtered index skips soft-deleted rows and matches ORDER BY ManualGuideID DESC
+    __table_args__ = (
+        Index("ix_manualguide_active", text("ManualGuideID DESC"), mssql_where=text("IsDelete = 0")),
+        {"schema": "Website"},
+    )
 
     ManualGuideID = Column(Integer, primary_key=True, index=True)
     NameEn = Column(String(150), nullable=False)
@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, String, Text, Date, Float, ForeignKey ,Boolean ,Unicode , UnicodeText
+from sqlalchemy import Column, Integer, String, Text, Date, Float, ForeignKey ,Boolean ,Unicode , UnicodeText, Index, text
 from sqlalchemy.orm import relationship
 from app.database import Base
 
 class DatasetInfo(Base):
     __tablename__ = "DatasetInfo"
-    __table_args__ = {"schema": "Metadata"}
+    __table_args__ = (
+        Index("ix_datasetinfo_active", "DatasetID", mssql_where=text("IsDeleted = 0")),
+        {"schema": "Metadata"},
+    )
 
     DatasetID = Column(Integer, primary_key=True, index=True)
     Name = Column(String(200), nullable=False)
@@ -21,11 +24,21 @@ class DatasetInfo(Base):
     IsDeleted = Column(Boolean, default=False)
 
     metadata_info = relationship("MetadataInfo", back_populates="dataset", cascade="all, delete")
+    # Non-deleted metadata only, for eager loading alongside the dataset
+    active_metadata = relationship(
+        "MetadataInfo",
+        primaryjoin="and_(DatasetInfo.DatasetID == MetadataInfo.DatasetID, MetadataInfo.IsDeleted == False)",
+        viewonly=True,
+    )
 
 
 class MetadataInfo(Base):
     __tablename__ = "MetadataInfo"
-    __table_args__ = {"schema": "Metadata"}
+    # Active metadata per dataset (active_metadata join, search)
+    __table_args__ = (
+        Index("ix_metadatainfo_dataset_active", "DatasetID", mssql_where=text("IsDeleted = 0")),
+        {"schema": "Metadata"},
+    )
 
     MetadataID = Column(Integer, primary_key=True, index=True)
     DatasetID = Column(Integer, ForeignKey("Metadata.DatasetInfo.DatasetID"))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime , Boolean , Unicode, UnicodeText
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime , Boolean , Unicode, UnicodeText, Index, text
 from app.database import Base
 from datetime import datetime
 from sqlalchemy.orm import relationship
@@ -9,7 +9,11 @@ from app.models import lookups
 
 class News(Base):
     __tablename__ = "News"
-    __table_args__ = {'schema': 'Website'} 
+    # Filtered index skips soft-deleted rows and matches ORDER BY CreatedAt DESC
+    __table_args__ = (
+        Index("ix_news_active_createdat", text("CreatedAt DESC"), mssql_where=text("Is_delete = 0")),
+        {'schema': 'Website'},
+    )
     
     NewsID = Column(Integer, primary_key=True, index=True)
     TitleEn = Column(String(255))
@@ -1,11 +1,15 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, UnicodeText, Boolean , Unicode
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, UnicodeText, Boolean , Unicode, Index, text
 from app.database import Base
 from datetime import datetime
 
 
 class Product(Base):
     __tablename__ = "ProductsDB"
-    __table_args__ = {"schema": "Website"}
+    # Filtered index skips soft-deleted rows and matches the public list's ORDER BY
+    __table_args__ = (
+        Index("ix_products_active_created", text("CreatedAt DESC"), text("ProductID DESC"), mssql_where=text("IsDeleted = 0")),
+        {"schema": "Website"},
+    )
 
     ProductID = Column(Integer, primary_key=True, index=True)
     NameEn = Column(String(150), nullable=False)
@@ -1,5 +1,5 @@
 import json
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Index, text
 from sqlalchemy.types import TypeDecorator, UnicodeText
 from app.database import Base
 from datetime import datetime
@@ -25,7 +25,11 @@ class JSONDict(TypeDecorator):
 
 class ProjectDetails(Base):
     __tablename__ = "ProjectDetails"
-    __table_args__ = {"schema": "Website"}
+    # Serves the per-project list (ordered by Year, Quarter)
+    __table_args__ = (
+        Index("ix_projectdetails_project_active", "ProjectID", "Year", "Quarter", mssql_where=text("IsDeleted = 0")),
+        {"schema": "Website"},
+    )
 
     ProjectDetailID = Column(Integer, primary_key=True, index=True)
     ProjectID = Column(Integer, ForeignKey("Website.Projects.ProjectID"), nullable=False)
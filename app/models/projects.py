@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime , Boolean, Unicode, UnicodeText
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime , Boolean, Unicode, UnicodeText, Index, select, text
 from app.database import Base
 from datetime import datetime
 from sqlalchemy.orm import relationship
@@ -8,7 +8,12 @@ from app.models import lookups
 
 class Projects(Base):
     __tablename__ = "Projects"
-    __table_args__ = {'schema': 'Website'}
+    # Filtered indexes skip soft-deleted rows; the second matches the list's ORDER BY
+    __table_args__ = (
+        Index("ix_projects_active", "ProjectID", mssql_where=text("IsDeleted = 0")),
+        Index("ix_projects_active_created", text("CreatedAt DESC"), text("ProjectID DESC"), mssql_where=text("IsDeleted = 0")),
+        {'schema': 'Website'},
+    )
 
     ProjectID = Column(Integer, primary_key=True, index=True)
     NameEn = Column(String(100))
@@ -23,4 +28,9 @@ class Projects(Base):
     CreatedByUserID = Column(Integer, ForeignKey("Website.Users.UserID"))
     UpdatedAt = Column(DateTime)
     UpdatedByUserID = Column(Integer, ForeignKey("Website.Users.UserID"))
-    IsDeleted = Column(Boolean)
\ No newline at end of file
+    IsDeleted = Column(Boolean, nullable=False, default=False, server_default=text("0"))
+
+
+def active_projects():
+    """Select of projects that are not soft-deleted."""
+    return select(Projects).where(Projects.IsDeleted == False)
@@ -1,5 +1,5 @@
 # models/request.py
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey,Unicode,UnicodeText,Table
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey,Unicode,UnicodeText,Table, Index, text
 from app.database import Base
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -8,7 +8,17 @@ from app.models.role_feature import Role
 
 class Request(Base):
     __tablename__ = "Requests"
-    __table_args__ = {"schema": "Requests"}
+    __table_args__ = (
+        # assigned_requests filters by role, list_requests pages by newest first
+        Index(
+            "ix_requests_assignedrole_created",
+            "AssignedRoleId", text("CreatedAt DESC"),
+            mssql_include=["RequestNumber", "StatusId", "CategoryId", "UserId", "Subject"],
+        ),
+        Index("ix_requests_created_id", text("CreatedAt DESC"), text("Id DESC")),
+        Index("ux_requests_requestnumber", "RequestNumber", unique=True, mssql_where=text("RequestNumber IS NOT NULL")),
+        {"schema": "Requests"},
+    )
 
     Id = Column(Integer, primary_key=True, index=True)
     UserId = Column(Integer, nullable=False)
@@ -45,6 +55,18 @@ class Request(Base):
 
     # relationships (optional, helpful)
     #replies = relationship("Reply", back_populates="request", cascade="all, delete-orphan")
+    user = relationship("User", primaryjoin="foreign(Request.UserId) == User.UserID", viewonly=True)
+    category = relationship("lookups.Category", foreign_keys=[CategoryId])
+    status = relationship("lookups.Status", foreign_keys=[StatusId])
+    complaint_screen = relationship("lookups.ComplaintScreen", foreign_keys=[ComplaintScreenId])
+    request_data = relationship("RequestData", uselist=False, viewonly=True)
+    request_information = relationship("lookups.RequestInformation", secondary="Requests.Request_RequestInformation", viewonly=True)
+    formats = relationship("lookups.Format", secondary="Requests.Request_Format", viewonly=True)
+    replies = relationship(
+        "Reply",
+        primaryjoin="and_(Request.Id == Reply.RequestId, Reply.IsDeleted == False)",
+        viewonly=True,
+    )
 
 
 
@@ -64,6 +86,8 @@ class RequestData(Base):
     RequirementsDetails = Column(Text, nullable=True)
     CreatedAt = Column(DateTime)
 
+    projection = relationship("lookups.Projection", foreign_keys=[ProjectionId])
+
 
 
 # Many-to-many relationships
@@ -86,7 +110,10 @@ Request_Format = Table(
 # The table for replay to the requests
 class Reply(Base):
     __tablename__ = "Reply"
-    __table_args__ = {"schema": "Requests"}
+    __table_args__ = (
+        Index("ix_reply_request_active", "RequestId", mssql_where=text("IsDeleted = 0")),
+        {"schema": "Requests"},
+    )
 
     Id = Column(Integer, primary_key=True, index=True)
     RequestId = Column(Integer, ForeignKey("Requests.Requests.Id"), nullable=False)
@@ -96,6 +123,7 @@ class Reply(Base):
     AttachmentPath = Column(String(500), nullable=True)
     CreatedAt = Column(DateTime, server_default=func.sysdatetime())
     CreatedByUserID = Column(Integer, nullable=True)
-    IsDeleted = Column(Boolean, default=False)
+    IsDeleted = Column(Boolean, nullable=False, default=False, server_default=text("0"))
 
     # request = relationship("Request", back_populates="replies")
+    responder = relationship("User", foreign_keys=[ResponderUserId])
@@ -1,43 +1,74 @@
 # routers/admin.py
-from fastapi import APIRouter, Depends, UploadFile, File, BackgroundTasks, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, UploadFile, File, BackgroundTasks, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, or_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
 from datetime import datetime
-import os
-import shutil
+from typing import Optional, Tuple
+import base64
+import binascii
 
-from app.database import get_db
-from app.auth.jwt_bearer import JWTBearer
+from app.database import get_async_db
+from app.utils.utils import get_current_user, require_admin, CurrentUser
 from app.utils.response import success_response, error_response
-from app.utils.email import send_reply_email, send_email_with_attachment, ADMIN_UPLOAD_DIR
+from app.utils.email import queue_email, ADMIN_UPLOAD_DIR
+from app.utils.uploads import store_upload, UploadTooLarge
 from app.models.users import User
-from app.models.lookups import Category, Status, ComplaintScreen, RequestInformation, Format, Projection
-from app.models.requests import Request, Reply, Request_RequestInformation, Request_Format
+from app.models.lookups import Category, Status
+from app.models.requests import Request, RequestData, Reply
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
 # ------------------------
-# Auth & Role Dependencies
+# Keyset pagination cursor helpers
 # ------------------------
-def get_current_user(payload: dict = Depends(JWTBearer()), db: Session = Depends(get_db)) -> User:
-    user = db.query(User).filter(User.UserID == payload["user_id"]).first()
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-    return user
+def _encode_cursor(created_at: datetime, request_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{request_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, request_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), int(request_id)
+    except (binascii.Error, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
 
-def require_admin(user: User = Depends(get_current_user)) -> User:
-    if user.RoleID != 1:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admins only")
-    return user
+# ------------------------
+# Shared projection for the admin request listings
+# ------------------------
+def _request_list_query():
+    # Core select: rows come back as plain mappings, no ORM hydration
+    return (
+        select(
+            Request.Id.label("id"),
+            Request.RequestNumber.label("number"),
+            Request.CreatedAt.label("created_at"),
+            Status.Name.label("status_name_en"),
+            Status.Name_Ar.label("status_name_ar"),
+            Category.Name.label("type_name_en"),
+            Category.Name_Ar.label("type_name_ar"),
+            User.Email.label("user_email"),
+            Request.Subject.label("subject"),
+            Request.Body.label("body"),
+            Request.AssignedRoleId.label("AssignedRoleId"),
+        )
+        .select_from(Request)
+        .outerjoin(Status, Request.StatusId == Status.Id)
+        .outerjoin(Category, Request.CategoryId == Category.Id)
+        .outerjoin(User, Request.UserId == User.UserID)
+    )
 
 # ------------------------
 # Assign role to request
 # ------------------------
 @router.post("/assign_request")
-def assign_requests(
+async def assign_requests(
     request_ids: list[int],  # List of request IDs to assign
     role_id: int,
-    db: Session = Depends(get_db),
-    admin: User = Depends(require_admin)
+    db: AsyncSession = Depends(get_async_db),
+    admin: CurrentUser = Depends(require_admin)
 ):
     if not request_ids:
         return error_response(
@@ -49,15 +80,17 @@ def assign_requests(
     assigned_requests = []
     failed_requests = []
 
+    result = await db.execute(select(Request).where(Request.Id.in_(request_ids)))
+    found = {req.Id: req for req in result.scalars()}
     for req_id in request_ids:
-        req = db.query(Request).filter(Request.Id == req_id).first()
+        req = found.get(req_id)
         if req:
             req.AssignedRoleId = role_id
             assigned_requests.append(req_id)
         else:
             failed_requests.append(req_id)
 
-    db.commit()
+    await db.commit()
 
     return success_response(
         message_en="Requests assigned successfully",
@@ -73,45 +106,47 @@ def assign_requests(
 # List all requests (Admin only)
 # ------------------------
 @router.get("/requests")
-def list_requests(
-    page: int = Query(1, ge=1, description="Page number"),
+async def list_requests(
+    page: int = Query(1, ge=1, description="Page number (ignored when cursor is given)"),
     limit: int = Query(25, ge=1, le=200, description="Page size"),
-    db: Session = Depends(get_db),
-    admin: User = Depends(require_admin)
+    cursor: Optional[str] = Query(None, description="Opaque cursor returned as next_cursor"),
+    db: AsyncSession = Depends(get_async_db),
+    admin: CurrentUser = Depends(require_admin)
 ):
-    skip = (page - 1) * limit
-    base_query = (
-        db.query(Request, Status, Category, User)
-        .join(Status, Request.StatusId == Status.Id, isouter=True)
-        .join(Category, Request.CategoryId == Category.Id, isouter=True)
-        .join(User, Request.UserId == User.UserID, isouter=True)
-        .order_by(Request.CreatedAt.desc())
-    )
+    base_query = _request_list_query().order_by(Request.CreatedAt.desc(), Request.Id.desc())
+
+    total_requests = None
+    if cursor:
+        try:
+            last_created, last_id = _decode_cursor(cursor)
+        except ValueError:
+            return error_response(
+                message_en="Invalid cursor",
+                message_ar="المؤشر غير صالح",
+                error_code="INVALID_CURSOR"
+            )
+        # SQL Server has no row-value comparison, so expand (CreatedAt, Id) < (x, y)
+        stmt = base_query.where(or_(
+            Request.CreatedAt < last_created,
+            and_(Request.CreatedAt == last_created, Request.Id < last_id)
+        ))
+    else:
+        stmt = base_query.offset((page - 1) * limit)
+        total_requests = await db.scalar(select(func.count()).select_from(Request))
 
-    paged_requests = base_query.offset(skip).limit(limit).all()
-    total_requests = db.query(Request).count()
-
-    results = []
-    for req, status, category, user in paged_requests:
-        results.append({
-            "id": req.Id,
-            "number": req.RequestNumber,
-            "created_at": req.CreatedAt,
-            "status_name_en": status.Name if status else None,
-            "status_name_ar": status.Name_Ar if status else None,
-            "type_name_en": category.Name if category else None,
-            "type_name_ar": category.Name_Ar if category else None,
-            "user_email": user.Email if user else None,
-            "subject": req.Subject,
-            "body": req.Body,
-            "AssignedRoleId": req.AssignedRoleId
-        })
+    results = [dict(row) for row in (await db.execute(stmt.limit(limit))).mappings()]
+
+    next_cursor = None
+    if len(results) == limit:
+        last_req = results[-1]
+        next_cursor = _encode_cursor(last_req["created_at"], last_req["id"])
 
     payload = {
-        "page": page,
+        "page": None if cursor else page,
         "limit": limit,
         "count": len(results),
         "total": total_requests,
+        "next_cursor": next_cursor,
         "requests": results
     }
 
@@ -125,13 +160,27 @@ def list_requests(
 # Get one request details (Admin only)
 # ------------------------
 @router.get("/request-details/")
-def get_request_details(
+async def get_request_details(
     request_id: int,
-    db: Session = Depends(get_db),
-    admin: User = Depends(require_admin)
+    db: AsyncSession = Depends(get_async_db),
+    admin: CurrentUser = Depends(require_admin)
 ):
-    # Fetch the main request
-    req = db.query(Request).filter(Request.Id == request_id).first()
+    # Fetch the main request with all related objects in one go
+    stmt = (
+        select(Request)
+        .options(
+            joinedload(Request.user),
+            joinedload(Request.category),
+            joinedload(Request.status),
+            joinedload(Request.complaint_screen),
+            selectinload(Request.request_information),
+            selectinload(Request.formats),
+            selectinload(Request.replies).joinedload(Reply.responder),
+            selectinload(Request.request_data).joinedload(RequestData.projection),
+        )
+        .where(Request.Id == request_id)
+    )
+    req = (await db.execute(stmt)).unique().scalar_one_or_none()
     if not req:
         return error_response(
             message_en="Request not found",
@@ -139,38 +188,19 @@ def get_request_details(
             error_code="REQUEST_NOT_FOUND"
         )
 
-    # Fetch related objects
-    user = db.query(User).filter(User.UserID == req.UserId).first() if req.UserId else None
-    category = db.query(Category).filter(Category.Id == req.CategoryId).first() if req.CategoryId else None
-    status = db.query(Status).filter(Status.Id == req.StatusId).first() if req.StatusId else None
-    complaint_screen = (
-        db.query(ComplaintScreen).filter(ComplaintScreen.Id == req.ComplaintScreenId).first()
-        if req.ComplaintScreenId else None
-    )
-
-    request_info = (
-        db.query(RequestInformation)
-        .join(Request_RequestInformation, Request_RequestInformation.c.RequestInformationId == RequestInformation.Id)
-        .filter(Request_RequestInformation.c.RequestId == req.Id)
-        .all()
-    )
-
-    formats = (
-        db.query(Format)
-        .join(Request_Format, Request_Format.c.FormatId == Format.Id)
-        .filter(Request_Format.c.RequestId == req.Id)
-        .all()
-    )
-
-    replies = db.query(Reply).filter(Reply.RequestId == req.Id, Reply.IsDeleted == False).all()
+    user = req.user
+    category = req.category
+    status = req.status
+    complaint_screen = req.complaint_screen
+    request_info = req.request_information
+    formats = req.formats
 
     # RequestData details (if applicable)
     request_data_details = {}
-    if category and category.Id == 8:  # RequestData
-        from app.models.requests import RequestData
-        rd = db.query(RequestData).filter(RequestData.RequestId == req.Id).first()
+    if req.CategoryId == 8:  # RequestData
+        rd = req.request_data
         if rd:
-            projection = db.query(Projection).filter(Projection.Id == rd.ProjectionId).first() if rd.ProjectionId else None
+            projection = rd.projection
             request_data_details = {
                 "prospective_name": rd.ProspectiveName,
                 "coordinates": {
@@ -187,8 +217,8 @@ def get_request_details(
 
     # Build replies with responder info
     replies_data = []
-    for reply in replies:
-        responder = db.query(User).filter(User.UserID == reply.ResponderUserId).first() if reply.ResponderUserId else None
+    for reply in req.replies:
+        responder = reply.responder
         replies_data.append({
             "id": reply.Id,
             "subject": reply.Subject,
@@ -238,33 +268,12 @@ def get_request_details(
 # List requests assigned to current admin role
 # ------------------------
 @router.get("/assigned_requests")
-def assigned_requests(
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def assigned_requests(
+    user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    requests = (
-        db.query(Request, Status, Category, User)
-        .filter(Request.AssignedRoleId == user.RoleID)
-        .join(Status, Request.StatusId == Status.Id, isouter=True)
-        .join(Category, Request.CategoryId == Category.Id, isouter=True)
-        .join(User, Request.UserId == User.UserID, isouter=True)
-        .all()
-    )
-
-    results = []
-    for req, status, category, user in requests:
-        results.append({
-            "id": req.Id,
-            "number": req.RequestNumber,
-            "created_at": req.CreatedAt,
-            "status_name_en": status.Name if status else None,
-            "status_name_ar": status.Name_Ar if status else None,
-            "type_name_en": category.Name if category else None,
-            "type_name_ar": category.Name_Ar if category else None,
-            "user_email": user.Email if user else None,
-            "subject": req.Subject,
-            "body": req.Body
-        })
+    stmt = _request_list_query().where(Request.AssignedRoleId == user.RoleID)
+    results = [dict(row) for row in (await db.execute(stmt)).mappings()]
 
     return success_response(
         message_en="Assigned requests fetched successfully",
@@ -276,17 +285,20 @@ def assigned_requests(
 # Admin reply to a request (with optional attachment)
 # ------------------------
 @router.post("/reply")
-def admin_reply(
+async def admin_reply(
     request_id: int,
     status_id: int,  
     subject: str = None,
     body: str = None,
     attachment: UploadFile = File(None),
     background_tasks: BackgroundTasks = None,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    user: CurrentUser = Depends(get_current_user)
 ):
-    req = db.query(Request).filter(Request.Id == request_id).first()
+    result = await db.execute(
+        select(Request).options(joinedload(Request.user)).where(Request.Id == request_id)
+    )
+    req = result.scalar_one_or_none()
     if not req:
         return error_response(
             message_en="Request not found",
@@ -294,13 +306,19 @@ def admin_reply(
             error_code="REQUEST_NOT_FOUND"
         )
 
+    now = datetime.utcnow()
     attachment_path = None
     if attachment:
-        orig_name = os.path.basename(attachment.filename)
-        filename = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{orig_name.replace(' ', '_')}"
-        attachment_path = os.path.join(ADMIN_UPLOAD_DIR, filename)
-        with open(attachment_path, "wb") as buffer:
-            shutil.copyfileobj(attachment.file, buffer)
+        try:
+            filename = await run_in_threadpool(
+                store_upload, attachment.file, ADMIN_UPLOAD_DIR, attachment.filename
+            )
+        except UploadTooLarge:
+            return error_response(
+                message_en="Attachment is too large",
+                message_ar="حجم المرفق كبير جداً",
+                error_code="FILE_TOO_LARGE"
+            )
         attachment_path = f"requests/reply/{filename}"   
 
     new_reply = Reply(
@@ -309,38 +327,37 @@ def admin_reply(
         Body=body,
         AttachmentPath=attachment_path,
         ResponderUserId=user.UserID,
-        CreatedAt=datetime.utcnow(),
+        CreatedAt=now,
         CreatedByUserID=user.UserID
     )
+
     db.add(new_reply)
     req.StatusId = status_id
-    req.UpdatedAt = datetime.utcnow()
+    req.UpdatedAt = now
     req.UpdatedByUserID = user.UserID
-    db.commit()
-    db.refresh(new_reply)
-    db.refresh(req)
+    await db.commit()  # expire_on_commit=False, so new_reply.Id and req stay loaded
 
-    request_owner = db.query(User).filter(User.UserID == req.UserId).first()
-    if not request_owner or not request_owner.Email:
+    owner = req.user
+    user_email = owner.Email if owner else None
+    if not user_email:
         return error_response(
             message_en="Request owner email not found",
             message_ar="بريد صاحب الطلب غير موجود",
             error_code="USER_EMAIL_NOT_FOUND"
         )
 
-    user_email = request_owner.Email
     email_subject = f"NGD - Response to your request {req.RequestNumber}"
     email_body = f"""
-    <h4>Dear {request_owner.FirstName},</h4>
+    <h4>Dear {owner.FirstName},</h4>
     <p>Your request <b>{req.RequestNumber}</b> has received a reply:</p>
     <p>{body or 'No message provided'}</p>
     <p>Thank you, NGD Team</p>
     """
 
     if attachment_path:
-        background_tasks.add_task(send_email_with_attachment, email_subject, email_body, user_email, attachment_path)
+        background_tasks.add_task(queue_email, "send_email_with_attachment", email_subject, email_body, user_email, attachment_path)
     else:
-        background_tasks.add_task(send_reply_email, email_subject, email_body, user_email)
+        background_tasks.add_task(queue_email, "send_email", email_subject, email_body, user_email)
 
     return success_response(
         message_en="Reply sent successfully",
@@ -102,13 +102,13 @@ def all_statistics(db: Session = Depends(get_db)):
     # 3️⃣ NEWS STATISTICS
     # -------------------------------------------------------
     total_news = db.query(func.count(News.NewsID)) \
-        .filter(News.Is_delete != True).scalar() or 0
+        .filter(News.Is_delete == False).scalar() or 0
 
     total_news_deleted = db.query(func.count(News.NewsID)) \
         .filter(News.Is_delete == True).scalar() or 0
 
     total_slides = db.query(func.count(News.NewsID)) \
-        .filter(News.Is_slide == True, News.Is_delete != True).scalar() or 0
+        .filter(News.Is_slide == True, News.Is_delete == False).scalar() or 0
 
     total_reads = db.query(func.sum(News.Read_count)).scalar() or 0
 
@@ -123,7 +123,7 @@ def all_statistics(db: Session = Depends(get_db)):
     # 4️⃣ PRODUCTS STATISTICS
     # -------------------------------------------------------
     total_products = db.query(func.count(Product.ProductID)) \
-        .filter(Product.IsDeleted != True).scalar() or 0
+        .filter(Product.IsDeleted == False).scalar() or 0
 
     total_products_deleted = db.query(func.count(Product.ProductID)) \
         .filter(Product.IsDeleted == True).scalar() or 0
@@ -151,7 +151,7 @@ def all_statistics(db: Session = Depends(get_db)):
     # -------------------------------------------------------
 
     # Total requests
-    total_requests = db.query(func.count(Request.Id)).filter(Request.IsDeleted != True).scalar() or 0
+    total_requests = db.query(func.count(Request.Id)).filter(Request.IsDeleted == False).scalar() or 0
     total_requests_deleted = db.query(func.count(Request.Id)).filter(Request.IsDeleted == True).scalar() or 0
 
     # Requests by Status with names
@@ -162,7 +162,7 @@ def all_statistics(db: Session = Depends(get_db)):
             func.count(Request.Id).label("total")
         )
         .join(Request, Request.StatusId == Status.Id)
-        .filter(Request.IsDeleted != True)
+        .filter(Request.IsDeleted == False)
         .group_by(Status.Id, Status.Name)
         .all()
     )
@@ -191,14 +191,14 @@ def all_statistics(db: Session = Depends(get_db)):
             ).label("total_not_responded")
         )
         .outerjoin(Request, Request.CategoryId == Category.Id)
-        .outerjoin(Reply, (Reply.RequestId == Request.Id) & (Reply.IsDeleted != True))
-        .filter(Request.IsDeleted != True)
+        .outerjoin(Reply, (Reply.RequestId == Request.Id) & (Reply.IsDeleted == False))
+        .filter(Request.IsDeleted == False)
         .group_by(Category.Id, Category.Name)
         .all()
     )
     # Total requests with replies (global)
     total_replied_requests = db.query(func.count(func.distinct(Reply.RequestId))) \
-        .filter(Reply.IsDeleted != True).scalar() or 0
+        .filter(Reply.IsDeleted == False).scalar() or 0
 
     requests_data = {
         "total_requests": total_requests,
@@ -225,17 +225,17 @@ def all_statistics(db: Session = Depends(get_db)):
     # 6️⃣ SURVEY STATISTICS
     # -------------------------------------------------------
     total_questions = db.query(func.count(UsersFeedbackQuestion.Id)) \
-        .filter(UsersFeedbackQuestion.IsDeleted != True).scalar() or 0
+        .filter(UsersFeedbackQuestion.IsDeleted == False).scalar() or 0
 
     total_answers = db.query(func.count(UsersFeedbackAnswer.Id)) \
-        .filter(UsersFeedbackAnswer.IsDeleted != True).scalar() or 0
+        .filter(UsersFeedbackAnswer.IsDeleted == False).scalar() or 0
 
     answers_per_question = (
         db.query(
             UsersFeedbackAnswer.QuestionId,
             func.count(UsersFeedbackAnswer.Id)
         )
-        .filter(UsersFeedbackAnswer.IsDeleted != True)
+        .filter(UsersFeedbackAnswer.IsDeleted == False)
         .group_by(UsersFeedbackAnswer.QuestionId)
         .all()
     )
@@ -330,8 +330,8 @@ def timeline_statistics(db: Session = Depends(get_db)):
         "users": build_timeline(db.query(User), User.CreatedAt),
         "visitors": build_timeline(db.query(Visitor), Visitor.VisitAt),
         "contact": build_timeline(db.query(ContactUs), ContactUs.CreatedAt),
-        "requests": build_timeline(db.query(Request).filter(Request.IsDeleted != True), Request.CreatedAt),
-        "survey_answers": build_timeline(db.query(UsersFeedbackAnswer).filter(UsersFeedbackAnswer.IsDeleted != True), UsersFeedbackAnswer.CreatedAt),
+        "requests": build_timeline(db.query(Request).filter(Request.IsDeleted == False), Request.CreatedAt),
+        "survey_answers": build_timeline(db.query(UsersFeedbackAnswer).filter(UsersFeedbackAnswer.IsDeleted == False), UsersFeedbackAnswer.CreatedAt),
         "votes": build_timeline(db.query(Vote), Vote.CreatedAt),
     }
 
@@ -1,22 +1,26 @@
 # app/routers/auth.py
 from fastapi import APIRouter, Depends, Request, BackgroundTasks
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from passlib.hash import bcrypt
+from fastapi.concurrency import run_in_threadpool
+from app.auth.passwords import hash_password, verify_password, DUMMY_PASSWORD_HASH
 from app.models.users import User, Domain
 from app.schemas.users import UserCreate, UserLogin
 from app.auth.jwt_handler import create_access_token
 from app.auth.jwt_bearer import ALGORITHM, SECRET_KEY
 from app.utils.response import success_response, error_response
+from app.settings import get_settings, public_base_url
 from app.database import get_db
-from app.utils.email import send_email, send_domain_refused_email
+from app.utils.email import queue_email
 from app.auth.tokens import create_verification_token, verify_verification_token
+from app.utils.request_lookups import invalidate_request_lookups
 import jwt
 from app.models.lookups import  UserTitle, OrganizationType, Country, City
 from datetime import datetime
-from app.utils.utils import get_optional_user, extract_email_domain
+from app.utils.utils import get_optional_user, extract_email_domain, require_admin, CurrentUser
 from app.models.role_feature import Role
-import os
+from cachetools import TTLCache
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -25,7 +29,82 @@ load_dotenv()
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
 #load the base URL for the front end application
-FRONTEND_BASE_URL = os.getenv("FRONTEND_BASE_URL")
+FRONTEND_BASE_URL = get_settings().FRONTEND_BASE_URL
+
+
+# Registration lookups are reference data, so keep the built payload in memory
+_LOOKUPS_CACHE = TTLCache(maxsize=1, ttl=300)
+_LOOKUPS_LOCK = threading.Lock()
+
+# Domain accept/refuse rules checked on every signup, refreshed every minute
+_DOMAIN_CACHE = TTLCache(maxsize=1, ttl=60)
+
+
+def _build_registration_lookups(db: Session) -> dict:
+    # Example: Fetch only roles allowed for public registration
+    roles = db.query(Role).filter(Role.RoleID != 1)
+    UserTitles = db.query(UserTitle).all()
+    OrganizationTypes = db.query(OrganizationType).all()
+    # Exclude Geom column (geometry type) which pyodbc doesn't support
+    Countries = db.query(
+        Country.OBJECTID.label("id"),
+        Country.CountryCode.label("code"),
+        Country.CountryName.label("name"),
+        Country.CountryNameAr.label("name_ar")
+
+    ).all()
+
+    roles_data = [
+        {"role_id": role.RoleID, "NameEn": role.NameEn , "NameAr": role.NameAr}
+        for role in roles
+    ]
+
+    # You can add other lookup sets later, e.g.:
+    titles =  [{"id": title.Id, "title": title.Title} for title in UserTitles]
+    organizations =  [{"id": org.OrganizationTypeID, "NameEn": org.NameEn,"NameAr":org.NameAr} for org in OrganizationTypes]
+    # Access labeled columns by attribute name
+    countries = [{"id": country.id, "NameEn": country.name, "NameAr": country.name_ar, "CountryCode": country.code} for country in Countries]
+    # departments = [{"id": 1, "name": "IT"}, {"id": 2, "name": "HR"}]
+
+    domains = db.query(Domain).order_by(Domain.Type.asc(), Domain.Domain.asc()).all()
+
+    return {
+        "roles": roles_data,
+        "titles": titles,
+        "Organizations": organizations,
+        "countries": countries,
+        "domains": [
+            {
+                "id": domain.Id,
+                "domain": domain.Domain,
+                "type": domain.Type
+            }
+            for domain in domains
+        ],
+        # "departments": departments,
+    }
+
+
+def _domain_types(db: Session) -> dict:
+    """
+    Return {domain: type} for every configured email domain.
+    """
+    with _LOOKUPS_LOCK:
+        domains = _DOMAIN_CACHE.get("domains")
+        if domains is None:
+            rows = db.query(Domain.Domain, Domain.Type).all()
+            domains = {name.lower(): domain_type for name, domain_type in rows}
+            _DOMAIN_CACHE["domains"] = domains
+    return domains
+
+
+def invalidate_registration_lookups():
+    """
+    Drop the cached registration lookups and domain rules so the next call reloads them.
+    """
+    with _LOOKUPS_LOCK:
+        _LOOKUPS_CACHE.clear()
+        _DOMAIN_CACHE.clear()
 
 
 # ✅ Lookups endpoint for user registration
@@ -36,51 +115,11 @@ def get_registration_lookups(db: Session = Depends(get_db)):
     such as available roles or other dropdowns.
     """
     try:
-        # Example: Fetch only roles allowed for public registration
-        roles = db.query(Role).filter(Role.RoleID != 1)
-        UserTitles = db.query(UserTitle).all()
-        OrganizationTypes = db.query(OrganizationType).all()
-        # Exclude Geom column (geometry type) which pyodbc doesn't support
-        Countries = db.query(
-            Country.OBJECTID.label("id"),
-            Country.CountryCode.label("code"),
-            Country.CountryName.label("name"),
-            Country.CountryNameAr.label("name_ar")
-
-        ).all()
-        Cities = db.query(City).all()
-
-        roles_data = [
-            {"role_id": role.RoleID, "NameEn": role.NameEn , "NameAr": role.NameAr}
-            for role in roles
-        ]
-
-        # You can add other lookup sets later, e.g.:
-        titles =  [{"id": title.Id, "title": title.Title} for title in UserTitles]
-        organizations =  [{"id": org.OrganizationTypeID, "NameEn": org.NameEn,"NameAr":org.NameAr} for org in OrganizationTypes]
-        # Access labeled columns by attribute name
-        countries = [{"id": country.id, "NameEn": country.name, "NameAr": country.name_ar, "CountryCode": country.code} for country in Countries]
-        # cities = [{"id": city.CityID, "NameEn": city.NameEn,"NameAr":city.NameAr} for city in Cities]
-        # departments = [{"id": 1, "name": "IT"}, {"id": 2, "name": "HR"}]
-
-        domains = db.query(Domain).order_by(Domain.Type.asc(), Domain.Domain.asc()).all()
-
-        lookups = {
-            "roles": roles_data,
-            "titles": titles,
-            "Organizations": organizations,
-            "countries": countries,
-            # "cities": cities,
-            "domains": [
-                {
-                    "id": domain.Id,
-                    "domain": domain.Domain,
-                    "type": domain.Type
-                }
-                for domain in domains
-            ],
-            # "departments": departments,
-        }
+        with _LOOKUPS_LOCK:
+            lookups = _LOOKUPS_CACHE.get("lookups")
+            if lookups is None:
+                lookups = _build_registration_lookups(db)
+                _LOOKUPS_CACHE["lookups"] = lookups
 
         return success_response("Lookups loaded successfully", lookups)
 
@@ -88,6 +127,17 @@ def get_registration_lookups(db: Session = Depends(get_db)):
         return error_response(f"Error fetching lookup data: {str(e)}", "LOOKUP_ERROR")
 
 
+# Admin hook to refresh the cached registration and request lookups after editing lookup tables
+@router.post("/lookups/invalidate")
+def invalidate_lookups(admin: CurrentUser = Depends(require_admin)):
+    invalidate_registration_lookups()
+    invalidate_request_lookups()
+    return success_response(
+        message_en="Lookups cache cleared",
+        message_ar="تم مسح ذاكرة القوائم المؤقتة"
+    )
+
+
 # make a new endpoint to return all cities related to a country
 @router.get("/lookups/cities")
 def get_cities(country_id: int = None, db: Session = Depends(get_db)):
@@ -146,24 +196,20 @@ def register(
             error_code="EMAIL_EXISTS")
 
     # Hash password
-    hashed_password = bcrypt.hash(user.Password)
+    hashed_password = hash_password(user.Password)
 
     email_domain = extract_email_domain(user.Email)
     auto_approve = False
     if email_domain:
-        domain_record = (
-            db.query(Domain)
-            .filter(func.lower(Domain.Domain) == email_domain)
-            .first()
-        )
-        if domain_record and domain_record.Type == "refused":
-            background_tasks.add_task(send_domain_refused_email, user.Email, email_domain)
+        domain_type = _domain_types(db).get(email_domain)
+        if domain_type == "refused":
+            background_tasks.add_task(queue_email, "send_domain_refused_email", user.Email, email_domain)
             return error_response(
             message_en="This email domain is not allowed. Please use your company email.",
             message_ar= "هذا البريد غير مسموح له بالتسجيل , برجاء التسجيل ببريد شركة",
             error_code="DOMAIN_REFUSED")
              
-        if domain_record and domain_record.Type == "accept":
+        if domain_type == "accept":
             auto_approve = True
 
     # Create new user object
@@ -214,7 +260,7 @@ def register(
     """
 
     # Send verification email in background
-    background_tasks.add_task(send_email, "Verify your NGD account", email_body, user.Email)
+    background_tasks.add_task(queue_email, "send_email", "Verify your NGD account", email_body, user.Email)
 
     return success_response(
     message_en="Registration successful. Please verify your email.",
@@ -237,24 +283,26 @@ def verify_email(token: str, db: Session = Depends(get_db)):
         error_code="TOKEN_INVALID"
     )
 
-    user = db.query(User).filter(User.Email == email).first()
-    if not user:
-        return error_response(
-        message_en="User not found",
-        message_ar="هذا المستخدم غير موجود",
-        error_code="USER_NOT_FOUND"
+    # One UPDATE on the happy path; only look the user up to explain a miss
+    updated = (
+        db.query(User)
+        .filter(User.Email == email, or_(User.EmailVerified == False, User.EmailVerified.is_(None)))
+        .update({User.EmailVerified: True}, synchronize_session=False)
     )
+    db.commit()
 
-    if user.EmailVerified:
+    if not updated:
+        if not db.query(User.UserID).filter(User.Email == email).first():
+            return error_response(
+            message_en="User not found",
+            message_ar="هذا المستخدم غير موجود",
+            error_code="USER_NOT_FOUND"
+        )
         return error_response(
         message_en="Email already verified",
         message_ar="هذا البريد تم التحقق منه مسبقاً",
         error_code="EMAIL_ALREADY_VERIFIED"
     )
-        
-
-    user.EmailVerified = True
-    db.commit()
 
     return success_response(
     message_en="Email verified successfully. Waiting for admin approval.",
@@ -265,11 +313,12 @@ def verify_email(token: str, db: Session = Depends(get_db)):
 
 # this endpoint for Login to the System
 @router.post("/login")
-def login(user: UserLogin, request: Request, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.Email == user.Email).first()
+async def login(user: UserLogin, request: Request, db: Session = Depends(get_db)):
+    db_user = await run_in_threadpool(db.query(User).filter(User.Email == user.Email).first)
 
-    # 1️⃣ Check if user exists and password matches
-    if not db_user or not bcrypt.verify(user.Password, db_user.PasswordHash):
+    # 1️⃣ Unknown email: still pay for one hash so response time doesn't reveal it
+    if not db_user:
+        await run_in_threadpool(verify_password, user.Password, DUMMY_PASSWORD_HASH)
         return error_response(
         message_en="Invalid email or password",
         message_ar="البريد الإلكتروني أو كلمة المرور غير صحيحة",
@@ -301,12 +350,25 @@ def login(user: UserLogin, request: Request, db: Session = Depends(get_db)):
         error_code="ACCOUNT_INACTIVE"
         )
 
-    # 5️⃣ Build photo URL
-    base_url = str(request.base_url).rstrip("/")
+    # 5️⃣ Only now pay for the password hash, off the event loop
+    password_ok, new_hash = await run_in_threadpool(verify_password, user.Password, db_user.PasswordHash)
+    if not password_ok:
+        return error_response(
+        message_en="Invalid email or password",
+        message_ar="البريد الإلكتروني أو كلمة المرور غير صحيحة",
+        error_code="INVALID_CREDENTIALS"
+    )
+
+    # Legacy bcrypt hash: upgrade it to argon2 now that we know the password
+    if new_hash:
+        db_user.PasswordHash = new_hash
+        await run_in_threadpool(db.commit)
+
+    # 6️⃣ Build photo URL
     photo_relative_path = db_user.PhotoPath or ""
-    photo_url = f"{base_url}/{photo_relative_path.lstrip('/')}" if photo_relative_path else None
+    photo_url = f"{public_base_url(request)}/{photo_relative_path.lstrip('/')}" if photo_relative_path else None
 
-    # 6️⃣ Create JWT token
+    # 7️⃣ Create JWT token
     token = create_access_token(
         data={
             "sub": db_user.Email,
@@ -318,7 +380,7 @@ def login(user: UserLogin, request: Request, db: Session = Depends(get_db)):
         }
     )
 
-    # 7️⃣ Return success response
+    # 8️⃣ Return success response
     return success_response(
     message_en="Login successful",
     message_ar="تم تسجيل الدخول بنجاح",
@@ -330,34 +392,30 @@ def login(user: UserLogin, request: Request, db: Session = Depends(get_db)):
 # for forget and reset password for user
 @router.post("/forgot-password")
 def forgot_password(request: Request, email: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.Email == email).first()
-    if not user:
-        return error_response(
-        message_en="Email not found",
-        message_ar="هذا البريد غير مسجل",
-        error_code="EMAIL_NOT_FOUND"
-    )
+    # Same answer whether or not the email exists, so accounts can't be enumerated
+    user = db.query(User.UserID).filter(User.Email == email).first()
+    if user:
+        token = create_verification_token(email, expires_minutes=60)
+        reset_url = f"{FRONTEND_BASE_URL}/auth/reset-password?token={token}"
+        email_body = f"""
+        <div style="font-family:'Segoe UI',Arial,sans-serif;color:#1f2937;max-width:520px;margin:auto;">
+            <h2 style="color:#2563eb;margin-bottom:8px;">Reset your NGD password</h2>
+            <p>We received a request to reset the password for your account. Click the button below to choose a new password.</p>
+            <p style="margin:24px 0;">
+                <a href="{reset_url}" style="background:#2563eb;color:#ffffff;text-decoration:none;padding:12px 28px;border-radius:6px;display:inline-block;">
+                    Reset password
+                </a>
+            </p>
+            <p style="font-size:13px;color:#6b7280;">If you didn't request this, you can safely ignore this email.</p>
+            <p style="font-size:13px;color:#6b7280;">Link (valid for 60 minutes): <span style="color:#2563eb;word-break:break-all;">{reset_url}</span></p>
+            <p style="margin-top:32px;">Best regards,<br/>NGD Team</p>
+        </div>
+        """
+        background_tasks.add_task(queue_email, "send_email", "Password Reset - NGD", email_body, email)
 
-    token = create_verification_token(email, expires_minutes=60)
-    reset_url = f"{FRONTEND_BASE_URL}/auth/reset-password?token={token}"
-    email_body = f"""
-    <div style="font-family:'Segoe UI',Arial,sans-serif;color:#1f2937;max-width:520px;margin:auto;">
-        <h2 style="color:#2563eb;margin-bottom:8px;">Reset your NGD password</h2>
-        <p>We received a request to reset the password for your account. Click the button below to choose a new password.</p>
-        <p style="margin:24px 0;">
-            <a href="{reset_url}" style="background:#2563eb;color:#ffffff;text-decoration:none;padding:12px 28px;border-radius:6px;display:inline-block;">
-                Reset password
-            </a>
-        </p>
-        <p style="font-size:13px;color:#6b7280;">If you didn't request this, you can safely ignore this email.</p>
-        <p style="font-size:13px;color:#6b7280;">Link (valid for 60 minutes): <span style="color:#2563eb;word-break:break-all;">{reset_url}</span></p>
-        <p style="margin-top:32px;">Best regards,<br/>NGD Team</p>
-    </div>
-    """
-    background_tasks.add_task(send_email, "Password Reset - NGD", email_body, email)
     return success_response(
-    message_en="Password reset email sent successfully.",
-    message_ar="تم ارسال رابط تغير كلمة المرور الى بريدك بنجاح",
+    message_en="If this email is registered, a password reset link has been sent to it.",
+    message_ar="إذا كان هذا البريد مسجلاً فقد تم ارسال رابط تغيير كلمة المرور اليه",
     data={"email": email}
 )
 
@@ -382,7 +440,7 @@ def reset_password(token: str, new_password: str, db: Session = Depends(get_db))
         error_code="USER_NOT_FOUND"
     )
 
-    user.PasswordHash = bcrypt.hash(new_password)
+    user.PasswordHash = hash_password(new_password)
     db.commit()
 
     return success_response(
@@ -1,5 +1,7 @@
 # routers/chatbot.py
 
+import html
+import re
 from fastapi import APIRouter, Depends, Body, Request
 from sqlalchemy.orm import Session
 from app.database import get_db
@@ -13,6 +15,28 @@ FALLBACK_MESSAGE = {
     "ar": "عذرًا، لم أجد إجابة دقيقة على سؤالك. يمكنك التواصل مع <a href='https://ngd.com/contact' target='_blank'>خدمة العملاء</a> أو الاتصال على +966-XXX-XXXX."
 }
 
+INTRO_MESSAGE = {
+    "en": "I found a few things that might help you:",
+    "ar": "وجدت بعض النتائج التي قد تساعدك:"
+}
+
+_IMAGE_TMPL = "<img src='{src}' alt='' width='50' height='50' style='border-radius:6px;margin-right:8px;' />"
+_CARD_TMPL = (
+    "<div style='display:flex;align-items:center;margin-bottom:8px;'>"
+    "{image}"
+    "<div><a href='{url}' target='_blank' "
+    "style='color:#0077cc;font-weight:bold;text-decoration:none;'>{title}</a>"
+    "<br><small>{desc}...</small></div></div>"
+)
+
+# Any character in the Arabic block marks the question as Arabic
+_AR_RE = re.compile(r"[\u0600-\u06FF]")
+
+
+def _escape_highlighted(text: str) -> str:
+    """Escape search text but keep the <mark> tags added by global_search."""
+    return html.escape(text).replace("&lt;mark&gt;", "<mark>").replace("&lt;/mark&gt;", "</mark>")
+
 
 @router.post("/ask")
 def ask_chatbot(
@@ -23,7 +47,7 @@ def ask_chatbot(
     """Chatbot endpoint that returns search results in HTML, with English and Arabic support."""
 
     # Detect if the user input is Arabic
-    is_arabic = any("\u0600" <= ch <= "\u06FF" for ch in user_question)
+    is_arabic = bool(_AR_RE.search(user_question))
 
     # Run search
     try:
@@ -44,31 +68,23 @@ def ask_chatbot(
             data={"message": fallback_msg}
         )
 
-    # Intro text
-    intro = "وجدت بعض النتائج التي قد تساعدك:" if is_arabic else "I found a few things that might help you:"
+    lang = "ar" if is_arabic else "en"
 
     # Build HTML cards
     html_cards = []
     for r in results:
-        title = r.get("title_ar") if is_arabic else r.get("title_en")
-        description = (r.get("description_ar") if is_arabic else r.get("description_en") or "")[:120]
-
-        image_html = (
-            f"<img src='{r['image']}' alt='' width='50' height='50' "
-            f"style='border-radius:6px;margin-right:8px;' />"
-            if r.get("image") else ""
-        )
+        title = r.get(f"title_{lang}") or ""
+        description = (r.get(f"description_{lang}") or "")[:120]
+        image_html = _IMAGE_TMPL.format(src=html.escape(r["image"], quote=True)) if r.get("image") else ""
 
-        card = (
-            f"<div style='display:flex;align-items:center;margin-bottom:8px;'>"
-            f"{image_html}"
-            f"<div><a href='{r['url']}' target='_blank' "
-            f"style='color:#0077cc;font-weight:bold;text-decoration:none;'>{title}</a>"
-            f"<br><small>{description}...</small></div></div>"
-        )
-        html_cards.append(card)
+        html_cards.append(_CARD_TMPL.format(
+            image=image_html,
+            url=html.escape(r["url"], quote=True),
+            title=_escape_highlighted(title),
+            desc=_escape_highlighted(description)
+        ))
 
-    html_response = f"<p>{intro}</p>{''.join(html_cards)}"
+    html_response = f"<p>{INTRO_MESSAGE[lang]}</p>{''.join(html_cards)}"
 
     # Return the response in the same structure as old chatbot
     return success_response(
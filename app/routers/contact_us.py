@@ -1,31 +1,41 @@
 # routers/contact_us.py
-import os, shutil
-from fastapi import APIRouter, Depends, UploadFile, File, Form, Request, BackgroundTasks
-from sqlalchemy.orm import Session
+import os
+import orjson
+from fastapi import APIRouter, Depends, UploadFile, File, Form, Request, BackgroundTasks, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from datetime import datetime
-from urllib.parse import quote
 from typing import Optional
-from app.database import get_db
+from app.database import get_async_db, AsyncSessionLocal
 from app.models.contact_us import ContactUs, ContactUsResponse
 from app.models.users import User
-from app.utils.email import send_email, send_email_with_attachment , CONTACT_DIR, SYSTEM_EMAIL
+from app.utils.email import queue_email, render_email_template, CONTACT_DIR, SYSTEM_EMAIL
 from app.utils.response import success_response, error_response
-from app.utils.utils import get_optional_user, require_admin
-from app.utils.paths import static_path
+from app.settings import static_base_url
+from app.utils.utils import get_optional_user, require_admin, CurrentUser
+from app.utils.paths import static_path, url_path
+from app.utils.uploads import store_upload, UploadTooLarge
 
 router = APIRouter(prefix="/contact-us", tags=["ContactUs"])
 
+# Rows fetched per round-trip while streaming the admin contact list
+CONTACT_STREAM_BATCH = 500
 
-def build_file_url(request: Request, relative_path: Optional[str]) -> Optional[str]:
+
+def build_file_url(static_base: str, relative_path: Optional[str]) -> Optional[str]:
+    # static_base comes from static_base_url(request), resolved once per request.
+    # Stored names are URL-safe, so url_path() skips quote() except for legacy rows.
     if not relative_path:
         return None
-    base = str(request.base_url).rstrip("/")
-    return f"{base}/static/{quote(relative_path)}"
+    return f"{static_base}/{url_path(relative_path)}"
 
 
 # ------------------ Public: Submit Contact ------------------
 @router.post("/", response_model=dict)
-def create_contact(
+async def create_contact(
     request: Request,
     background_tasks: BackgroundTasks,
     FirstName: Optional[str] = Form(None),
@@ -35,19 +45,21 @@ def create_contact(
     Email: Optional[str] = Form(None),
     PhoneNumber: Optional[str] = Form(None),
     attach: Optional[UploadFile] = File(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[User] = Depends(get_optional_user)
 ):
-    # 1️⃣ Save attachment
+    # 1️⃣ Save attachment (streamed to disk, never held whole in memory)
     attach_rel = None
     if attach:
         os.makedirs(CONTACT_DIR, exist_ok=True)
-        orig = os.path.basename(attach.filename)
-        safe_name = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{orig.replace(' ', '_')}"
-        save_path = os.path.join(CONTACT_DIR, safe_name)
-
-        with open(save_path, "wb") as buff:
-            shutil.copyfileobj(attach.file, buff)
+        try:
+            safe_name = await run_in_threadpool(store_upload, attach.file, CONTACT_DIR, attach.filename)
+        except UploadTooLarge:
+            return error_response(
+                message_en="Attachment is too large.",
+                message_ar="حجم المرفق كبير جداً.",
+                error_code="FILE_TOO_LARGE"
+            )
 
         attach_rel = f"contact/{safe_name}"
 
@@ -76,63 +88,52 @@ def create_contact(
     )
 
     db.add(new_contact)
-    db.commit()
-    db.refresh(new_contact)
+    await db.commit()  # expire_on_commit=False, so ContactID stays loaded
 
     # 4️⃣ Notify admin
     admin_subject = f"New ContactUs: {Subject or 'No subject'}"
-    admin_body = f"""
-    <div style="font-family:'Segoe UI',Arial,sans-serif;color:#1f2937;max-width:520px;margin:auto;">
-        <h2 style="color:#2563eb;">New Contact Form Submitted</h2>
-        <p>A new contact form has been submitted.</p>
-        <ul>
-            <li><strong>Name:</strong> {FirstName or ''} {LastName or ''}</li>
-            <li><strong>Email:</strong> {user_email or 'N/A'}</li>
-            <li><strong>Phone:</strong> {PhoneNumber or 'N/A'}</li>
-            <li><strong>Subject:</strong> {Subject or 'N/A'}</li>
-            <li><strong>Message:</strong> {Body or 'N/A'}</li>
-            <li><strong>ContactID:</strong> {new_contact.ContactID}</li>
-        </ul>
-    </div>
-    """
+    admin_body = render_email_template(
+        "contact_admin.html",
+        first_name=FirstName,
+        last_name=LastName,
+        email=user_email,
+        phone=PhoneNumber,
+        subject=Subject,
+        body=Body,
+        contact_id=new_contact.ContactID,
+    )
 
     if attach_rel:
         background_tasks.add_task(
-            send_email_with_attachment,
+            queue_email,
+            "send_email_with_attachment",
             admin_subject,
             admin_body,
             SYSTEM_EMAIL,
             attach_rel
         )
     else:
-        background_tasks.add_task(send_email, admin_subject, admin_body, SYSTEM_EMAIL)
+        background_tasks.add_task(queue_email, "send_email", admin_subject, admin_body, SYSTEM_EMAIL)
 
     # 5️⃣ Notify user (bilingual HTML)
     if user_email:
         user_subject = f"NGD - We received your message"
-        user_body = f"""
-        <div style="font-family:'Segoe UI',Arial,sans-serif;color:#1f2937;max-width:520px;margin:auto;">
-            <h2 style="color:#2563eb;">Message Received</h2>
-            <p>Dear {FirstName or 'User'},</p>
-            <p>We received your message (<strong>ID {new_contact.ContactID}</strong>).</p>
-            <p>We will reply to you soon.</p>
-            <hr style="margin:24px 0;">
-            <p>عزيزي {FirstName or 'المستخدم'},</p>
-            <p>لقد تلقينا رسالتك (<strong>رقم {new_contact.ContactID}</strong>).</p>
-            <p>سوف نقوم بالرد عليك في أقرب وقت.</p>
-            <p style="margin-top:32px;">Thanks / شكراً,<br/>NGD Team</p>
-        </div>
-        """
+        user_body = render_email_template(
+            "contact_ack.html",
+            first_name=FirstName,
+            contact_id=new_contact.ContactID,
+        )
         if attach_rel:
             background_tasks.add_task(
-                send_email_with_attachment,
+                queue_email,
+                "send_email_with_attachment",
                 user_subject,
                 user_body,
                 user_email,
                 attach_rel
             )
         else:
-            background_tasks.add_task(send_email, user_subject, user_body, user_email)
+            background_tasks.add_task(queue_email, "send_email", user_subject, user_body, user_email)
 
     return success_response(
         message_en="Contact form submitted successfully.",
@@ -140,50 +141,102 @@ def create_contact(
         data={
             "ContactID": new_contact.ContactID,
             "EmailSentTo": user_email,
-            "AttachPath": build_file_url(request, new_contact.AttachPath)
+            "AttachPath": build_file_url(static_base_url(request), new_contact.AttachPath)
         }
     )
 # ------------------ Admin: List Contacts ------------------
 @router.get("/admin", response_model=dict)
-def list_contacts_admin(
-    db: Session = Depends(get_db),
-    admin: User = Depends(require_admin),
+async def list_contacts_admin(
+    page: int = Query(1, ge=1, description="Page number"),
+    limit: int = Query(50, ge=1, le=500, description="Page size"),
+    db: AsyncSession = Depends(get_async_db),
+    admin: CurrentUser = Depends(require_admin),
     request: Request = None
 ):
-    contacts = db.query(ContactUs).order_by(ContactUs.CreatedAt.desc()).all()
-    out = []
-
-    for c in contacts:
-        out.append({
-            "ContactID": c.ContactID,
-            "FirstName": c.FirstName,
-            "LastName": c.LastName,
-            "Subject": c.Subject,
-            "Body": c.Body,
-            "Email": c.Email,
-            "PhoneNumber": c.PhoneNumber,
-            "AttachPath": build_file_url(request, c.AttachPath) if request else None,
-            "ReplyStatus": c.ReplyStatus,
-            "UserId": c.UserID,
-            "CreatedAt": c.CreatedAt
-        })
+    # Plain rows with just the listed columns, newest first (ix_contactus_createdat_desc)
+    stmt = (
+        select(
+            ContactUs.ContactID,
+            ContactUs.FirstName,
+            ContactUs.LastName,
+            ContactUs.Subject,
+            ContactUs.Body,
+            ContactUs.Email,
+            ContactUs.PhoneNumber,
+            ContactUs.AttachPath,
+            ContactUs.ReplyStatus,
+            ContactUs.UserID,
+            ContactUs.CreatedAt,
+        )
+        .order_by(ContactUs.CreatedAt.desc(), ContactUs.ContactID.desc())
+        .offset((page - 1) * limit)
+        .limit(limit)
+    )
+    total_contacts = await db.scalar(select(func.count()).select_from(ContactUs))
+    static_base = static_base_url(request) if request else None
 
-    return success_response(
+    return StreamingResponse(
+        _stream_contacts(stmt, page, limit, total_contacts, static_base),
+        media_type="application/json"
+    )
+
+
+async def _stream_contacts(stmt, page: int, limit: int, total: int, static_base: Optional[str]):
+    """
+    Yield the list_contacts_admin envelope (same shape as success_response)
+    row by row, so neither the full row list nor the full JSON body is held
+    in memory. "count" is only known at the end, so it follows "contacts".
+    """
+    envelope = success_response(
         message_en="Contacts retrieved successfully.",
         message_ar="تم جلب جميع رسائل التواصل بنجاح.",
-        data={"contacts": out}
     )
+    del envelope["data"]
+    yield (
+        orjson.dumps(envelope)[:-1]
+        + b',"data":'
+        + orjson.dumps({"page": page, "limit": limit, "total": total})[:-1]
+        + b',"contacts":['
+    )
+
+    count = 0
+    # The request's session is closed before the body is sent, so stream on our own
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=CONTACT_STREAM_BATCH))
+        async for c in result:
+            yield (b"," if count else b"") + orjson.dumps({
+                "ContactID": c.ContactID,
+                "FirstName": c.FirstName,
+                "LastName": c.LastName,
+                "Subject": c.Subject,
+                "Body": c.Body,
+                "Email": c.Email,
+                "PhoneNumber": c.PhoneNumber,
+                "AttachPath": build_file_url(static_base, c.AttachPath) if static_base else None,
+                "ReplyStatus": c.ReplyStatus,
+                "UserId": c.UserID,
+                "CreatedAt": c.CreatedAt
+            })
+            count += 1
+
+    yield b'],"count":' + str(count).encode() + b"}}"
 
 
 # ------------------ Admin: Contact Details ------------------
 @router.get("/admin/{contact_id}", response_model=dict)
-def get_contact_details_admin(
+async def get_contact_details_admin(
     contact_id: int,
-    db: Session = Depends(get_db),
-    admin: User = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db),
+    admin: CurrentUser = Depends(require_admin),
     request: Request = None
 ):
-    contact = db.query(ContactUs).filter(ContactUs.ContactID == contact_id).first()
+    # Contact and its replies in one round-trip
+    stmt = (
+        select(ContactUs)
+        .options(joinedload(ContactUs.Responses))
+        .where(ContactUs.ContactID == contact_id)
+    )
+    contact = (await db.execute(stmt)).unique().scalar_one_or_none()
 
     if not contact:
         return error_response(
@@ -192,17 +245,14 @@ def get_contact_details_admin(
             error_code="CONTACT_NOT_FOUND"
         )
 
-    replies = db.query(ContactUsResponse).filter(
-        ContactUsResponse.ContactID == contact.ContactID
-    ).order_by(ContactUsResponse.CreatedAt.asc()).all()
-
+    static_base = static_base_url(request)
     reply_list = []
-    for r in replies:
+    for r in contact.Responses:
         reply_list.append({
             "ResponseID": r.ResponseID,
             "Subject": r.Subject,
             "Body": r.Body,
-            "AttachPath": build_file_url(request, r.AttachPath) if r.AttachPath else None,
+            "AttachPath": build_file_url(static_base, r.AttachPath),
             "CreatedByUserID": r.CreatedByUserID,
             "CreatedAt": r.CreatedAt
         })
@@ -215,7 +265,7 @@ def get_contact_details_admin(
         "Body": contact.Body,
         "Email": contact.Email,
         "PhoneNumber": contact.PhoneNumber,
-        "AttachPath": build_file_url(request, contact.AttachPath),
+        "AttachPath": build_file_url(static_base, contact.AttachPath),
         "ReplyStatus": contact.ReplyStatus,
         "UserId": contact.UserID,
         "CreatedAt": contact.CreatedAt,
@@ -231,17 +281,17 @@ def get_contact_details_admin(
 
 # ------------------ Admin: Reply to Contact ------------------
 @router.post("/admin/{contact_id}/reply", response_model=dict)
-def reply_contact_admin(
+async def reply_contact_admin(
     contact_id: int,
     request: Request,
     background_tasks: BackgroundTasks,
     Subject: Optional[str] = Form(None),
     Body: Optional[str] = Form(None),
     attach: Optional[UploadFile] = File(None),
-    db: Session = Depends(get_db),
-    admin: User = Depends(require_admin)
+    db: AsyncSession = Depends(get_async_db),
+    admin: CurrentUser = Depends(require_admin)
 ):
-    contact = db.query(ContactUs).filter(ContactUs.ContactID == contact_id).first()
+    contact = await db.get(ContactUs, contact_id)
 
     if not contact:
         return error_response(
@@ -254,12 +304,14 @@ def reply_contact_admin(
     attach_rel = None
     if attach:
         reply_dir = static_path("contact", "reply", ensure=True)
-        orig = os.path.basename(attach.filename)
-        safe_name = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{orig.replace(' ', '_')}"
-        save_path = os.path.join(reply_dir, safe_name)
-
-        with open(save_path, "wb") as buff:
-            shutil.copyfileobj(attach.file, buff)
+        try:
+            safe_name = await run_in_threadpool(store_upload, attach.file, reply_dir, attach.filename)
+        except UploadTooLarge:
+            return error_response(
+                message_en="Attachment is too large.",
+                message_ar="حجم المرفق كبير جداً.",
+                error_code="FILE_TOO_LARGE"
+            )
 
         attach_rel = f"contact/reply/{safe_name}"
 
@@ -275,31 +327,24 @@ def reply_contact_admin(
 
     db.add(new_reply)
     contact.ReplyStatus = True
-    db.commit()
-    db.refresh(new_reply)
+    await db.commit()
 
     # 3️⃣ Notify user
     if contact.Email:
         reply_subject = Subject or f"Reply to your Contact Form #{contact.ContactID}"
 
-        reply_body = f"""
-        <div style="font-family:'Segoe UI',Arial,sans-serif;color:#1f2937;max-width:520px;margin:auto;">
-            <h2 style="color:#2563eb;margin-bottom:8px;">Reply to your Contact Form</h2>
-            <p>Dear {contact.FirstName or 'User'},</p>
-            <p>We have replied to your Contact Form #{contact.ContactID}.</p>
-            <p>{Body or ''}</p>
-            <hr style="margin:24px 0;">
-            <p>عزيزي {contact.FirstName or 'المستخدم'},</p>
-            <p>لقد قمنا بالرد على نموذج الاتصال الخاص بك #{contact.ContactID}.</p>
-            <p>{Body or ''}</p>
-            <p style="margin-top:32px;">Best regards,<br/>NGD Team</p>
-        </div>
-        """
+        reply_body = render_email_template(
+            "contact_reply.html",
+            first_name=contact.FirstName,
+            contact_id=contact.ContactID,
+            body=Body,
+        )
 
         # Send email with or without attachment
         if attach_rel:
             background_tasks.add_task(
-                send_email_with_attachment,
+                queue_email,
+                "send_email_with_attachment",
                 reply_subject,
                 reply_body,
                 contact.Email,
@@ -307,7 +352,8 @@ def reply_contact_admin(
             )
         else:
             background_tasks.add_task(
-                send_email,
+                queue_email,
+                "send_email",
                 reply_subject,
                 reply_body,
                 contact.Email
@@ -318,6 +364,6 @@ def reply_contact_admin(
         message_ar="تم إرسال الرد بنجاح.",
         data={
             "reply_id": new_reply.ResponseID,
-            "attach_url": build_file_url(request, attach_rel)
+            "attach_url": build_file_url(static_base_url(request), attach_rel)
         }
     )
\ No newline at end of file
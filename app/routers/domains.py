@@ -7,6 +7,7 @@ from app.database import get_db
 from app.utils.response import success_response, error_response
 from app.utils.utils import get_current_user
 from app.models.users import Domain
+from app.routers.auth import invalidate_registration_lookups
 
 router = APIRouter(prefix="/domains", tags=["Domains"])
 
@@ -117,6 +118,7 @@ def create_domain(
     db.add(new_domain)
     db.commit()
     db.refresh(new_domain)
+    invalidate_registration_lookups()
 
     return success_response(
         "Domain created successfully",
@@ -153,6 +155,7 @@ def update_domain(
         item.Type = type.lower()
 
     db.commit()
+    invalidate_registration_lookups()
 
     return success_response(
         "Domain updated successfully",
@@ -178,5 +181,6 @@ def delete_domain(domain_id: int, current=Depends(get_current_user), db: Session
 
     db.delete(domain)
     db.commit()
+    invalidate_registration_lookups()
 
     return success_response("Domain deleted successfully", {"domain_id": domain_id})
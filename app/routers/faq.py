@@ -1,19 +1,30 @@
 from fastapi import APIRouter, Depends, status, Form, Query
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
 from app.models.faq import FAQ
 from app.models.lookups import FAQCategory
-from app.models.users import User
 from app.schemas.faq import FAQResponse, FAQCreate, FAQUpdate
 from app.schemas.lookups import FAQCategoryResponse
 from app.utils.response import success_response, error_response
 from app.database import get_db
-from app.utils.utils import require_admin
+from app.utils.utils import require_admin, CurrentUser
+from app.utils.faq_cache import get_faq_index, invalidate_faq_cache, normalize_question
 from rapidfuzz import fuzz, process
 
 router = APIRouter(prefix="/faq", tags=["FAQ"])
 
+
+def _category_exists(db: Session, category_id: int) -> bool:
+    # SQL Server has no bare EXISTS in a select list, so probe for the key instead
+    return db.scalar(
+        select(FAQCategory.CategoryID).where(
+            FAQCategory.CategoryID == category_id,
+            FAQCategory.IsDelete == False
+        ).limit(1)
+    ) is not None
+
 # ----------------------
 # Public Endpoints
 # ----------------------
@@ -31,45 +42,30 @@ def search_faqs(
     Returns top 3 matching results ordered by similarity
     """
 
-    faq_query = db.query(FAQ).filter(FAQ.IsDelete == False)
-    if category_id:
-        faq_query = faq_query.filter(FAQ.CategoryID == category_id)
-    faqs = faq_query.all()
+    lang = "ar" if lang.lower() == "ar" else "en"
+    index = get_faq_index(db, lang, category_id)
 
-    if not faqs:
+    if not index.total:
         return error_response("No FAQs found in the database.", "لا يوجد نتائج", error_code= "EMPTY_FAQ_LIST")
 
-    # Select language
-    if lang.lower() == "ar":
-        faq_data = [
-            {"id": f.FAQID, "question": f.QuestionAr or "", "answer": f.AnswerAr or ""}
-            for f in faqs if f.QuestionAr
-        ]
-    else:
-        faq_data = [
-            {"id": f.FAQID, "question": f.QuestionEn or "", "answer": f.AnswerEn or ""}
-            for f in faqs if f.QuestionEn
-        ]
-
-    if not faq_data:
+    if not index.items:
         return error_response("No FAQs available in the selected language." ,"لا يوجد نتائج للغة التى اخترتها", error_code="NO_LANG_DATA")
 
-    # Calculate similarity
-    questions = [f["question"] for f in faq_data]
-    matches = process.extract(query, questions, scorer=fuzz.token_sort_ratio, limit=10)
+    # Calculate similarity against the pre-sorted keys (same as token_sort_ratio);
+    # rapidfuzz already returns the top 3 above the threshold, best first
+    matches = process.extract(normalize_question(query), index.keys, scorer=fuzz.ratio, limit=3, score_cutoff=20)
 
     results = []
-    for text, score, idx in matches:
-        if score >= 20:  # similarity threshold
-            item = faq_data[idx]
-            results.append({
-                "FAQID": item["id"],
-                "QuestionEn": item["question"] if lang == "en" else None,
-                "QuestionAr": item["question"] if lang == "ar" else None,
-                "AnswerEn": item["answer"] if lang == "en" else None,
-                "AnswerAr": item["answer"] if lang == "ar" else None,
-                "Score": round(score, 2)
-            })
+    for _, score, idx in matches:
+        faq_id, question, answer = index.items[idx]
+        results.append({
+            "FAQID": faq_id,
+            "QuestionEn": question if lang == "en" else None,
+            "QuestionAr": question if lang == "ar" else None,
+            "AnswerEn": answer if lang == "en" else None,
+            "AnswerAr": answer if lang == "ar" else None,
+            "Score": round(score, 2)
+        })
 
     if not results:
         # static chatbot fallback
@@ -83,8 +79,6 @@ def search_faqs(
         }
         return success_response("No FAQ matched.", "لا يوجد نتائج" ,data=fallback)
 
-    # sort & return top 3
-    results = sorted(results, key=lambda x: x["Score"], reverse=True)[:3]
     return success_response("Top matching FAQs retrieved successfully.","اعلى نتائج البحث" ,  results)
 
 
@@ -129,14 +123,17 @@ def get_faqs(category_id: Optional[int] = None, db: Session = Depends(get_db)):
 def create_faq_category(
     NameEn: str = Form(...),
     NameAr: Optional[str] = Form(None),
-    current_user: User = Depends(require_admin),
+    current_user: CurrentUser = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
-    category = FAQCategory(NameEn=NameEn, NameAr=NameAr, IsDelete=False)
-    db.add(category)
+    # INSERT ... OUTPUT inserted.*: one round-trip, no refresh SELECT
+    category = db.execute(
+        insert(FAQCategory)
+        .values(NameEn=NameEn, NameAr=NameAr, IsDelete=False)
+        .returning(*FAQCategory.__table__.c)
+    ).one()
     db.commit()
-    db.refresh(category)
-    return success_response("FAQ category created successfully.", data =  category)
+    return success_response("FAQ category created successfully.", data = dict(category._mapping))
 
 
 @router.put("/admin/categories/{category_id}")
@@ -144,7 +141,7 @@ def update_faq_category(
     category_id: int,
     NameEn: Optional[str] = Form(None),
     NameAr: Optional[str] = Form(None),
-    current_user: User = Depends(require_admin),
+    current_user: CurrentUser = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
     category = db.query(FAQCategory).filter(
@@ -167,17 +164,17 @@ def update_faq_category(
 @router.delete("/admin/categories/{category_id}")
 def delete_faq_category(
     category_id: int,
-    current_user: User = Depends(require_admin),
+    current_user: CurrentUser = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
-    category = db.query(FAQCategory).filter(
+    # Single conditional UPDATE; no row is loaded just to flip the flag
+    deleted = db.query(FAQCategory).filter(
         FAQCategory.CategoryID == category_id,
         FAQCategory.IsDelete == False
-    ).first()
-    if not category:
+    ).update({FAQCategory.IsDelete: True}, synchronize_session=False)
+    if not deleted:
         return error_response("FAQ category not found.",error_code= "NOT_FOUND")
 
-    category.IsDelete = True
     db.commit()
     return success_response("FAQ category soft-deleted successfully.","تم الحذف بنجاح")
 
@@ -192,37 +189,68 @@ def create_faq(
     AnswerEn: Optional[str] = Form(None),
     AnswerAr: Optional[str] = Form(None),
     CategoryID: Optional[int] = Form(None),
-    current_user: User = Depends(require_admin),
+    current_user: CurrentUser = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
     if CategoryID:
-        category = db.query(FAQCategory).filter(
-            FAQCategory.CategoryID == CategoryID,
-            FAQCategory.IsDelete == False
-        ).first()
-        if not category:
+        if not _category_exists(db, CategoryID):
             return error_response("FAQ category not found.",error_code= "INVALID_CATEGORY")
 
-    faq = FAQ(
-        QuestionEn=QuestionEn,
-        QuestionAr=QuestionAr,
-        AnswerEn=AnswerEn,
-        AnswerAr=AnswerAr,
-        CategoryID=CategoryID,
-        CreatedAt=datetime.utcnow(),
-        CreatedByUserID=current_user.UserID,
-        IsDelete=False
-    )
-    db.add(faq)
+    faq = db.execute(
+        insert(FAQ)
+        .values(
+            QuestionEn=QuestionEn,
+            QuestionAr=QuestionAr,
+            AnswerEn=AnswerEn,
+            AnswerAr=AnswerAr,
+            CategoryID=CategoryID,
+            CreatedAt=datetime.utcnow(),
+            CreatedByUserID=current_user.UserID,
+            IsDelete=False
+        )
+        .returning(*FAQ.__table__.c)
+    ).one()
     db.commit()
-    db.refresh(faq)
-    return success_response("FAQ created successfully.", data= faq)
+    invalidate_faq_cache()
+    return success_response("FAQ created successfully.", data= dict(faq._mapping))
+
+
+@router.post("/admin/bulk_create")
+def bulk_create_faqs(
+    payload: List[FAQCreate],
+    current_user: CurrentUser = Depends(require_admin),
+    db: Session = Depends(get_db),
+):
+    if not payload:
+        return error_response("No FAQs provided.", "لم يتم إرسال أي أسئلة", error_code="EMPTY_FAQ_LIST")
+
+    category_ids = {f.CategoryID for f in payload if f.CategoryID}
+    if category_ids:
+        found = set(db.scalars(
+            select(FAQCategory.CategoryID).where(
+                FAQCategory.CategoryID.in_(category_ids),
+                FAQCategory.IsDelete == False
+            )
+        ))
+        if category_ids - found:
+            return error_response("FAQ category not found.", error_code="INVALID_CATEGORY")
+
+    now = datetime.utcnow()
+    rows = [
+        {**f.dict(), "CreatedAt": now, "CreatedByUserID": current_user.UserID, "IsDelete": False}
+        for f in payload
+    ]
+    # One executemany; with fast_executemany pyodbc sends all rows as a single parameter array
+    db.execute(insert(FAQ), rows)
+    db.commit()
+    invalidate_faq_cache()
+    return success_response("FAQs created successfully.", "تم إضافة الأسئلة بنجاح", data={"count": len(rows)})
 
 
 @router.get("/admin/{faq_id}")
 def get_faq(
     faq_id: int,
-    current_user: User = Depends(require_admin),
+    current_user: CurrentUser = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
     faq = db.query(FAQ).filter(FAQ.FAQID == faq_id, FAQ.IsDelete == False).first()
@@ -239,7 +267,7 @@ def update_faq(
     AnswerEn: Optional[str] = Form(None),
     AnswerAr: Optional[str] = Form(None),
     CategoryID: Optional[int] = Form(None),
-    current_user: User = Depends(require_admin),
+    current_user: CurrentUser = Depends(require_admin),
     db: Session = Depends(get_db),
 ):
     faq = db.query(FAQ).filter(FAQ.FAQID == faq_id, FAQ.IsDelete == False).first()
@@ -247,11 +275,7 @@ def update_faq(
         return error_response("FAQ not found.", error_code="NOT_FOUND")
 
     if CategoryID:
-        category = db.query(FAQCategory).filter(
-            FAQCategory.CategoryID == CategoryID,
-            FAQCategory.IsDelete == False
-        ).first()
-        if not category:
+        if not _category_exists(db, CategoryID):
             return error_response("FAQ category not found.", error_code="INVALID_CATEGORY")
 
     if QuestionEn is not None:
@@ -270,13 +294,14 @@ def update_faq(
 
     db.commit()
     db.refresh(faq)
+    invalidate_faq_cache()
     return success_response("FAQ updated successfully.", data=faq)
 
 
 @router.delete("/admin/{faq_id}")
 def delete_faq(
     faq_id: int,
-    current_user: User = Depends(require_admin),
+    current_user: CurrentUser = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
     faq = db.query(FAQ).filter(FAQ.FAQID == faq_id, FAQ.IsDelete == False).first()
@@ -285,4 +310,5 @@ def delete_faq(
 
     faq.IsDelete = True
     db.commit()
+    invalidate_faq_cache()
     return success_response("FAQ soft-deleted successfully.")
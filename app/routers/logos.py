@@ -1,47 +1,62 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Form, Request
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, UploadFile, File, Form, Request, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
-import os
-import shutil
-from urllib.parse import quote
 from datetime import datetime
 from app.models.logos import Logo
-from app.models.users import User
-from app.schemas.logos import LogoCreate, LogoUpdate, LogoResponse, VALID_CATEGORIES
+from app.schemas.logos import LogoCreate, LogoUpdate, VALID_CATEGORIES
 from app.utils.response import success_response, error_response
-from app.database import get_db
-from app.utils.utils import require_admin
-from app.utils.paths import static_path
+from app.settings import static_base_url
+from app.database import get_async_db
+from app.utils.utils import require_admin, CurrentUser
+from app.utils.paths import static_path, url_filename
+from app.utils.uploads import store_upload, cleanup_unreferenced, UploadTooLarge
 
 router = APIRouter(prefix="/logos", tags=["Logos"])
 
 
 # Helper to format ImagePath URL
-def format_logo(logo: Logo, request: Request) -> dict:
-    data = LogoResponse.from_orm(logo).dict()
-    if data.get("ImagePath") and data.get("Category"):
-        imagename = quote(os.path.basename(data["ImagePath"]))
-        data["ImagePath"] = f"{request.base_url}static/Logos/{data['Category'].lower()}/{imagename}"
-    return data
+# static_base is static_base_url(request), resolved once per request by the caller.
+# Builds the LogoResponse fields by hand: no per-row pydantic validation on lists.
+def format_logo(logo: Logo, static_base: str) -> dict:
+    image_path = logo.ImagePath
+    if image_path and logo.Category:
+        image_path = f"{static_base}/Logos/{logo.Category.lower()}/{url_filename(image_path)}"
+    return {
+        "NameEn": logo.NameEn,
+        "NameAr": logo.NameAr,
+        "ImagePath": image_path,
+        "Link": logo.Link,
+        "Category": logo.Category,
+        "LogoID": logo.LogoID,
+        "CreatedAt": logo.CreatedAt,
+        "CreatedByUserID": logo.CreatedByUserID,
+        "UpdatedAt": logo.UpdatedAt,
+        "UpdatedByUserID": logo.UpdatedByUserID,
+    }
 
 
 # -----------------------
 # Public endpoint: Get all logos
 @router.get("/")
-def get_logos(category: Optional[str] = None, request: Request = None, db: Session = Depends(get_db)):
-    if category and category.lower() not in VALID_CATEGORIES:
+async def get_logos(category: Optional[str] = None, request: Request = None, db: AsyncSession = Depends(get_async_db)):
+    category = category.lower() if category else None
+    if category and category not in VALID_CATEGORIES:
         return error_response(
             message_en="Invalid category. Allowed values: partner, benefits",
             message_ar="فئة غير صالحة. القيم المسموح بها: partner, benefits",
             error_code="INVALID_CATEGORY"
         )
 
-    query = db.query(Logo)
+    stmt = select(Logo)
     if category:
-        query = query.filter(Logo.Category.ilike(category))
-    logos = query.order_by(Logo.CreatedAt.desc()).all()
+        # Category is stored lowercased, so an exact match can seek ix_logos_category_created
+        stmt = stmt.where(Logo.Category == category)
+    logos = (await db.scalars(stmt.order_by(Logo.CreatedAt.desc()))).all()
 
-    data = [format_logo(logo, request) for logo in logos]
+    static_base = static_base_url(request)
+    data = [format_logo(logo, static_base) for logo in logos]
 
     return success_response(
         message_en="Logos retrieved successfully",
@@ -53,17 +68,18 @@ def get_logos(category: Optional[str] = None, request: Request = None, db: Sessi
 # -----------------------
 # Admin: Create logo
 @router.post("/admin/create")
-def create_logo(
+async def create_logo(
     NameEn: str = Form(...),
     NameAr: Optional[str] = Form(None),
     Link: str = Form(...),
     Category: str = Form(...),
     ImageFile: UploadFile = File(...),
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db),
     request: Request = None,
 ):
-    if Category.lower() not in VALID_CATEGORIES:
+    category = Category.lower()
+    if category not in VALID_CATEGORIES:
         return error_response(
             message_en="Invalid category. Allowed values: partner, benefits",
             message_ar="فئة غير صالحة. القيم المسموح بها: partner, benefits",
@@ -72,26 +88,37 @@ def create_logo(
 
     image_path = None
     if ImageFile:
-        folder = static_path("Logos", Category.lower(), ensure=True)
-        image_path = f"{folder}/{ImageFile.filename}"
-        with open(image_path, "wb") as buffer:
-            shutil.copyfileobj(ImageFile.file, buffer)
-
-    new_logo = Logo(
-        NameEn=NameEn,
-        NameAr=NameAr,
-        Link=Link,
-        Category=Category.lower(),
-        ImagePath=image_path,
-        CreatedAt=datetime.utcnow(),
-        CreatedByUserID=current_user.UserID,
+        folder = static_path("Logos", category, ensure=True)
+        try:
+            # Content-hashed name: the URL changes whenever the image does
+            stored_name = await run_in_threadpool(store_upload, ImageFile.file, folder, ImageFile.filename)
+        except UploadTooLarge:
+            return error_response(
+                message_en="Image file is too large",
+                message_ar="حجم الصورة كبير جداً",
+                error_code="FILE_TOO_LARGE"
+            )
+        image_path = f"{folder}/{stored_name}"
+
+    stmt = (
+        insert(Logo)
+        .values(
+            NameEn=NameEn,
+            NameAr=NameAr,
+            Link=Link,
+            Category=category,
+            ImagePath=image_path,
+            CreatedAt=datetime.utcnow(),
+            CreatedByUserID=current_user.UserID,
+        )
+        .returning(*Logo.__table__.c)
     )
 
-    db.add(new_logo)
-    db.commit()
-    db.refresh(new_logo)
+    # INSERT ... OUTPUT inserted.*: one round-trip, no refresh SELECT
+    new_logo = (await db.execute(stmt)).one()
+    await db.commit()
 
-    data = format_logo(new_logo, request)
+    data = format_logo(new_logo, static_base_url(request))
 
     return success_response(
         message_en="Logo created successfully",
@@ -103,8 +130,8 @@ def create_logo(
 # -----------------------
 # Admin: Get logo by ID
 @router.get("/admin/{logo_id}")
-def get_logo(logo_id: int, request: Request, current_user: User = Depends(require_admin), db: Session = Depends(get_db)):
-    logo = db.query(Logo).filter(Logo.LogoID == logo_id).first()
+async def get_logo(logo_id: int, request: Request, current_user: CurrentUser = Depends(require_admin), db: AsyncSession = Depends(get_async_db)):
+    logo = await db.get(Logo, logo_id)
     if not logo:
         return error_response(
             message_en="Logo not found",
@@ -112,7 +139,7 @@ def get_logo(logo_id: int, request: Request, current_user: User = Depends(requir
             error_code="NOT_FOUND"
         )
 
-    data = format_logo(logo, request)
+    data = format_logo(logo, static_base_url(request))
 
     return success_response(
         message_en="Logo retrieved successfully",
@@ -124,18 +151,19 @@ def get_logo(logo_id: int, request: Request, current_user: User = Depends(requir
 # -----------------------
 # Admin: Update logo
 @router.put("/admin/{logo_id}")
-def update_logo(
+async def update_logo(
     logo_id: int,
+    background_tasks: BackgroundTasks,
     NameEn: Optional[str] = Form(None),
     NameAr: Optional[str] = Form(None),
     Link: Optional[str] = Form(None),
     Category: Optional[str] = Form(None),
     ImagePath: Optional[UploadFile] = File(None),
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db),
     request: Request = None,
 ):
-    logo = db.query(Logo).filter(Logo.LogoID == logo_id).first()
+    logo = await db.get(Logo, logo_id)
     if not logo:
         return error_response(
             message_en="Logo not found",
@@ -143,7 +171,8 @@ def update_logo(
             error_code="NOT_FOUND"
         )
 
-    if Category and Category.lower() not in VALID_CATEGORIES:
+    category = Category.lower() if Category is not None else None
+    if category and category not in VALID_CATEGORIES:
         return error_response(
             message_en="Invalid category. Allowed values: partner, benefits",
             message_ar="فئة غير صالحة. القيم المسموح بها: partner, benefits",
@@ -157,28 +186,38 @@ def update_logo(
         logo.NameAr = NameAr
     if Link is not None:
         logo.Link = Link
-    if Category is not None:
-        logo.Category = Category.lower()
+    if category is not None:
+        logo.Category = category
 
     # Update image if provided
+    old_image = None
     if ImagePath:
         folder = static_path("Logos", logo.Category.lower(), ensure=True)
-        if logo.ImagePath and os.path.exists(logo.ImagePath):
-            os.remove(logo.ImagePath)
-
-        new_path = f"{folder}/{ImagePath.filename}"
-        with open(new_path, "wb") as buffer:
-            shutil.copyfileobj(ImagePath.file, buffer)
-
+        try:
+            stored_name = await run_in_threadpool(store_upload, ImagePath.file, folder, ImagePath.filename)
+        except UploadTooLarge:
+            return error_response(
+                message_en="Image file is too large",
+                message_ar="حجم الصورة كبير جداً",
+                error_code="FILE_TOO_LARGE"
+            )
+        new_path = f"{folder}/{stored_name}"
+
+        if logo.ImagePath != new_path:
+            old_image = logo.ImagePath
         logo.ImagePath = new_path
 
     logo.UpdatedAt = datetime.utcnow()
     logo.UpdatedByUserID = current_user.UserID
 
-    db.commit()
-    db.refresh(logo)
+    await db.commit()  # expire_on_commit=False, so logo stays loaded for the response
+
+    # The replaced image is removed after the response, once nothing points at it
+    # (content-hashed names mean two logos can share one file)
+    if old_image:
+        background_tasks.add_task(cleanup_unreferenced, Logo.ImagePath, old_image)
 
-    data = format_logo(logo, request)
+    data = format_logo(logo, static_base_url(request))
 
     return success_response(
         message_en="Logo updated successfully",
@@ -190,8 +229,13 @@ def update_logo(
 # -----------------------
 # Admin: Delete logo
 @router.delete("/admin/{logo_id}")
-def delete_logo(logo_id: int, current_user: User = Depends(require_admin), db: Session = Depends(get_db)):
-    logo = db.query(Logo).filter(Logo.LogoID == logo_id).first()
+async def delete_logo(
+    logo_id: int,
+    background_tasks: BackgroundTasks,
+    current_user: CurrentUser = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db)
+):
+    logo = await db.get(Logo, logo_id)
 
     if not logo:
         return error_response(
@@ -200,8 +244,12 @@ def delete_logo(logo_id: int, current_user: User = Depends(require_admin), db: S
             error_code="NOT_FOUND"
         )
 
-    db.delete(logo)
-    db.commit()
+    image_path = logo.ImagePath
+    await db.delete(logo)
+    await db.commit()
+
+    if image_path:
+        background_tasks.add_task(cleanup_unreferenced, Logo.ImagePath, image_path)
 
     return success_response(
         message_en="Logo deleted successfully",
@@ -1,19 +1,19 @@
 # routers/manual_guide.py
 
 from fastapi import APIRouter, Depends, UploadFile, File, Form, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import Optional
-import shutil, os
+import os
 from datetime import datetime
-from urllib.parse import quote
 
 from app.database import get_db
 from app.models.manual_guide import ManualGuide
-from app.schemas.manual_guide import ManualGuideResponse
-from app.models.users import User
-from app.utils.response import success_response, error_response
-from app.utils.utils import require_admin
-from app.utils.paths import static_path
+from app.utils.response import success_response, error_response, etag_response
+from app.settings import public_base_url
+from app.utils.utils import require_admin, CurrentUser
+from app.utils.paths import static_path, url_filename, ABSOLUTE_URL_PREFIXES
+from app.utils.uploads import store_upload
 
 router = APIRouter(prefix="/manual-guides", tags=["ManualGuides"])
 
@@ -23,14 +23,41 @@ UPLOAD_DIR = static_path("manual_guides", ensure=True)
 # ----------------------------------------------------
 # Helper: Format response with full static file URL
 # ----------------------------------------------------
-def format_guide(guide: ManualGuide, request: Request) -> dict:
-    item = ManualGuideResponse.model_validate(guide).dict()
-
-    if item.get("Path"):
-        filename = quote(os.path.basename(item["Path"]))
-        item["Path"] = f"{request.base_url}static/manual_guides/{filename}"
-
-    return item
+# Columns of ManualGuideResponse; the list endpoint selects only these
+GUIDE_COLUMNS = (
+    ManualGuide.ManualGuideID,
+    ManualGuide.NameEn,
+    ManualGuide.NameAr,
+    ManualGuide.DescriptionEn,
+    ManualGuide.DescriptionAr,
+    ManualGuide.Path,
+    ManualGuide.CreatedAt,
+    ManualGuide.CreatedByUserID,
+    ManualGuide.UpdatedAt,
+    ManualGuide.UpdatedByUserID,
+)
+
+
+# Builds the ManualGuideResponse fields by hand (ORM object or GUIDE_COLUMNS row):
+# no per-row pydantic validation on the list endpoint.
+# base_url is public_base_url(request), resolved once per request by the caller
+def format_guide(guide: ManualGuide, base_url: str) -> dict:
+    path = guide.Path
+    if path and not path.startswith(ABSOLUTE_URL_PREFIXES):
+        path = f"{base_url}/static/manual_guides/{url_filename(path)}"
+
+    return {
+        "ManualGuideID": guide.ManualGuideID,
+        "NameEn": guide.NameEn,
+        "NameAr": guide.NameAr,
+        "DescriptionEn": guide.DescriptionEn,
+        "DescriptionAr": guide.DescriptionAr,
+        "Path": path,
+        "CreatedAt": guide.CreatedAt,
+        "CreatedByUserID": guide.CreatedByUserID,
+        "UpdatedAt": guide.UpdatedAt,
+        "UpdatedByUserID": guide.UpdatedByUserID,
+    }
 
 
 # ----------------------------------------------------
@@ -39,26 +66,27 @@ def format_guide(guide: ManualGuide, request: Request) -> dict:
 @router.get("/")
 def get_manual_guides(request: Request, db: Session = Depends(get_db)):
     guides = (
-        db.query(ManualGuide)
+        db.query(*GUIDE_COLUMNS)
         .filter(ManualGuide.IsDelete == False)
         .order_by(ManualGuide.ManualGuideID.desc())
         .all()
     )
 
-    data = [format_guide(guide, request) for guide in guides]
+    base_url = public_base_url(request)
+    data = [format_guide(guide, base_url) for guide in guides]
 
-    return success_response(
+    return etag_response(request, success_response(
         "Manual guides retrieved successfully",
         "تم جلب الأدلة الإرشادية بنجاح",
         data
-    )
+    ))
 
 
 # ----------------------------------------------------
 # Admin – Create new manual guide
 # ----------------------------------------------------
 @router.post("/create")
-def create_manual_guide(
+async def create_manual_guide(
     request: Request,
     NameEn: str = Form(...),
     NameAr: Optional[str] = Form(None),
@@ -66,18 +94,14 @@ def create_manual_guide(
     DescriptionAr: Optional[str] = Form(None),
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
-    payload: User = Depends(require_admin)
+    payload: CurrentUser = Depends(require_admin)
 ):
 
     # --------------------------
     # Handle file upload safely
     # --------------------------
-    timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-    safe_filename = f"{timestamp}_{file.filename.replace(' ', '_')}"
-    file_path = os.path.join(UPLOAD_DIR, safe_filename)
-
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    stored_name = await run_in_threadpool(store_upload, file.file, UPLOAD_DIR, file.filename, max_size=None)
+    file_path = os.path.join(UPLOAD_DIR, stored_name)
 
     # --------------------------
     # Create DB record
@@ -91,14 +115,17 @@ def create_manual_guide(
         CreatedByUserID=payload.UserID,
     )
 
-    db.add(guide)
-    db.commit()
-    db.refresh(guide)
+    def _save_guide():
+        db.add(guide)
+        db.commit()
+        db.refresh(guide)
+
+    await run_in_threadpool(_save_guide)
 
     return success_response(
         "Manual guide created successfully",
         "تم إنشاء الدليل الإرشادي بنجاح",
-        format_guide(guide, request)
+        format_guide(guide, public_base_url(request))
     )
 
 
@@ -106,7 +133,7 @@ def create_manual_guide(
 # Admin – Update manual guide
 # ----------------------------------------------------
 @router.put("/{manual_id}")
-def update_manual_guide(
+async def update_manual_guide(
     request: Request,
     manual_id: int,
     NameEn: Optional[str] = Form(None),
@@ -115,10 +142,12 @@ def update_manual_guide(
     DescriptionAr: Optional[str] = Form(None),
     file: Optional[UploadFile] = File(None),
     db: Session = Depends(get_db),
-    payload: User = Depends(require_admin)
+    payload: CurrentUser = Depends(require_admin)
 ):
 
-    manual = db.query(ManualGuide).filter(ManualGuide.ManualGuideID == manual_id).first()
+    manual = await run_in_threadpool(
+        db.query(ManualGuide).filter(ManualGuide.ManualGuideID == manual_id).first
+    )
     if not manual:
         return error_response(
             "Manual guide not found",
@@ -134,25 +163,24 @@ def update_manual_guide(
 
     # File update if provided
     if file:
-        timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-        safe_filename = f"{timestamp}_{file.filename.replace(' ', '_')}"
-        new_path = os.path.join(UPLOAD_DIR, safe_filename)
-
-        with open(new_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        stored_name = await run_in_threadpool(store_upload, file.file, UPLOAD_DIR, file.filename, max_size=None)
+        new_path = os.path.join(UPLOAD_DIR, stored_name)
 
         manual.Path = new_path
 
     manual.UpdatedAt = datetime.utcnow()
     manual.UpdatedByUserID = payload.UserID
 
-    db.commit()
-    db.refresh(manual)
+    def _save_guide():
+        db.commit()
+        db.refresh(manual)
+
+    await run_in_threadpool(_save_guide)
 
     return success_response(
         "Manual guide updated successfully",
         "تم تحديث الدليل الإرشادي بنجاح",
-        format_guide(manual, request)
+        format_guide(manual, public_base_url(request))
     )
 
 
@@ -163,7 +191,7 @@ def update_manual_guide(
 def delete_manual_guide(
     guide_id: int,
     db: Session = Depends(get_db),
-    payload: User = Depends(require_admin)
+    payload: CurrentUser = Depends(require_admin)
 ):
 
     guide = db.query(ManualGuide).filter(
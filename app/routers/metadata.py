@@ -1,20 +1,22 @@
 # routers/metadata.py
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Form, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.orm import Session, joinedload
 from typing import Optional
 from datetime import date
-from urllib.parse import quote
-import os, shutil
 
 from app.database import get_db
 from app.models.metadata import DatasetInfo, MetadataInfo
 from app.schemas.metadata import (
     DatasetInfoResponse, MetadataInfoResponse
 )
-from app.utils.response import success_response, error_response
+from app.utils.response import success_response, error_response, etag_response
+from app.settings import public_base_url
 from app.utils.utils import require_admin
-from app.utils.paths import static_path
+from app.utils.paths import static_path, url_path, ABSOLUTE_URL_PREFIXES
+from app.utils.uploads import store_upload, store_stream, cleanup_unreferenced, EmptyUpload
 from sqlalchemy import or_, func
 from fastapi import Query
 
@@ -26,11 +28,33 @@ router = APIRouter(prefix="/metadata", tags=["Metadata"])
 # --------------------------
 # Helper to build file/image URLs
 # --------------------------
-def build_file_url(request: Request, path: Optional[str]) -> Optional[str]:
+# base_url is public_base_url(request), resolved once per request by the caller
+def build_file_url(base_url: str, path: Optional[str]) -> Optional[str]:
     if not path:
         return None
-    base_url = str(request.base_url).rstrip("/")
-    return f"{base_url}/static/{quote(path)}"
+    if path.startswith(ABSOLUTE_URL_PREFIXES):
+        return path
+    return f"{base_url}/static/{url_path(path)}"
+
+
+async def _store_dataset_file(upload: UploadFile, folder_path: str) -> str:
+    # Content-hashed name: a re-upload never overwrites a file another URL points at
+    return await run_in_threadpool(store_upload, upload.file, folder_path, upload.filename, max_size=None)
+
+
+# Columns returned by the dataset list; the long description fields are not selected
+DATASET_LIST_COLUMNS = (
+    DatasetInfo.DatasetID,
+    DatasetInfo.Name,
+    DatasetInfo.NameAr,
+    DatasetInfo.Title,
+    DatasetInfo.TitleAr,
+    DatasetInfo.CRS_Name,
+    DatasetInfo.EPSG,
+    DatasetInfo.Keywords,
+    DatasetInfo.KeywordsAr,
+    DatasetInfo.img,
+)
 
 
 # -------------------- PUBLIC ENDPOINTS --------------------
@@ -40,10 +64,11 @@ def get_all_datasets(request: Request, db: Session = Depends(get_db)):
     """
     Get all datasets (for dropdowns or homepage cards)
     """
-    datasets = db.query(DatasetInfo).filter(DatasetInfo.IsDeleted == False).all()
+    datasets = db.query(*DATASET_LIST_COLUMNS).filter(DatasetInfo.IsDeleted == False).all()
     if not datasets:
         return error_response("No datasets found", "لا توجد مجموعات بيانات")
 
+    base_url = public_base_url(request)
     data = []
     for dataset in datasets:
         data.append({
@@ -56,14 +81,14 @@ def get_all_datasets(request: Request, db: Session = Depends(get_db)):
             "EPSG": dataset.EPSG,
             "Keywords": dataset.Keywords,
             "KeywordsAr": dataset.KeywordsAr,
-            "Img": build_file_url(request, dataset.img)
+            "Img": build_file_url(base_url, dataset.img)
         })
 
-    return success_response(
+    return etag_response(request, success_response(
         "Datasets retrieved successfully",
         "تم جلب مجموعات البيانات بنجاح",
         data
-    )
+    ))
 
 
 @router.get("/datasets/{dataset_id}")
@@ -71,14 +96,16 @@ def get_dataset_with_metadata(request: Request, dataset_id: int, db: Session = D
     """
     Get single dataset with metadata
     """
-    dataset = db.query(DatasetInfo).filter(DatasetInfo.DatasetID == dataset_id).first()
+    # Dataset and its active metadata in one round-trip
+    dataset = (
+        db.query(DatasetInfo)
+        .options(joinedload(DatasetInfo.active_metadata))
+        .filter(DatasetInfo.DatasetID == dataset_id)
+        .first()
+    )
     if not dataset:
         return error_response("Dataset not found", "لم يتم العثور على مجموعة البيانات")
 
-    metadata_list = db.query(MetadataInfo).filter(
-        MetadataInfo.DatasetID == dataset_id, MetadataInfo.IsDeleted == False
-    ).all()
-
     data = {
         "DatasetID": dataset.DatasetID,
         "Name": dataset.Name,
@@ -91,7 +118,7 @@ def get_dataset_with_metadata(request: Request, dataset_id: int, db: Session = D
         "EPSG": dataset.EPSG,
         "Keywords": dataset.Keywords,
         "KeywordsAr": dataset.KeywordsAr,
-        "Img": build_file_url(request, dataset.img),
+        "Img": build_file_url(public_base_url(request), dataset.img),
         "Metadata": [
             {
                 "MetadataID": m.MetadataID,
@@ -101,15 +128,15 @@ def get_dataset_with_metadata(request: Request, dataset_id: int, db: Session = D
                 "TitleAr": m.TitleAr,
                 "Description": m.description,
                 "DescriptionAr": m.descriptionAr
-            } for m in metadata_list
+            } for m in dataset.active_metadata
         ]
     }
 
-    return success_response(
+    return etag_response(request, success_response(
         "Dataset with metadata retrieved successfully",
         "تم جلب مجموعة البيانات مع البيانات الوصفية بنجاح",
         data
-    )
+    ))
 
 
 @router.get("/datasets/{dataset_id}/services")
@@ -117,14 +144,15 @@ def get_dataset_services(dataset_id: int, db: Session = Depends(get_db)):
     """
     Get metadata service links for a dataset
     """
-    dataset = db.query(DatasetInfo).filter(DatasetInfo.DatasetID == dataset_id).first()
+    dataset = (
+        db.query(DatasetInfo)
+        .options(joinedload(DatasetInfo.active_metadata))
+        .filter(DatasetInfo.DatasetID == dataset_id)
+        .first()
+    )
     if not dataset:
         return error_response("Dataset not found", "لم يتم العثور على مجموعة البيانات")
 
-    metadata_list = db.query(MetadataInfo).filter(
-        MetadataInfo.DatasetID == dataset_id, MetadataInfo.IsDeleted == False
-    ).all()
-
     data = {
         "DatasetID": dataset.DatasetID,
         "Name": dataset.Name,
@@ -135,7 +163,7 @@ def get_dataset_services(dataset_id: int, db: Session = Depends(get_db)):
                 "Name": m.Name,
                 "NameAr": m.NameAr,
                 "URL": m.URL
-            } for m in metadata_list
+            } for m in dataset.active_metadata
         ]
     }
 
@@ -168,7 +196,7 @@ def get_metadata_details(request: Request, metadata_id: int, db: Session = Depen
         "DescriptionAr": metadata.descriptionAr,
         "CreationDate": metadata.CreationDate,
         "ServicesURL": metadata.URL,
-        "DocumentPath": build_file_url(request, metadata.FilePath),
+        "DocumentPath": build_file_url(public_base_url(request), metadata.FilePath),
         "Bounds": {
             "West": metadata.WestBound,
             "East": metadata.EastBound,
@@ -189,11 +217,11 @@ def get_metadata_details(request: Request, metadata_id: int, db: Session = Depen
         }
     }
 
-    return success_response(
+    return etag_response(request, success_response(
         "Metadata details retrieved successfully",
         "تم جلب تفاصيل البيانات الوصفية بنجاح",
         data
-    )
+    ))
 
 
 
@@ -276,6 +304,7 @@ def search_metadata(
     # -------------------------------------------
     # Response
     # -------------------------------------------
+    base_url = public_base_url(request)
     data = []
     for metadata, dataset in results:
         data.append({
@@ -288,7 +317,7 @@ def search_metadata(
                 "TitleAr": dataset.TitleAr,
                 "Keywords": dataset.Keywords,
                 "KeywordsAr": dataset.KeywordsAr,
-                "Img": build_file_url(request, dataset.img)
+                "Img": build_file_url(base_url, dataset.img)
             },
             "Metadata": {
                 "Name": metadata.Name,
@@ -321,7 +350,7 @@ def search_metadata(
 # -------------------- ADMIN ENDPOINTS --------------------
 
 @router.post("/admin/datasets")
-def create_dataset(
+async def create_dataset(
     Name: str = Form(...),
     NameAr: str = Form(...),
     Title: str = Form(None),
@@ -342,29 +371,34 @@ def create_dataset(
         CRS_Name=CRS_Name, EPSG=EPSG,
         Keywords=Keywords, KeywordsAr=KeywordsAr, img=None
     )
-    db.add(new_dataset)
-    db.commit()
-    db.refresh(new_dataset)
+
+    def _save_dataset():
+        db.add(new_dataset)
+        db.commit()
+        db.refresh(new_dataset)
+
+    await run_in_threadpool(_save_dataset)
+    # Read before the next commit expires it (a lazy reload here would block the loop)
+    dataset_id = new_dataset.DatasetID
 
     # Handle image
     if img:
-        folder_path = static_path("dataset", str(new_dataset.DatasetID), ensure=True)
-        file_path = os.path.join(folder_path, img.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(img.file, buffer)
-        new_dataset.img = f"dataset/{new_dataset.DatasetID}/{img.filename}"
-        db.commit()
+        folder_path = static_path("dataset", str(dataset_id), ensure=True)
+        filename = await _store_dataset_file(img, folder_path)
+        new_dataset.img = f"dataset/{dataset_id}/{filename}"
+        await run_in_threadpool(db.commit)
 
     return success_response(
         "Dataset created successfully",
         "تم إنشاء مجموعة البيانات بنجاح",
-        {"DatasetID": new_dataset.DatasetID}
+        {"DatasetID": dataset_id}
     )
 
 
 @router.put("/admin/datasets/{dataset_id}")
-def update_dataset(
+async def update_dataset(
     dataset_id: int,
+    background_tasks: BackgroundTasks,
     Name: Optional[str] = Form(None),
     NameAr: Optional[str] = Form(None),
     Title: Optional[str] = Form(None),
@@ -379,36 +413,47 @@ def update_dataset(
     db: Session = Depends(get_db),
     admin_user=Depends(require_admin)
 ):
-    dataset = db.query(DatasetInfo).filter(DatasetInfo.DatasetID == dataset_id).first()
-    if not dataset:
-        return error_response("Dataset not found", "لم يتم العثور على مجموعة البيانات")
-
-    # Update fields
-    for field, value in {
-        "Name": Name, "NameAr": NameAr, "Title": Title, "TitleAr": TitleAr,
-        "description": description, "descriptionAr": descriptionAr,
-        "CRS_Name": CRS_Name, "EPSG": EPSG, "Keywords": Keywords, "KeywordsAr": KeywordsAr
-    }.items():
-        if value is not None:
-            setattr(dataset, field, value)
+    values = {
+        field: value for field, value in {
+            "Name": Name, "NameAr": NameAr, "Title": Title, "TitleAr": TitleAr,
+            "description": description, "descriptionAr": descriptionAr,
+            "CRS_Name": CRS_Name, "EPSG": EPSG, "Keywords": Keywords, "KeywordsAr": KeywordsAr
+        }.items()
+        if value is not None
+    }
+    dataset_filter = DatasetInfo.DatasetID == dataset_id
 
-    # Image replacement
+    # Image replacement needs the current path; field-only updates never load the row
+    old_img = None
     if img:
-        folder_path = static_path("dataset", str(dataset.DatasetID), ensure=True)
-        file_path = os.path.join(folder_path, img.filename)
-        if dataset.img and os.path.exists(static_path(dataset.img)):
-            os.remove(static_path(dataset.img))
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(img.file, buffer)
-        dataset.img = f"dataset/{dataset.DatasetID}/{img.filename}"
+        current = await run_in_threadpool(db.query(DatasetInfo.img).filter(dataset_filter).first)
+        if not current:
+            return error_response("Dataset not found", "لم يتم العثور على مجموعة البيانات")
+        folder_path = static_path("dataset", str(dataset_id), ensure=True)
+        filename = await _store_dataset_file(img, folder_path)
+        values["img"] = f"dataset/{dataset_id}/{filename}"
+        if current.img and current.img != values["img"]:
+            old_img = current.img
+
+    def _update_dataset():
+        if not values:
+            return db.query(DatasetInfo.DatasetID).filter(dataset_filter).first() is not None
+        # Single UPDATE of just the submitted columns
+        updated = db.query(DatasetInfo).filter(dataset_filter).update(values, synchronize_session=False)
+        db.commit()
+        return bool(updated)
 
-    db.commit()
-    db.refresh(dataset)
+    if not await run_in_threadpool(_update_dataset):
+        return error_response("Dataset not found", "لم يتم العثور على مجموعة البيانات")
+
+    if old_img:
+        # Removed after the response, once nothing points at it
+        background_tasks.add_task(cleanup_unreferenced, DatasetInfo.img, old_img, static_path(old_img))
 
     return success_response(
         "Dataset updated successfully",
         "تم تحديث مجموعة البيانات بنجاح",
-        {"DatasetID": dataset.DatasetID}
+        {"DatasetID": dataset_id}
     )
 
 
@@ -427,7 +472,7 @@ def delete_dataset(dataset_id: int, db: Session = Depends(get_db), admin_user=De
 
 
 @router.post("/admin/metadata")
-def create_metadata(
+async def create_metadata(
     DatasetID: int = Form(...),
     Name: str = Form(...),
     NameAr: str = Form(...),
@@ -453,7 +498,9 @@ def create_metadata(
     db: Session = Depends(get_db),
     user=Depends(require_admin)
 ):
-    dataset = db.query(DatasetInfo).filter(DatasetInfo.DatasetID == DatasetID, DatasetInfo.IsDeleted == False).first()
+    dataset = await run_in_threadpool(
+        db.query(DatasetInfo).filter(DatasetInfo.DatasetID == DatasetID, DatasetInfo.IsDeleted == False).first
+    )
     if not dataset:
         return error_response("Dataset not found or deleted", "لم يتم العثور على مجموعة البيانات")
 
@@ -466,29 +513,34 @@ def create_metadata(
         ContactName=ContactName, PositionName=PositionName, Organization=Organization,
         Email=Email, Phone=Phone, Role=Role
     )
-    db.add(new_metadata)
-    db.commit()
-    db.refresh(new_metadata)
+
+    def _save_metadata():
+        db.add(new_metadata)
+        db.commit()
+        db.refresh(new_metadata)
+
+    await run_in_threadpool(_save_metadata)
+    # Read before the next commit expires it (a lazy reload here would block the loop)
+    metadata_id = new_metadata.MetadataID
 
     # Handle file
     if file:
         folder_path = static_path("dataset", str(DatasetID), "metadata", ensure=True)
-        file_path = os.path.join(folder_path, file.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        new_metadata.FilePath = f"dataset/{DatasetID}/metadata/{file.filename}"
-        db.commit()
+        filename = await _store_dataset_file(file, folder_path)
+        new_metadata.FilePath = f"dataset/{DatasetID}/metadata/{filename}"
+        await run_in_threadpool(db.commit)
 
     return success_response(
         "Metadata created successfully",
         "تم إنشاء البيانات الوصفية بنجاح",
-        {"MetadataID": new_metadata.MetadataID}
+        {"MetadataID": metadata_id}
     )
 
 
 @router.put("/admin/metadata/{metadata_id}")
-def update_metadata(
+async def update_metadata(
     metadata_id: int,
+    background_tasks: BackgroundTasks,
     DatasetID: Optional[int] = Form(None),
     Name: Optional[str] = Form(None),
     NameAr: Optional[str] = Form(None),
@@ -514,39 +566,103 @@ def update_metadata(
     db: Session = Depends(get_db),
     user=Depends(require_admin)
 ):
-    metadata = db.query(MetadataInfo).filter(MetadataInfo.MetadataID == metadata_id, MetadataInfo.IsDeleted == False).first()
-    if not metadata:
+    values = {
+        field: value for field, value in {
+            "DatasetID": DatasetID, "Name": Name, "NameAr": NameAr,
+            "Title": Title, "TitleAr": TitleAr, "description": description,
+            "descriptionAr": descriptionAr, "CreationDate": CreationDate, "URL": URL,
+            "WestBound": WestBound, "EastBound": EastBound, "NorthBound": NorthBound, "SouthBound": SouthBound,
+            "MetadataStandardName": MetadataStandardName, "MetadataStandardVersion": MetadataStandardVersion,
+            "ContactName": ContactName, "PositionName": PositionName, "Organization": Organization,
+            "Email": Email, "Phone": Phone, "Role": Role
+        }.items()
+        if value is not None
+    }
+    metadata_filter = (MetadataInfo.MetadataID == metadata_id, MetadataInfo.IsDeleted == False)
+
+    # File replacement needs the current row; field-only updates never load it
+    old_file = None
+    if file:
+        current = await run_in_threadpool(
+            db.query(MetadataInfo.DatasetID, MetadataInfo.FilePath).filter(*metadata_filter).first
+        )
+        if not current:
+            return error_response("Metadata not found", "لم يتم العثور على البيانات الوصفية")
+        dataset_id = DatasetID if DatasetID is not None else current.DatasetID
+        folder_path = static_path("dataset", str(dataset_id), "metadata", ensure=True)
+        filename = await _store_dataset_file(file, folder_path)
+        values["FilePath"] = f"dataset/{dataset_id}/metadata/{filename}"
+        if current.FilePath and current.FilePath != values["FilePath"]:
+            old_file = current.FilePath
+
+    def _save_metadata():
+        if not values:
+            return db.query(MetadataInfo.MetadataID).filter(*metadata_filter).first() is not None
+        # Single UPDATE of just the submitted columns
+        updated = db.query(MetadataInfo).filter(*metadata_filter).update(values, synchronize_session=False)
+        db.commit()
+        return bool(updated)
+
+    if not await run_in_threadpool(_save_metadata):
         return error_response("Metadata not found", "لم يتم العثور على البيانات الوصفية")
 
-    for field, value in {
-        "DatasetID": DatasetID, "Name": Name, "NameAr": NameAr,
-        "Title": Title, "TitleAr": TitleAr, "description": description,
-        "descriptionAr": descriptionAr, "CreationDate": CreationDate, "URL": URL,
-        "WestBound": WestBound, "EastBound": EastBound, "NorthBound": NorthBound, "SouthBound": SouthBound,
-        "MetadataStandardName": MetadataStandardName, "MetadataStandardVersion": MetadataStandardVersion,
-        "ContactName": ContactName, "PositionName": PositionName, "Organization": Organization,
-        "Email": Email, "Phone": Phone, "Role": Role
-    }.items():
-        if value is not None:
-            setattr(metadata, field, value)
+    if old_file:
+        # Identical uploads share one file, so it is removed after the response
+        # only once nothing points at it
+        background_tasks.add_task(cleanup_unreferenced, MetadataInfo.FilePath, old_file, static_path(old_file))
 
-    # Handle file
-    if file:
-        folder_path = static_path("dataset", str(metadata.DatasetID), "metadata", ensure=True)
-        file_path = os.path.join(folder_path, file.filename)
-        if metadata.FilePath and os.path.exists(static_path(metadata.FilePath)):
-            os.remove(static_path(metadata.FilePath))
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        metadata.FilePath = f"dataset/{metadata.DatasetID}/metadata/{file.filename}"
+    return success_response(
+        "Metadata updated successfully",
+        "تم تحديث البيانات الوصفية بنجاح",
+        {"MetadataID": metadata_id}
+    )
 
-    db.commit()
-    db.refresh(metadata)
+
+@router.put("/admin/metadata/{metadata_id}/file")
+async def upload_metadata_file(
+    metadata_id: int,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    filename: str = Query(...),
+    db: Session = Depends(get_db),
+    user=Depends(require_admin)
+):
+    """
+    Replace a metadata document with the raw request body (not multipart);
+    it is hashed and written to disk as it streams in.
+    """
+    metadata_filter = (MetadataInfo.MetadataID == metadata_id, MetadataInfo.IsDeleted == False)
+    current = await run_in_threadpool(
+        db.query(MetadataInfo.DatasetID, MetadataInfo.FilePath).filter(*metadata_filter).first
+    )
+    if not current:
+        return error_response("Metadata not found", "لم يتم العثور على البيانات الوصفية")
+
+    folder_path = static_path("dataset", str(current.DatasetID), "metadata", ensure=True)
+    try:
+        stored_name = await store_stream(request.stream(), folder_path, filename, max_size=None)
+    except EmptyUpload:
+        return ORJSONResponse(
+            status_code=400,
+            content=error_response("Request body is empty", "محتوى الطلب فارغ", "EMPTY_FILE")
+        )
+    new_file = f"dataset/{current.DatasetID}/metadata/{stored_name}"
+    old_file = current.FilePath if current.FilePath != new_file else None
+
+    def _save_metadata():
+        db.query(MetadataInfo).filter(*metadata_filter).update({"FilePath": new_file}, synchronize_session=False)
+        db.commit()
+
+    await run_in_threadpool(_save_metadata)
+    if old_file:
+        # Identical uploads share one file, so it is removed after the response
+        # only once nothing points at it
+        background_tasks.add_task(cleanup_unreferenced, MetadataInfo.FilePath, old_file, static_path(old_file))
 
     return success_response(
         "Metadata updated successfully",
         "تم تحديث البيانات الوصفية بنجاح",
-        {"MetadataID": metadata.MetadataID}
+        {"MetadataID": metadata_id}
     )
 
 
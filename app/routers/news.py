@@ -1,37 +1,99 @@
 # routers/news.py
 
-from fastapi import APIRouter, Depends, Request, UploadFile, File, Form
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, Request, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import func, update
 from sqlalchemy.orm import Session
 from datetime import datetime
-from typing import Optional
-from urllib.parse import quote
-import os, shutil
+from typing import Literal, Optional
+import os
+import threading
 
-from app.database import get_db
+from cachetools import TTLCache
+
+from app.database import SessionLocal, get_db
 from app.models.news import News
-from app.models.users import User
-from app.schemas.news import NewsResponse
-from app.utils.response import success_response, error_response
-from app.utils.utils import require_admin
-from app.utils.paths import static_path
+from app.utils.response import success_response, error_response, etag_response
+from app.settings import public_base_url
+from app.utils.utils import require_admin, CurrentUser
+from app.utils.paths import static_path, url_filename, ABSOLUTE_URL_PREFIXES
+from app.utils.uploads import store_upload, store_stream, cleanup_unreferenced, EmptyUpload
 
 router = APIRouter(prefix="/news", tags=["News"])
 
 NEWS_IMAGES_DIR = static_path("News", "images", ensure=True)
 NEWS_VIDEOS_DIR = static_path("News", "videos", ensure=True)
 
+# Formatted public news list per base URL; dropped on any news write, and on
+# TTL so other workers (and Read_count) catch up
+_NEWS_CACHE = TTLCache(maxsize=16, ttl=30)
+_NEWS_LOCK = threading.Lock()
+
 
 # -------------------------
 # Helper: format NewsResponse with URLs
 # -------------------------
-def format_news(news: News, request: Request) -> dict:
-    item = NewsResponse.from_orm(news).dict()
-    base_url = str(request.base_url).rstrip("/")
-    if item.get("ImagePath"):
-        item["ImagePath"] = f"{base_url}/static/News/images/{quote(os.path.basename(item['ImagePath']))}"
-    if item.get("VideoPath"):
-        item["VideoPath"] = f"{base_url}/static/News/videos/{quote(os.path.basename(item['VideoPath']))}"
-    return item
+# Builds the NewsResponse fields by hand: no per-row pydantic validation on lists.
+# base_url is public_base_url(request), resolved once per request by the caller
+def format_news(news: News, base_url: str) -> dict:
+    image_path = news.ImagePath
+    if image_path and not image_path.startswith(ABSOLUTE_URL_PREFIXES):
+        image_path = f"{base_url}/static/News/images/{url_filename(image_path)}"
+    video_path = news.VideoPath
+    if video_path and not video_path.startswith(ABSOLUTE_URL_PREFIXES):
+        video_path = f"{base_url}/static/News/videos/{url_filename(video_path)}"
+    return {
+        "TitleEn": news.TitleEn,
+        "TitleAr": news.TitleAr,
+        "DescriptionEn": news.DescriptionEn,
+        "DescriptionAr": news.DescriptionAr,
+        "ImagePath": image_path,
+        "VideoPath": video_path,
+        "Is_slide": news.Is_slide,
+        "Is_delete": news.Is_delete,
+        "Read_count": news.Read_count,
+        "NewsID": news.NewsID,
+        "CreatedAt": news.CreatedAt,
+        "UpdatedAt": news.UpdatedAt,
+        "CreatedByUserID": news.CreatedByUserID,
+        "UpdatedByUserID": news.UpdatedByUserID,
+    }
+
+
+def _public_news(db: Session, request: Request) -> list:
+    """All non-deleted news, newest first; one query serves both /all and /slider."""
+    key = public_base_url(request)
+    with _NEWS_LOCK:
+        data = _NEWS_CACHE.get(key)
+    if data is None:
+        # Query outside the lock; two concurrent misses just load it twice
+        news_list = db.query(News).filter(News.Is_delete == False).order_by(News.CreatedAt.desc()).all()
+        data = [format_news(n, key) for n in news_list]
+        with _NEWS_LOCK:
+            _NEWS_CACHE[key] = data
+    return data
+
+
+async def _store_news_file(upload: UploadFile, directory: str) -> str:
+    name = await run_in_threadpool(store_upload, upload.file, directory, upload.filename, max_size=None)
+    return os.path.join(directory, name)
+
+
+def _bump_read_count(news_id: int):
+    # Runs after the response; a single atomic UPDATE in its own session
+    with SessionLocal() as db:
+        db.execute(
+            update(News)
+            .where(News.NewsID == news_id)
+            .values(Read_count=func.coalesce(News.Read_count, 0) + 1)
+        )
+        db.commit()
+
+
+def _invalidate_news_cache():
+    with _NEWS_LOCK:
+        _NEWS_CACHE.clear()
 
 
 # -------------------------
@@ -39,37 +101,34 @@ def format_news(news: News, request: Request) -> dict:
 # -------------------------
 @router.get("/slider")
 def get_news_slider(request: Request, db: Session = Depends(get_db)):
-    news_list = db.query(News).filter(News.Is_slide == True, News.Is_delete != True).order_by(News.CreatedAt.desc()).limit(4).all()
-    data = [format_news(n, request) for n in news_list]
-    return success_response(
+    data = [n for n in _public_news(db, request) if n["Is_slide"]][:4]
+    return etag_response(request, success_response(
         "Slider news retrieved successfully",
         "تم جلب أخبار السلايدر بنجاح",
         data
-    )
+    ))
 
 
 @router.get("/all")
 def get_all_news(request: Request, db: Session = Depends(get_db)):
-    news_list = db.query(News).filter(News.Is_delete != True).order_by(News.CreatedAt.desc()).all()
-    data = [format_news(n, request) for n in news_list]
-    return success_response(
+    data = _public_news(db, request)
+    return etag_response(request, success_response(
         "All news retrieved successfully",
         "تم جلب جميع الأخبار بنجاح",
         data
-    )
+    ))
 
 
 @router.get("/{news_id}")
-def get_news_details(news_id: int, request: Request, db: Session = Depends(get_db)):
-    news = db.query(News).filter(News.NewsID == news_id, News.Is_delete != True).first()
+def get_news_details(news_id: int, request: Request, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    news = db.query(News).filter(News.NewsID == news_id, News.Is_delete == False).first()
     if not news:
         return error_response("News not found", "لم يتم العثور على الخبر")
 
-    news.Read_count = (news.Read_count or 0) + 1
-    db.commit()
-    db.refresh(news)
+    background_tasks.add_task(_bump_read_count, news_id)
 
-    data = format_news(news, request)
+    data = format_news(news, public_base_url(request))
+    data["Read_count"] = (news.Read_count or 0) + 1
     return success_response(
         "News details retrieved successfully",
         "تم جلب تفاصيل الخبر بنجاح",
@@ -81,7 +140,7 @@ def get_news_details(news_id: int, request: Request, db: Session = Depends(get_d
 # Admin Endpoints
 # -------------------------
 @router.post("/admin/create")
-def create_news(
+async def create_news(
     TitleEn: str = Form(...),
     TitleAr: str = Form(...),
     DescriptionEn: Optional[str] = Form(None),
@@ -89,22 +148,19 @@ def create_news(
     Is_slide: Optional[bool] = Form(False),
     ImagePath: Optional[UploadFile] = File(None),
     VideoPath: Optional[UploadFile] = File(None),
-    current_user: User = Depends(require_admin),
+    current_user: CurrentUser = Depends(require_admin),
     db: Session = Depends(get_db),
     request: Request = None
 ):
     image_path = None
     video_path = None
 
+    # Content-hashed names: the static URL changes whenever the file does
     if ImagePath:
-        image_path = os.path.join(NEWS_IMAGES_DIR, ImagePath.filename)
-        with open(image_path, "wb") as buffer:
-            shutil.copyfileobj(ImagePath.file, buffer)
+        image_path = await _store_news_file(ImagePath, NEWS_IMAGES_DIR)
 
     if VideoPath:
-        video_path = os.path.join(NEWS_VIDEOS_DIR, VideoPath.filename)
-        with open(video_path, "wb") as buffer:
-            shutil.copyfileobj(VideoPath.file, buffer)
+        video_path = await _store_news_file(VideoPath, NEWS_VIDEOS_DIR)
 
     new_news = News(
         TitleEn=TitleEn,
@@ -120,11 +176,15 @@ def create_news(
         Read_count=0
     )
 
-    db.add(new_news)
-    db.commit()
-    db.refresh(new_news)
+    def _save_news():
+        db.add(new_news)
+        db.commit()
+        db.refresh(new_news)
+
+    await run_in_threadpool(_save_news)
+    _invalidate_news_cache()
 
-    data = format_news(new_news, request)
+    data = format_news(new_news, public_base_url(request))
     return success_response(
         "News created successfully",
         "تم إنشاء الخبر بنجاح",
@@ -133,8 +193,9 @@ def create_news(
 
 
 @router.put("/admin/{news_id}")
-def update_news(
+async def update_news(
     news_id: int,
+    background_tasks: BackgroundTasks,
     TitleEn: Optional[str] = Form(None),
     TitleAr: Optional[str] = Form(None),
     DescriptionEn: Optional[str] = Form(None),
@@ -142,11 +203,13 @@ def update_news(
     Is_slide: Optional[bool] = Form(None),
     ImagePath: Optional[UploadFile] = File(None),
     VideoPath: Optional[UploadFile] = File(None),
-    current_user: User = Depends(require_admin),
+    current_user: CurrentUser = Depends(require_admin),
     db: Session = Depends(get_db),
     request: Request = None
 ):
-    news = db.query(News).filter(News.NewsID == news_id, News.Is_delete != True).first()
+    news = await run_in_threadpool(
+        db.query(News).filter(News.NewsID == news_id, News.Is_delete == False).first
+    )
     if not news:
         return error_response("News not found", "لم يتم العثور على الخبر")
 
@@ -156,29 +219,90 @@ def update_news(
     if DescriptionAr is not None: news.DescriptionAr = DescriptionAr
     if Is_slide is not None: news.Is_slide = Is_slide
 
+    replaced = []
     if ImagePath:
-        if news.ImagePath and os.path.exists(news.ImagePath):
-            os.remove(news.ImagePath)
-        image_path = os.path.join(NEWS_IMAGES_DIR, ImagePath.filename)
-        with open(image_path, "wb") as buffer:
-            shutil.copyfileobj(ImagePath.file, buffer)
+        image_path = await _store_news_file(ImagePath, NEWS_IMAGES_DIR)
+        if news.ImagePath and news.ImagePath != image_path:
+            replaced.append((News.ImagePath, news.ImagePath))
         news.ImagePath = image_path
 
     if VideoPath:
-        if news.VideoPath and os.path.exists(news.VideoPath):
-            os.remove(news.VideoPath)
-        video_path = os.path.join(NEWS_VIDEOS_DIR, VideoPath.filename)
-        with open(video_path, "wb") as buffer:
-            shutil.copyfileobj(VideoPath.file, buffer)
+        video_path = await _store_news_file(VideoPath, NEWS_VIDEOS_DIR)
+        if news.VideoPath and news.VideoPath != video_path:
+            replaced.append((News.VideoPath, news.VideoPath))
         news.VideoPath = video_path
 
     news.UpdatedAt = datetime.utcnow()
     news.UpdatedByUserID = current_user.UserID
 
-    db.commit()
-    db.refresh(news)
+    def _save_news():
+        db.commit()
+        db.refresh(news)
+
+    await run_in_threadpool(_save_news)
+    # Identical uploads share one file, so replaced files are removed after the
+    # response only once nothing points at them
+    for column, old_path in replaced:
+        background_tasks.add_task(cleanup_unreferenced, column, old_path)
+    _invalidate_news_cache()
+
+    data = format_news(news, public_base_url(request))
+    return success_response(
+        "News updated successfully",
+        "تم تحديث الخبر بنجاح",
+        data
+    )
+
+
+@router.put("/admin/{news_id}/{media}")
+async def upload_news_media(
+    news_id: int,
+    media: Literal["image", "video"],
+    request: Request,
+    background_tasks: BackgroundTasks,
+    filename: str = Query(...),
+    current_user: CurrentUser = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Replace a news image or video with the raw request body (not multipart).
+
+    The body is hashed and written to disk as it streams in, so large videos
+    skip the spooled temp-file copy that UploadFile makes.
+    """
+    column = News.ImagePath if media == "image" else News.VideoPath
+    directory = NEWS_IMAGES_DIR if media == "image" else NEWS_VIDEOS_DIR
+
+    current = await run_in_threadpool(
+        db.query(column).filter(News.NewsID == news_id, News.Is_delete == False).first
+    )
+    if not current:
+        return error_response("News not found", "لم يتم العثور على الخبر")
 
-    data = format_news(news, request)
+    try:
+        new_path = os.path.join(directory, await store_stream(request.stream(), directory, filename, max_size=None))
+    except EmptyUpload:
+        return ORJSONResponse(
+            status_code=400,
+            content=error_response("Request body is empty", "محتوى الطلب فارغ", "EMPTY_FILE")
+        )
+    old_path = current[0]
+
+    def _save_news():
+        db.query(News).filter(News.NewsID == news_id).update(
+            {column: new_path, News.UpdatedAt: datetime.utcnow(), News.UpdatedByUserID: current_user.UserID},
+            synchronize_session=False
+        )
+        db.commit()
+        return db.query(News).filter(News.NewsID == news_id).first()
+
+    news = await run_in_threadpool(_save_news)
+    _invalidate_news_cache()
+    # Identical uploads share one file, so only drop it once nothing points at it
+    if old_path and old_path != new_path:
+        background_tasks.add_task(cleanup_unreferenced, column, old_path)
+
+    data = format_news(news, public_base_url(request))
     return success_response(
         "News updated successfully",
         "تم تحديث الخبر بنجاح",
@@ -187,8 +311,8 @@ def update_news(
 
 
 @router.delete("/admin/{news_id}")
-def delete_news(news_id: int, current_user: User = Depends(require_admin), db: Session = Depends(get_db)):
-    news = db.query(News).filter(News.NewsID == news_id, News.Is_delete != True).first()
+def delete_news(news_id: int, current_user: CurrentUser = Depends(require_admin), db: Session = Depends(get_db)):
+    news = db.query(News).filter(News.NewsID == news_id, News.Is_delete == False).first()
     if not news:
         return error_response("News not found", "لم يتم العثور على الخبر")
 
@@ -197,6 +321,7 @@ def delete_news(news_id: int, current_user: User = Depends(require_admin), db: S
     news.UpdatedByUserID = current_user.UserID
 
     db.commit()
+    _invalidate_news_cache()
     return success_response(
         "News soft-deleted successfully",
         "تم حذف الخبر بنجاح"
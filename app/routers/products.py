@@ -1,18 +1,24 @@
 # routers/products.py
-from fastapi import APIRouter, Depends, Request, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, Request, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 from datetime import datetime
-from typing import Optional, List
-import os, shutil
-from urllib.parse import quote
+from itertools import zip_longest
+from typing import Literal, Optional, List
+import os
 
 from app.models.products import Product
-from app.models.users import User
 from app.schemas.products import ProductResponse
-from app.utils.response import success_response, error_response
-from app.database import get_db
-from app.utils.utils import require_admin
-from app.utils.paths import static_path
+from app.utils.response import success_response, error_response, etag_response, row_to_dict
+from app.settings import public_base_url
+from app.database import get_async_db
+from app.utils.utils import require_admin, CurrentUser
+from app.utils.pagination import keyset_page
+from app.utils.paths import static_path, url_filename
+from app.utils.uploads import store_upload, store_stream, cleanup_unreferenced, EmptyUpload
 
 router = APIRouter(prefix="/products", tags=["Products"])
 
@@ -23,77 +29,103 @@ PRODUCT_VIDEOS_DIR = static_path("Products", "videos", ensure=True)
 # -------------------------
 # Helper functions
 # -------------------------
+def _split_field(value: Optional[str]) -> List[str]:
+    return [part.strip() for part in value.split(",")] if value else []
+
+
 def parse_services(product: Product) -> List[dict]:
     """
     Convert comma-separated services fields into structured list.
     """
-    names = (product.ServicesName or "").split(",") if product.ServicesName else []
-    descriptions = (product.ServicesDescription or "").split(",") if product.ServicesDescription else []
-    links = (product.ServicesLink or "").split(",") if product.ServicesLink else []
+    names = _split_field(product.ServicesName)
+    descriptions = _split_field(product.ServicesDescription)
+    links = _split_field(product.ServicesLink)
 
-    services = []
-    for i in range(max(len(names), len(descriptions), len(links))):
-        services.append({
-            "Name": names[i].strip() if i < len(names) else None,
-            "Description": descriptions[i].strip() if i < len(descriptions) else None,
-            "Link": links[i].strip() if i < len(links) else None
-        })
-    return services
+    # Shorter lists are padded with None, as before
+    return [
+        {"Name": name, "Description": description, "Link": link}
+        for name, description, link in zip_longest(names, descriptions, links)
+    ]
 
 
-def format_product(product: Product, request: Request) -> dict:
+_PRODUCT_FIELDS = tuple(ProductResponse.model_fields)
+_product_to_dict = row_to_dict(_PRODUCT_FIELDS)
+# List queries load only the ProductResponse columns (no audit/IsDeleted fields)
+_PRODUCT_LIST_COLUMNS = tuple(getattr(Product, name) for name in _PRODUCT_FIELDS)
+
+
+def format_products(products: List[Product], base_url: str) -> List[dict]:
     """
-    Format product info with services list and full image/video URLs.
+    Format products with services lists and full image/video URLs.
+    base_url is public_base_url(request), resolved once per request by the caller.
     """
-    item = ProductResponse.from_orm(product).dict()
-    item["Services"] = parse_services(product)
+    items = [_product_to_dict(p) for p in products]
+    image_prefix = f"{base_url}/static/Products/images/"
+    video_prefix = f"{base_url}/static/Products/videos/"
+    for item, product in zip(items, products):
+        item["Services"] = parse_services(product)
 
-    # Remove old individual service fields
-    item.pop("ServicesName", None)
-    item.pop("ServicesDescription", None)
-    item.pop("ServicesLink", None)
+        # Remove old individual service fields
+        del item["ServicesName"], item["ServicesDescription"], item["ServicesLink"]
 
-    base_url = str(request.base_url).rstrip("/")
+        if item["ImagePath"]:
+            item["ImagePath"] = image_prefix + url_filename(item["ImagePath"])
+        if item["VideoPath"]:
+            item["VideoPath"] = video_prefix + url_filename(item["VideoPath"])
 
-    if item.get("ImagePath"):
-        item["ImagePath"] = f"{base_url}/static/Products/images/{quote(os.path.basename(item['ImagePath']))}"
-    if item.get("VideoPath"):
-        item["VideoPath"] = f"{base_url}/static/Products/videos/{quote(os.path.basename(item['VideoPath']))}"
+    return items
 
-    return item
+
+def format_product(product: Product, request: Request) -> dict:
+    return format_products([product], public_base_url(request))[0]
 
 
-def save_uploaded_file(upload: UploadFile, folder: str) -> str:
+async def save_uploaded_file(upload: UploadFile, folder: str) -> str:
     """
     Save uploaded image or video and return path.
+    The name is content-hashed, so uploads sharing a filename no longer overwrite each other.
     """
-    file_path = os.path.join(folder, upload.filename)
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(upload.file, buffer)
-    return file_path
+    stored_name = await run_in_threadpool(store_upload, upload.file, folder, upload.filename, max_size=None)
+    return os.path.join(folder, stored_name)
 
 
 # -------------------------
 # Public Endpoints
 # -------------------------
 @router.get("/all")
-def get_all_products(request: Request, db: Session = Depends(get_db)):
-    products = db.query(Product).filter(Product.IsDeleted != True).order_by(Product.CreatedAt.desc()).all()
-    data = [format_product(p, request) for p in products]
-    return success_response(
+async def get_all_products(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=200, description="Page size; omit for the full list"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    stmt = select(Product).options(load_only(*_PRODUCT_LIST_COLUMNS)).where(Product.IsDeleted == False)
+
+    if limit is None:
+        products = (await db.scalars(stmt.order_by(Product.CreatedAt.desc(), Product.ProductID.desc()))).all()
+        data = format_products(products, public_base_url(request))
+    else:
+        try:
+            products, next_cursor = await keyset_page(db, stmt, Product.CreatedAt, Product.ProductID, limit, cursor)
+        except ValueError:
+            return error_response("Invalid cursor", "مؤشر الصفحة غير صالح")
+        items = format_products(products, public_base_url(request))
+        data = {"limit": limit, "count": len(items), "next_cursor": next_cursor, "products": items}
+
+    return etag_response(request, success_response(
         "Products retrieved successfully",
         "تم جلب المنتجات بنجاح",
         data
-    )
+    ))
 
 
 # -------------------------
 # Admin Endpoints
 # -------------------------
 @router.get("/admin")
-def get_all_products_admin(request: Request, _: User = Depends(require_admin), db: Session = Depends(get_db)):
-    products = db.query(Product).order_by(Product.CreatedAt.desc()).all()
-    data = [format_product(p, request) for p in products]
+async def get_all_products_admin(request: Request, _: CurrentUser = Depends(require_admin), db: AsyncSession = Depends(get_async_db)):
+    products = (await db.scalars(select(Product).options(load_only(*_PRODUCT_LIST_COLUMNS)).order_by(Product.CreatedAt.desc()))).all()
+    data = format_products(products, public_base_url(request))
     return success_response(
         "All products retrieved successfully",
         "تم جلب جميع المنتجات بنجاح",
@@ -102,15 +134,15 @@ def get_all_products_admin(request: Request, _: User = Depends(require_admin), d
 
 
 @router.get("/{product_id}")
-def get_product(
+async def get_product(
     product_id: int,
     request: Request,
-    db: Session = Depends(get_db),   # <-- removed require_admin
+    db: AsyncSession = Depends(get_async_db),   # <-- removed require_admin
 ):
-    product = db.query(Product).filter(
+    product = await db.scalar(select(Product).where(
         Product.ProductID == product_id,
-        Product.IsDeleted != True
-    ).first()
+        Product.IsDeleted == False
+    ))
 
     if not product:
         return error_response("Product not found", "لم يتم العثور على المنتج")
@@ -126,7 +158,7 @@ def get_product(
 
 
 @router.post("/add")
-def create_product(
+async def create_product(
     NameEn: str = Form(...),
     NameAr: Optional[str] = Form(None),
     DescriptionEn: Optional[str] = Form(None),
@@ -136,12 +168,12 @@ def create_product(
     ServicesLink: Optional[str] = Form(None),
     ImagePath: Optional[UploadFile] = File(None),
     VideoPath: Optional[UploadFile] = File(None),
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db),
     request: Request = None
 ):
-    image_path = save_uploaded_file(ImagePath, PRODUCT_IMAGES_DIR) if ImagePath else None
-    video_path = save_uploaded_file(VideoPath, PRODUCT_VIDEOS_DIR) if VideoPath else None
+    image_path = await save_uploaded_file(ImagePath, PRODUCT_IMAGES_DIR) if ImagePath else None
+    video_path = await save_uploaded_file(VideoPath, PRODUCT_VIDEOS_DIR) if VideoPath else None
 
     new_product = Product(
         NameEn=NameEn,
@@ -159,8 +191,7 @@ def create_product(
     )
 
     db.add(new_product)
-    db.commit()
-    db.refresh(new_product)
+    await db.commit()
     data = format_product(new_product, request)
     return success_response(
         "Product created successfully",
@@ -170,8 +201,9 @@ def create_product(
 
 
 @router.put("/{product_id}")
-def update_product(
+async def update_product(
     product_id: int,
+    background_tasks: BackgroundTasks,
     NameEn: Optional[str] = Form(None),
     NameAr: Optional[str] = Form(None),
     DescriptionEn: Optional[str] = Form(None),
@@ -181,11 +213,11 @@ def update_product(
     ServicesLink: Optional[str] = Form(None),
     ImagePath: Optional[UploadFile] = File(None),
     VideoPath: Optional[UploadFile] = File(None),
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db),
     request: Request = None
 ):
-    product = db.query(Product).filter(Product.ProductID == product_id, Product.IsDeleted != True).first()
+    product = await db.scalar(select(Product).where(Product.ProductID == product_id, Product.IsDeleted == False))
     if not product:
         return error_response("Product not found", "لم يتم العثور على المنتج")
 
@@ -197,20 +229,76 @@ def update_product(
     if ServicesDescription is not None: product.ServicesDescription = ServicesDescription
     if ServicesLink is not None: product.ServicesLink = ServicesLink
 
+    replaced = []
     if ImagePath:
-        if product.ImagePath and os.path.exists(product.ImagePath):
-            os.remove(product.ImagePath)
-        product.ImagePath = save_uploaded_file(ImagePath, PRODUCT_IMAGES_DIR)
+        new_path = await save_uploaded_file(ImagePath, PRODUCT_IMAGES_DIR)
+        if product.ImagePath and product.ImagePath != new_path:
+            replaced.append((Product.ImagePath, product.ImagePath))
+        product.ImagePath = new_path
 
     if VideoPath:
-        if product.VideoPath and os.path.exists(product.VideoPath):
-            os.remove(product.VideoPath)
-        product.VideoPath = save_uploaded_file(VideoPath, PRODUCT_VIDEOS_DIR)
+        new_path = await save_uploaded_file(VideoPath, PRODUCT_VIDEOS_DIR)
+        if product.VideoPath and product.VideoPath != new_path:
+            replaced.append((Product.VideoPath, product.VideoPath))
+        product.VideoPath = new_path
+
+    product.UpdatedAt = datetime.utcnow()
+    product.UpdatedByUserID = current_user.UserID
+    await db.commit()
+
+    # Replaced files are removed after the response, once nothing points at them
+    # (uploads are content-addressed, so two products can share one file)
+    for column, old_path in replaced:
+        background_tasks.add_task(cleanup_unreferenced, column, old_path)
+
+    data = format_product(product, request)
+    return success_response(
+        "Product updated successfully",
+        "تم تحديث المنتج بنجاح",
+        data
+    )
+
+
+@router.put("/{product_id}/{media}")
+async def upload_product_media(
+    product_id: int,
+    media: Literal["image", "video"],
+    request: Request,
+    background_tasks: BackgroundTasks,
+    filename: str = Query(...),
+    current_user: CurrentUser = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Replace a product image or video with the raw request body (not multipart).
+
+    The body is written to disk as it streams in, so large videos skip the
+    spooled temp-file copy that UploadFile makes.
+    """
+    product = await db.scalar(select(Product).where(Product.ProductID == product_id, Product.IsDeleted == False))
+    if not product:
+        return error_response("Product not found", "لم يتم العثور على المنتج")
+
+    column = Product.ImagePath if media == "image" else Product.VideoPath
+    directory = PRODUCT_IMAGES_DIR if media == "image" else PRODUCT_VIDEOS_DIR
+
+    try:
+        new_path = os.path.join(directory, await store_stream(request.stream(), directory, filename, max_size=None))
+    except EmptyUpload:
+        return ORJSONResponse(
+            status_code=400,
+            content=error_response("Request body is empty", "محتوى الطلب فارغ", "EMPTY_FILE")
+        )
+    old_path = getattr(product, column.key)
+    setattr(product, column.key, new_path)
 
     product.UpdatedAt = datetime.utcnow()
     product.UpdatedByUserID = current_user.UserID
-    db.commit()
-    db.refresh(product)
+    await db.commit()
+
+    if old_path and old_path != new_path:
+        background_tasks.add_task(cleanup_unreferenced, column, old_path)
+
     data = format_product(product, request)
     return success_response(
         "Product updated successfully",
@@ -220,15 +308,15 @@ def update_product(
 
 
 @router.delete("/{product_id}")
-def delete_product(product_id: int, current_user: User = Depends(require_admin), db: Session = Depends(get_db)):
-    product = db.query(Product).filter(Product.ProductID == product_id, Product.IsDeleted != True).first()
+async def delete_product(product_id: int, current_user: CurrentUser = Depends(require_admin), db: AsyncSession = Depends(get_async_db)):
+    product = await db.scalar(select(Product).where(Product.ProductID == product_id, Product.IsDeleted == False))
     if not product:
         return error_response("Product not found", "لم يتم العثور على المنتج")
 
     product.IsDeleted = True
     product.UpdatedAt = datetime.utcnow()
     product.UpdatedByUserID = current_user.UserID
-    db.commit()
+    await db.commit()
     return success_response(
         "Product soft-deleted successfully",
         "تم حذف المنتج بنجاح"
@@ -1,38 +1,47 @@
 # routers/project_details.py
 from fastapi import APIRouter, Depends, Body
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 from datetime import datetime
 from app.models.project_details import ProjectDetails
-from app.models.users import User
 from app.schemas.project_details import (
     ProjectDetailResponse,
     ProjectDetailCreate,
     ProjectDetailUpdate,
 )
-from app.utils.response import success_response, error_response
-from app.database import get_db
-from app.utils.utils import require_admin
+from app.utils.response import success_response, error_response, row_to_dict
+from app.database import get_async_db
+from app.utils.utils import require_admin, CurrentUser
 
 router = APIRouter(prefix="/project-details", tags=["ProjectDetails"])
 
+# Attribute is decoded by its JSONDict column type, so it is copied as-is too
+_DETAIL_FIELDS = tuple(ProjectDetailResponse.model_fields)
+# The list query loads only the ProjectDetailResponse columns (no audit/IsDeleted fields)
+_DETAIL_LIST_COLUMNS = tuple(getattr(ProjectDetails, name) for name in _DETAIL_FIELDS)
+
+
+format_detail = row_to_dict(_DETAIL_FIELDS)
+
 
 # ---------------- Public Endpoint ----------------
 @router.get("/project/{project_id}")
-def get_project_details(project_id: int, db: Session = Depends(get_db)):
+async def get_project_details(project_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Get all details for a specific project.
     Returns Attribute and AttributeAr as dicts.
     """
-    details = (
-        db.query(ProjectDetails)
-        .filter(ProjectDetails.ProjectID == project_id, ProjectDetails.IsDeleted == False)
+    details = (await db.scalars(
+        select(ProjectDetails)
+        .options(load_only(*_DETAIL_LIST_COLUMNS))
+        .where(ProjectDetails.ProjectID == project_id, ProjectDetails.IsDeleted == False)
         .order_by(ProjectDetails.Year, ProjectDetails.Quarter)
-        .all()
-    )
+    )).all()
     if not details:
         return error_response("No details for this project", "لا توجد تفاصيل لهذا المشروع")
 
-    data = [ProjectDetailResponse.from_orm(d).dict() for d in details]
+    data = [format_detail(d) for d in details]
     return success_response(
         "Project details retrieved successfully",
         "تم جلب تفاصيل المشروع بنجاح",
@@ -42,11 +51,11 @@ def get_project_details(project_id: int, db: Session = Depends(get_db)):
 
 # ---------------- Admin Endpoints ----------------
 @router.post("/add/{project_id}")
-def create_project_detail(
+async def create_project_detail(
     project_id: int,
     payload: ProjectDetailCreate,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Create a new project detail for a specific project.
@@ -59,27 +68,26 @@ def create_project_detail(
         CreatedByUserID=current_user.UserID,
     )
     db.add(new_detail)
-    db.commit()
-    db.refresh(new_detail)
+    await db.commit()
     return success_response(
         "Project detail created successfully",
         "تم إنشاء تفاصيل المشروع بنجاح",
-        ProjectDetailResponse.from_orm(new_detail).dict()
+        format_detail(new_detail)
     )
 
 
 @router.put("/{detail_id}")
-def update_project_detail(
+async def update_project_detail(
     detail_id: int,
     payload: ProjectDetailUpdate = Body(...),
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Update one or more fields of a project detail.
     Partial update supported.
     """
-    detail = db.query(ProjectDetails).filter(ProjectDetails.ProjectDetailID == detail_id).first()
+    detail = await db.get(ProjectDetails, detail_id)
     if not detail:
         return error_response("Project detail not found", "لم يتم العثور على تفاصيل المشروع")
 
@@ -89,32 +97,31 @@ def update_project_detail(
 
     detail.UpdatedAt = datetime.utcnow()
     detail.UpdatedByUserID = current_user.UserID
-    db.commit()
-    db.refresh(detail)
+    await db.commit()
     return success_response(
         "Project detail updated successfully",
         "تم تحديث تفاصيل المشروع بنجاح",
-        ProjectDetailResponse.from_orm(detail).dict()
+        format_detail(detail)
     )
 
 
 @router.delete("/{detail_id}")
-def delete_project_detail(
+async def delete_project_detail(
     detail_id: int,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Soft delete a project detail.
     """
-    detail = db.query(ProjectDetails).filter(ProjectDetails.ProjectDetailID == detail_id).first()
+    detail = await db.get(ProjectDetails, detail_id)
     if not detail:
         return error_response("Project detail not found", "لم يتم العثور على تفاصيل المشروع")
 
     detail.IsDeleted = True
     detail.UpdatedAt = datetime.utcnow()
     detail.UpdatedByUserID = current_user.UserID
-    db.commit()
+    await db.commit()
     return success_response(
         "Project detail deleted successfully",
         "تم حذف تفاصيل المشروع بنجاح"
@@ -123,18 +130,17 @@ def delete_project_detail(
 
 # ---------------- Optional: Get single detail by ID ----------------
 @router.get("/{detail_id}")
-def get_single_project_detail(
+async def get_single_project_detail(
     detail_id: int,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Get a single project detail by ID (admin only).
     """
-    detail = (
-        db.query(ProjectDetails)
-        .filter(ProjectDetails.ProjectDetailID == detail_id, ProjectDetails.IsDeleted == False)
-        .first()
+    detail = await db.scalar(
+        select(ProjectDetails)
+        .where(ProjectDetails.ProjectDetailID == detail_id, ProjectDetails.IsDeleted == False)
     )
     if not detail:
         return error_response("Project detail not found", "لم يتم العثور على تفاصيل المشروع")
@@ -142,5 +148,5 @@ def get_single_project_detail(
     return success_response(
         "Project detail retrieved successfully",
         "تم جلب تفاصيل المشروع بنجاح",
-        ProjectDetailResponse.from_orm(detail).dict()
+        format_detail(detail)
     )
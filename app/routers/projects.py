@@ -1,39 +1,62 @@
 # routers/projects.py
-from fastapi import APIRouter, Depends, Body
-from sqlalchemy import func # Import the func module for coalesce
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Body, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 from datetime import datetime
-from app.models.projects import Projects
-from app.models.users import User
+from typing import Optional
+from app.models.projects import Projects, active_projects
 from app.schemas.projects import ProjectResponse, ProjectCreate, ProjectUpdate
-from app.utils.response import success_response, error_response
-from app.database import get_db
-from app.utils.utils import require_admin
+from app.utils.response import success_response, error_response, etag_response, row_to_dict
+from app.utils.pagination import keyset_page
+from app.database import get_async_db
+from app.utils.utils import require_admin, CurrentUser
 
 router = APIRouter(prefix="/projects", tags=["Projects"])
 
+_PROJECT_FIELDS = tuple(ProjectResponse.model_fields)
+# List queries load only the ProjectResponse columns (no audit/IsDeleted fields)
+_PROJECT_LIST_COLUMNS = tuple(getattr(Projects, name) for name in _PROJECT_FIELDS)
+
+
+format_project = row_to_dict(_PROJECT_FIELDS)
+
 
 # ----------- Public Endpoint -----------
 @router.get("/all")
-def get_projects_home(db: Session = Depends(get_db)):
-    projects = db.query(Projects).filter(func.coalesce(Projects.IsDeleted, False) == False).order_by(Projects.CreatedAt.desc()).all()
+async def get_projects_home(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=200, description="Page size; omit for the full list"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if limit is None:
+        projects = (await db.scalars(active_projects().options(load_only(*_PROJECT_LIST_COLUMNS)).order_by(Projects.CreatedAt.desc(), Projects.ProjectID.desc()))).all()
+    else:
+        try:
+            projects, next_cursor = await keyset_page(db, active_projects().options(load_only(*_PROJECT_LIST_COLUMNS)), Projects.CreatedAt, Projects.ProjectID, limit, cursor)
+        except ValueError:
+            return error_response("Invalid cursor", "مؤشر الصفحة غير صالح")
     if not projects:
         return error_response("No projects found", "لا توجد مشاريع")
-    projects_data = [ProjectResponse.from_orm(p).dict() for p in projects]
-    return success_response(
+
+    projects_data = [format_project(p) for p in projects]
+    if limit is not None:
+        projects_data = {"limit": limit, "count": len(projects_data), "next_cursor": next_cursor, "projects": projects_data}
+    return etag_response(request, success_response(
         "Projects retrieved successfully",
         "تم جلب المشاريع بنجاح",
         projects_data
-    )
+    ))
 
 
 # ----------- Admin Endpoints -----------
 @router.get("/admin")
-def get_all_projects_admin(_: User = Depends(require_admin), db: Session = Depends(get_db)):
-    projects = db.query(Projects).order_by(Projects.CreatedAt.desc()).all()
+async def get_all_projects_admin(_: CurrentUser = Depends(require_admin), db: AsyncSession = Depends(get_async_db)):
+    projects = (await db.scalars(select(Projects).options(load_only(*_PROJECT_LIST_COLUMNS)).order_by(Projects.CreatedAt.desc()))).all()
     if not projects:
         return error_response("No projects found", "لا توجد مشاريع")
-    projects_data = [ProjectResponse.from_orm(p).dict() for p in projects]
+    projects_data = [format_project(p) for p in projects]
     return success_response(
         "Projects retrieved successfully",
         "تم جلب المشاريع بنجاح",
@@ -42,11 +65,11 @@ def get_all_projects_admin(_: User = Depends(require_admin), db: Session = Depen
 
 
 @router.get("/{project_id}")
-def get_project(project_id: int, _: User = Depends(require_admin), db: Session = Depends(get_db)):
-    project = db.query(Projects).filter(Projects.ProjectID == project_id).first()
+async def get_project(project_id: int, _: CurrentUser = Depends(require_admin), db: AsyncSession = Depends(get_async_db)):
+    project = await db.get(Projects, project_id)
     if not project:
         return error_response("Project not found", "المشروع غير موجود")
-    project_data = ProjectResponse.from_orm(project).dict()
+    project_data = format_project(project)
     return success_response(
         "Project retrieved successfully",
         "تم جلب المشروع بنجاح",
@@ -55,10 +78,10 @@ def get_project(project_id: int, _: User = Depends(require_admin), db: Session =
 
 
 @router.post("/add")
-def create_project(
+async def create_project(
     payload: ProjectCreate,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db),
 ):
     new_project = Projects(
         **payload.dict(),
@@ -66,9 +89,8 @@ def create_project(
         CreatedByUserID=current_user.UserID
     )
     db.add(new_project)
-    db.commit()
-    db.refresh(new_project)
-    project_data = ProjectResponse.from_orm(new_project).dict()
+    await db.commit()
+    project_data = format_project(new_project)
     return success_response(
         "Project created successfully",
         "تم إنشاء المشروع بنجاح",
@@ -77,13 +99,13 @@ def create_project(
 
 
 @router.put("/{project_id}")
-def update_project(
+async def update_project(
     project_id: int,
     payload: ProjectUpdate = Body(...),
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(require_admin),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    project = db.query(Projects).filter(Projects.ProjectID == project_id).first()
+    project = await db.get(Projects, project_id)
     if not project:
         return error_response("Project not found", "المشروع غير موجود")
 
@@ -91,9 +113,8 @@ def update_project(
         setattr(project, field, value)
     project.UpdatedAt = datetime.utcnow()
     project.UpdatedByUserID = current_user.UserID
-    db.commit()
-    db.refresh(project)
-    project_data = ProjectResponse.from_orm(project).dict()
+    await db.commit()
+    project_data = format_project(project)
     return success_response(
         "Project updated successfully",
         "تم تحديث المشروع بنجاح",
@@ -102,15 +123,15 @@ def update_project(
 
 
 @router.delete("/{project_id}")
-def delete_project(project_id: int, _: User = Depends(require_admin), db: Session = Depends(get_db)):
-    project = db.query(Projects).filter(Projects.ProjectID == project_id).first()
+async def delete_project(project_id: int, current_user: CurrentUser = Depends(require_admin), db: AsyncSession = Depends(get_async_db)):
+    project = await db.get(Projects, project_id)
     if not project:
         return error_response("Project not found", "المشروع غير موجود")
     
     project.IsDeleted = True
     project.UpdatedAt = datetime.utcnow()
-    project.UpdatedByUserID = User.UserID
-    db.commit()
+    project.UpdatedByUserID = current_user.UserID
+    await db.commit()
     return success_response(
         "Project deleted successfully",
         "تم حذف المشروع بنجاح"
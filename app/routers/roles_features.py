@@ -1,14 +1,14 @@
 # routers/role_features.py
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, joinedload, selectinload
 from pydantic import BaseModel
 from typing import List
 from app.database import get_db
 from app.models.role_feature import Role, AppFeature, RoleApp
 from app.schemas.role_feature import *
 from app.utils.response import success_response, error_response
-from app.utils.utils import require_admin, get_current_user
-from app.models.users import User
+from app.utils.utils import require_admin, get_current_user, CurrentUser
 
 router = APIRouter(prefix="/features", tags=["App Features & Roles"])
 
@@ -28,7 +28,8 @@ def create_app_feature(payload: AppFeatureCreate, db: Session = Depends(get_db))
 
 @router.get("/appfeatures", dependencies=[Depends(require_admin)])
 def get_all_features(db: Session = Depends(get_db)):
-    features = db.query(AppFeature).all()
+    # Role links for every feature in one IN query instead of one per feature
+    features = db.query(AppFeature).options(selectinload(AppFeature.role_apps)).all()
     data = []
     for f in features:
         role_ids = [ra.RoleID for ra in f.role_apps]
@@ -91,7 +92,7 @@ def create_role(payload: RoleCreate, db: Session = Depends(get_db)):
 
 @router.get("/roles", dependencies=[Depends(require_admin)])
 def get_all_roles(db: Session = Depends(get_db)):
-    roles = db.query(Role).all()
+    roles = db.query(Role).options(selectinload(Role.features)).all()
     data = []
     for r in roles:
         data.append({
@@ -117,7 +118,7 @@ def assign_feature_to_roles(
     app_feature_id: int,
     payload: AssignFeatureToRolesPayload,
     db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
+    user: CurrentUser = Depends(get_current_user)
 ):
     feature = db.query(AppFeature).filter(AppFeature.AppFeatureID == app_feature_id).first()
     if not feature:
@@ -130,8 +131,12 @@ def assign_feature_to_roles(
     to_add = new_role_ids - existing_role_ids
     to_remove = existing_role_ids - new_role_ids
 
-    for rid in to_add:
-        db.add(RoleApp(RoleID=rid, AppFeatureID=app_feature_id, CreatedByUserID=user.UserID))
+    # One executemany INSERT; no ORM objects to track for plain link rows
+    if to_add:
+        db.execute(insert(RoleApp), [
+            {"RoleID": rid, "AppFeatureID": app_feature_id, "CreatedByUserID": user.UserID}
+            for rid in to_add
+        ])
 
     if to_remove:
         db.query(RoleApp).filter(
@@ -156,7 +161,7 @@ def assign_feature_to_roles(
 
 @router.get("/roles/{role_id}")
 def get_role_details(role_id: int, db: Session = Depends(get_db)):
-    role = db.query(Role).filter(Role.RoleID == role_id).first()
+    role = db.query(Role).options(joinedload(Role.features)).filter(Role.RoleID == role_id).first()
     if not role:
         return error_response("Role not found", "الدور غير موجود")
     data = {
@@ -1,10 +1,10 @@
 # routers/search.py
 
 from fastapi import APIRouter, Depends, Query, Request
+from fastapi_cache.decorator import cache
 from sqlalchemy.orm import Session
-from sqlalchemy import null, or_, func
+from sqlalchemy import UnicodeText, cast, func, literal, null, or_, select, tuple_, union_all
 from typing import Optional, List
-from urllib.parse import quote
 from app.database import SessionLocal
 from app.models.faq import FAQ
 from app.models.metadata import DatasetInfo, MetadataInfo
@@ -15,7 +15,9 @@ from app.models.project_details import ProjectDetails
 from app.models.manual_guide import ManualGuide
 from app.models.videos import Video
 from app.utils.response import success_response, error_response
-from app.utils.paths import normalize_static_subpath
+from app.settings import get_settings, public_base_url
+from app.utils.paths import normalize_static_subpath, url_path
+import hashlib
 import re
 
 router = APIRouter(prefix="/search", tags=["Global Search"])
@@ -36,32 +38,48 @@ def get_db():
 # Helpers
 # ==========================================
 
-def build_image_url(request: Request, image_path: Optional[str]):
+# base_url is public_base_url(request), resolved once per search by the caller
+def build_image_url(base_url: str, image_path: Optional[str]):
     if not image_path:
         return None
     relative_path = normalize_static_subpath(image_path)
-    base_url = str(request.base_url).rstrip("/")
-    encoded = quote(relative_path, safe="/")
-    return f"{base_url}/static/{encoded}"
+    return f"{base_url}/static/{url_path(relative_path)}"
 
 
-def highlight_keywords(text: str, keywords: List[str]) -> str:
-    if not text:
-        return ""
-    for kw in keywords:
-        escaped_kw = re.escape(kw)
-        text = re.sub(rf"({escaped_kw})", r"<mark>\1</mark>", text, flags=re.IGNORECASE)
-    return text
+def highlight_keywords(texts: List[Optional[str]], keywords: List[str]) -> List[str]:
+    """
+    Wrap every keyword match in <mark>, for a whole batch of fields.
+
+    Each keyword's pattern is compiled once per batch rather than once per
+    field; keywords are applied in order, as before.
+    """
+    patterns = [re.compile(re.escape(kw), re.IGNORECASE) for kw in keywords]
+    highlighted = []
+    for text in texts:
+        text = text or ""
+        for pattern in patterns:
+            text = pattern.sub(r"<mark>\g<0></mark>", text)
+        highlighted.append(text)
+    return highlighted
+
+
+_NON_WORD_RE = re.compile(r"[^a-zA-Z0-9\u0600-\u06FF ]+")
+_STOPWORDS = frozenset(["i", "need", "the", "to", "for", "من", "الى", "عن"])
 
 
 def extract_keywords(query: str) -> List[str]:
-    cleaned = re.sub(r"[^a-zA-Z0-9\u0600-\u06FF ]+", " ", query).lower()
+    cleaned = _NON_WORD_RE.sub(" ", query).lower()
     words = cleaned.split()
-    stopwords = set(["i", "need", "the", "to", "for", "من", "الى", "عن"])
-    return [w for w in words if w not in stopwords and len(w) > 2]
+    return [w for w in words if w not in _STOPWORDS and len(w) > 2]
 
 
-def build_search_filter(columns, keywords):
+def build_search_filter(columns, keywords, fulltext=False):
+    if fulltext:
+        # Keywords are single words of letters/digits (see extract_keywords), so they
+        # are safe inside a CONTAINS condition; "kw*" matches words starting with kw
+        condition = " OR ".join(f'"{kw}*"' for kw in keywords)
+        return func.CONTAINS(tuple_(*columns), condition)
+
     conditions = []
     for col in columns:
         for kw in keywords:
@@ -69,179 +87,118 @@ def build_search_filter(columns, keywords):
     return or_(*conditions)
 
 
-def get_primary_key(model):
-    """Return the primary key column of any model."""
-    return list(model.__table__.primary_key.columns)[0]
-
-
 # ==========================================
 # GLOBAL SEARCH LOGIC
 # ==========================================
-def global_search(db: Session, query: str, request: Request, skip=0, limit=10):
+def _text(column):
+    # Every branch of the UNION ALL returns the same NVARCHAR(MAX) shape
+    # (TEXT/NTEXT columns can't be mixed with NVARCHAR otherwise)
+    return cast(column, UnicodeText) if column is not None else null()
+
+
+def _not_deleted(model):
+    return func.coalesce(model.IsDeleted if hasattr(model, "IsDeleted") else 0, 0) == 0
+
+
+# (model name, category, url prefix, primary key, not-deleted filter, searched columns,
+#  title_en, title_ar, description_en, description_ar, image)
+_SEARCH_SOURCES = [
+    ("FAQ", "FAQ", "/faq", FAQ.FAQID, FAQ.IsDelete == False,
+     [FAQ.QuestionEn, FAQ.AnswerEn, FAQ.QuestionAr, FAQ.AnswerAr],
+     FAQ.QuestionEn, FAQ.QuestionAr, FAQ.AnswerEn, FAQ.AnswerAr, None),
+    ("DatasetInfo", "Metadata", "/datasets", DatasetInfo.DatasetID, DatasetInfo.IsDeleted == False,
+     [DatasetInfo.Name, DatasetInfo.Title, DatasetInfo.NameAr, DatasetInfo.TitleAr,
+      DatasetInfo.description, DatasetInfo.descriptionAr, DatasetInfo.Keywords],
+     DatasetInfo.Name, DatasetInfo.NameAr, DatasetInfo.description, DatasetInfo.descriptionAr, DatasetInfo.img),
+    ("MetadataInfo", "Metadata", "/metadata", MetadataInfo.MetadataID, MetadataInfo.IsDeleted == False,
+     [MetadataInfo.Name, MetadataInfo.Title, MetadataInfo.NameAr, MetadataInfo.TitleAr,
+      MetadataInfo.description, MetadataInfo.descriptionAr],
+     MetadataInfo.Name, MetadataInfo.NameAr, MetadataInfo.description, MetadataInfo.descriptionAr, None),
+    ("News", "News", "/news", News.NewsID, _not_deleted(News),
+     [News.TitleEn, News.DescriptionEn, News.TitleAr, News.DescriptionAr],
+     News.TitleEn, News.TitleAr, News.DescriptionEn, News.DescriptionAr, News.ImagePath),
+    ("Product", "Product", "/products", Product.ProductID, _not_deleted(Product),
+     [Product.NameEn, Product.DescriptionEn, Product.NameAr, Product.DescriptionAr],
+     Product.NameEn, Product.NameAr, Product.DescriptionEn, Product.DescriptionAr, Product.ImagePath),
+    ("Projects", "Projects", "/projects", Projects.ProjectID, _not_deleted(Projects),
+     [Projects.NameEn, Projects.DescriptionEn, Projects.NameAr, Projects.DescriptionAr],
+     Projects.NameEn, Projects.NameAr, Projects.DescriptionEn, Projects.DescriptionAr, Projects.ImagePath),
+    ("ProjectDetails", "ProjectDetails", "/project-details", ProjectDetails.ProjectDetailID, _not_deleted(ProjectDetails),
+     [ProjectDetails.ServiceName, ProjectDetails.ServiceDescription],
+     None, None, None, None, None),
+    ("ManualGuide", "ManualGuide", "/manual-guides", ManualGuide.ManualGuideID, _not_deleted(ManualGuide),
+     [ManualGuide.NameEn, ManualGuide.DescriptionEn, ManualGuide.NameAr, ManualGuide.DescriptionAr],
+     ManualGuide.NameEn, ManualGuide.NameAr, ManualGuide.DescriptionEn, ManualGuide.DescriptionAr, None),
+    ("Video", "Video", "/videos", Video.VideoID, _not_deleted(Video),
+     [Video.TitleEn, Video.DescriptionEn, Video.TitleAr, Video.DescriptionAr],
+     Video.TitleEn, Video.TitleAr, Video.DescriptionEn, Video.DescriptionAr, Video.ImagePath),
+]
+
+
+def _search_cache_key(func, namespace="", *, request=None, response=None, args, kwargs):
+    # Results depend on the lowercased query (keywords and highlighting are
+    # case-insensitive), the page and the base URL of the image links; the
+    # session is not part of the key
+    key = f"{kwargs['base_url']}|{kwargs['query'].lower()}|{kwargs['skip']}|{kwargs['limit']}"
+    return f"{namespace}:{hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()}"
+
+
+# Popular terms repeat; a short TTL keeps new content showing up quickly.
+# Called with keyword arguments only (see _search_cache_key).
+@cache(expire=30, namespace="search", key_builder=_search_cache_key)
+def global_search(db: Session, query: str, base_url: str, skip=0, limit=10):
 
     keywords = extract_keywords(query)
+    # Full-text only indexes whole words; a query with no usable keyword
+    # falls back to a substring LIKE on the raw text
+    fulltext = bool(keywords) and get_settings().SEARCH_FULLTEXT
     if not keywords:
         keywords = [query.lower()]
 
-    results = []
-
-    def add(model_name, category, url, en_title, ar_title, en_desc, ar_desc, image):
-        results.append({
-            "model": model_name,
-            "category": category,
-            "url": url,
-            "title_en": highlight_keywords(en_title or "", keywords),
-            "title_ar": highlight_keywords(ar_title or "", keywords),
-            "description_en": highlight_keywords(en_desc or "", keywords),
-            "description_ar": highlight_keywords(ar_desc or "", keywords),
-            "image": build_image_url(request, image)
-        })
-
-    # ============================
-    # Search FAQ
-    # ============================
-    faq_cols = [
-        FAQ.QuestionEn, FAQ.AnswerEn,
-        FAQ.QuestionAr, FAQ.AnswerAr
-    ]
-
-    faq_items = (
-        db.query(FAQ)
-        .filter(
-            FAQ.IsDelete == 0,
-            build_search_filter(faq_cols, keywords)
-        )
-        .order_by(FAQ.FAQID.desc())      # 🔥 MSSQL FIX
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-
-    for i in faq_items:
-        add("FAQ", "FAQ", f"/faq/{i.FAQID}",
-            i.QuestionEn, i.QuestionAr, i.AnswerEn, i.AnswerAr, None)
-
-    # ============================
-    # DatasetInfo
-    # ============================
-    dataset_cols = [
-        DatasetInfo.Name, DatasetInfo.Title,
-        DatasetInfo.NameAr, DatasetInfo.TitleAr,
-        DatasetInfo.description, DatasetInfo.descriptionAr,
-        DatasetInfo.Keywords
-    ]
-
-    dataset_items = (
-        db.query(DatasetInfo)
-        .filter(
-            DatasetInfo.IsDeleted == 0,
-            build_search_filter(dataset_cols, keywords)
-        )
-        .order_by(DatasetInfo.DatasetID.desc())   # 🔥 MSSQL FIX
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-
-    for d in dataset_items:
-        add("DatasetInfo", "Metadata", f"/datasets/{d.DatasetID}",
-            d.Name, d.NameAr, d.description, d.descriptionAr, d.img)
-
-    # ============================
-    # MetadataInfo
-    # ============================
-    meta_cols = [
-        MetadataInfo.Name, MetadataInfo.Title,
-        MetadataInfo.NameAr, MetadataInfo.TitleAr,
-        MetadataInfo.description, MetadataInfo.descriptionAr
-    ]
-
-    meta_items = (
-        db.query(MetadataInfo)
-        .filter(
-            MetadataInfo.IsDeleted == 0,
-            build_search_filter(meta_cols, keywords)
-        )
-        .order_by(MetadataInfo.MetadataID.desc())   # 🔥 MSSQL FIX
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-
-    for m in meta_items:
-        add("MetadataInfo", "Metadata", f"/metadata/{m.MetadataID}",
-            m.Name, m.NameAr, m.description, m.descriptionAr ,image = None)
-
-    # ============================
-    # GENERIC SEARCH MODEL FUNCTION
-    # ============================
-    def search_model(model, cols, id_name, url_path, image_field):
-        pk = get_primary_key(model)
-
-        items = (
-            db.query(model)
-            .filter(
-                func.coalesce(
-                    model.IsDeleted if hasattr(model, "IsDeleted") else 0, 0
-                ) == 0,
-                build_search_filter(cols, keywords)
+    # One page per source, as before, but all sources in a single UNION ALL
+    # round trip; "src" keeps the results grouped in source order
+    branches = []
+    for src, (_, _, _, pk, not_deleted, cols, title_en, title_ar, desc_en, desc_ar, image) in enumerate(_SEARCH_SOURCES):
+        page = (
+            select(
+                literal(src).label("src"),
+                pk.label("id"),
+                _text(title_en).label("title_en"),
+                _text(title_ar).label("title_ar"),
+                _text(desc_en).label("desc_en"),
+                _text(desc_ar).label("desc_ar"),
+                _text(image).label("image"),
             )
+            .where(not_deleted, build_search_filter(cols, keywords, fulltext))
             .order_by(pk.desc())    # 🔥 MSSQL FIX
             .offset(skip)
             .limit(limit)
-            .all()
+            .subquery()
         )
+        branches.append(select(*page.c))
 
-        for i in items:
-            add(
-                model.__name__,
-                model.__name__,
-                f"{url_path}/{getattr(i, id_name)}",
-                getattr(i, "TitleEn", None) or getattr(i, "NameEn", None),
-                getattr(i, "TitleAr", None) or getattr(i, "NameAr", None),
-                getattr(i, "DescriptionEn", None),
-                getattr(i, "DescriptionAr", None),
-                getattr(i, image_field, None) if image_field else None
-            )
+    combined = union_all(*branches).subquery()
+    rows = db.execute(select(combined).order_by(combined.c.src, combined.c.id.desc())).all()
+
+    # Four highlighted fields per row, highlighted in one batch
+    highlighted = iter(highlight_keywords(
+        [text for row in rows for text in (row.title_en, row.title_ar, row.desc_en, row.desc_ar)],
+        keywords
+    ))
 
-    # ============================
-    # Apply to all other tables
-    # ============================
-    search_model(
-        News,
-        [News.TitleEn, News.DescriptionEn, News.TitleAr, News.DescriptionAr],
-        "NewsID", "/news", "ImagePath"
-    )
-
-    search_model(
-        Product,
-        [Product.NameEn, Product.DescriptionEn, Product.NameAr, Product.DescriptionAr],
-        "ProductID", "/products", "ImagePath"
-    )
-
-    search_model(
-        Projects,
-        [Projects.NameEn, Projects.DescriptionEn, Projects.NameAr, Projects.DescriptionAr],
-        "ProjectID", "/projects", "ImagePath"
-    )
-
-    search_model(
-        ProjectDetails,
-        [ProjectDetails.ServiceName, ProjectDetails.ServiceDescription],
-        "ProjectDetailID", "/project-details", "ImageUrl"
-    )
-
-    search_model(
-        ManualGuide,
-        [ManualGuide.NameEn, ManualGuide.DescriptionEn, ManualGuide.NameAr, ManualGuide.DescriptionAr],
-        "ManualGuideID", "/manual-guides", "ImageUrl"
-    )
-
-    search_model(
-        Video,
-        [Video.TitleEn, Video.DescriptionEn, Video.TitleAr, Video.DescriptionAr],
-        "VideoID", "/videos", "ImagePath"
-    )
+    results = []
+    for row in rows:
+        model_name, category, url_prefix = _SEARCH_SOURCES[row.src][:3]
+        results.append({
+            "model": model_name,
+            "category": category,
+            "url": f"{url_prefix}/{row.id}",
+            "title_en": next(highlighted),
+            "title_ar": next(highlighted),
+            "description_en": next(highlighted),
+            "description_ar": next(highlighted),
+            "image": build_image_url(base_url, row.image)
+        })
 
     return results
 
@@ -250,7 +207,7 @@ def global_search(db: Session, query: str, request: Request, skip=0, limit=10):
 # Search Endpoint
 # ==========================================
 @router.get("/")
-def search(
+async def search(
     request: Request,
     query: str = Query(...),
     page: int = 1,
@@ -262,7 +219,9 @@ def search(
             return error_response("Query cannot be empty.", "الاستعلام فارغ.")
 
         skip = (page - 1) * limit
-        results = global_search(db, query, request, skip, limit)
+        results = await global_search(
+            db=db, query=query, base_url=public_base_url(request), skip=skip, limit=limit
+        )
 
         if not results:
             return error_response("No results found.", "لا توجد نتائج.", "NOT_FOUND")
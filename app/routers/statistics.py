@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, Request
+from fastapi_cache.decorator import cache
 from sqlalchemy.orm import Session
 from app.database import SessionLocal
 from app.utils.response import success_response 
@@ -13,9 +14,16 @@ from sqlalchemy import func
 router = APIRouter(prefix="/statistics", tags=["Statistics"])
 
 
+def _summary_cache_key(func, namespace="", *, request=None, response=None, args, kwargs):
+    # Same summary for every caller
+    return f"{namespace}:summary"
+
 
 # get the statistics for the home page like the total numbers of the users or visitors 
+# Six COUNTs (two DISTINCT, one over a join) that change slowly: computed at most
+# once per 5 minutes per cache backend
 @router.get("")
+@cache(expire=300, namespace="statistics", key_builder=_summary_cache_key)
 async def get_summary(request: Request, db: Session = Depends(get_db)):
     users_count = db.query(User).count()
     visitors_count = db.query(Visitor).count()
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Body
-from sqlalchemy import func , or_
+from sqlalchemy import func , insert, or_
 from datetime import datetime
 from typing import Optional, List
 from app.models.users import User
@@ -7,10 +7,10 @@ from app.models.survey import UsersFeedbackQuestion, QuestionChoice, UsersFeedba
 from app.schemas.survey import BulkAnswerRequest
 from app.auth.jwt_bearer import JWTBearer
 from app.utils.response import success_response, error_response
-from sqlalchemy.orm import Session, joinedload 
+from sqlalchemy.orm import Session, joinedload, selectinload
 from app.database import get_db
 from app.utils.utils import clean_text , _resolve_identity  
-from app.utils.utils import get_current_user ,require_admin
+from app.utils.utils import get_current_user ,require_admin, CurrentUser
 
 
 
@@ -144,7 +144,8 @@ def get_questions(db: Session = Depends(get_db)):
         .options(
             joinedload(UsersFeedbackQuestion.category),
             joinedload(UsersFeedbackQuestion.type),
-            joinedload(UsersFeedbackQuestion.choices),
+            # A collection: a separate IN query instead of repeating every question row per choice
+            selectinload(UsersFeedbackQuestion.choices),
         )
         .all()
     )
@@ -212,9 +213,32 @@ def submit_bulk_answers(
     if not payload.answers:
         raise HTTPException(status_code=400, detail="No answers provided.")
 
-    db_answers = []
+    # Normalize ChoiceId into a list
+    items = [
+        (item, [item.ChoiceId] if isinstance(item.ChoiceId, int) else (item.ChoiceId or []))
+        for item in payload.answers
+    ]
+
+    # Questions and choices are validated in two queries for the whole payload
+    question_ids = {item.QuestionId for item, _ in items}
+    valid_question_ids = {
+        row.Id for row in db.query(UsersFeedbackQuestion.Id).filter(
+            UsersFeedbackQuestion.Id.in_(question_ids),
+            UsersFeedbackQuestion.IsDeleted == False
+        )
+    }
+    choice_ids = {choice_id for _, choices in items for choice_id in choices}
+    valid_choices = set(
+        db.query(QuestionChoice.QuestionId, QuestionChoice.Id).filter(
+            QuestionChoice.QuestionId.in_(question_ids),
+            QuestionChoice.Id.in_(choice_ids)
+        ).all()
+    ) if choice_ids else set()
+
+    now = datetime.utcnow()
+    rows = []
 
-    for item in payload.answers:
+    for item, choices in items:
         # Validate: either ChoiceId or TextAnswer must be provided
         if not item.ChoiceId and not item.TextAnswer:
             raise HTTPException(
@@ -223,76 +247,59 @@ def submit_bulk_answers(
             )
 
         # Validate QuestionId exists
-        question_exists = db.query(UsersFeedbackQuestion).filter(
-            UsersFeedbackQuestion.Id == item.QuestionId,
-            UsersFeedbackQuestion.IsDeleted == False
-        ).first()
-        if not question_exists:
+        if item.QuestionId not in valid_question_ids:
             raise HTTPException(status_code=400, detail=f"Invalid QuestionId: {item.QuestionId}")
 
-        # Normalize ChoiceId into a list
-        choices = [item.ChoiceId] if isinstance(item.ChoiceId, int) else (item.ChoiceId or [])
-
         # Validate all choices exist for this question
-        if choices:
-            valid_choices = db.query(QuestionChoice.Id).filter(
-                QuestionChoice.QuestionId == item.QuestionId,
-                QuestionChoice.Id.in_(choices)
-            ).all()
-            valid_choice_ids = {c.Id for c in valid_choices}
-            invalid = set(choices) - valid_choice_ids
-            if invalid:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Invalid ChoiceId(s) {list(invalid)} for QuestionId {item.QuestionId}"
-                )
+        invalid = {choice_id for choice_id in choices if (item.QuestionId, choice_id) not in valid_choices}
+        if invalid:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid ChoiceId(s) {list(invalid)} for QuestionId {item.QuestionId}"
+            )
 
         # Insert one record per choice
         for choice_id in choices:
-            answer = UsersFeedbackAnswer(
-                VisitorId=visitor_id,
-                QuestionId=item.QuestionId,
-                ChoiceId=choice_id,
-                please_specify=item.TextAnswer if item.TextAnswer else None,
-                CreatedAt=datetime.utcnow(),
-                CreatedByUserID=user_id if user_id else None,
-            )
-            db_answers.append(answer)
+            rows.append({
+                "VisitorId": visitor_id,
+                "QuestionId": item.QuestionId,
+                "ChoiceId": choice_id,
+                "please_specify": item.TextAnswer if item.TextAnswer else None,
+                "CreatedAt": now,
+                "CreatedByUserID": user_id if user_id else None,
+            })
 
         # If no ChoiceId but there is TextAnswer → insert text-only record
         if not choices and item.TextAnswer:
-            answer = UsersFeedbackAnswer(
-                VisitorId=visitor_id,
-                QuestionId=item.QuestionId,
-                ChoiceId=None,
-                please_specify=item.TextAnswer,
-                CreatedAt=datetime.utcnow(),
-                CreatedByUserID=user_id if user_id else None,
-            )
-            db_answers.append(answer)
+            rows.append({
+                "VisitorId": visitor_id,
+                "QuestionId": item.QuestionId,
+                "ChoiceId": None,
+                "please_specify": item.TextAnswer,
+                "CreatedAt": now,
+                "CreatedByUserID": user_id if user_id else None,
+            })
 
-    # Save to DB
-    db.add_all(db_answers)
+    # Save to DB: one bulk INSERT ... OUTPUT inserted.*, rows in payload order
+    # (no per-row refresh SELECT); read them before commit expires them
+    db_answers = db.scalars(
+        insert(UsersFeedbackAnswer).returning(UsersFeedbackAnswer, sort_by_parameter_order=True),
+        rows
+    ).all()
+    data = [
+        {
+            "Id": a.Id,
+            "QuestionId": a.QuestionId,
+            "ChoiceId": a.ChoiceId,
+            "TextAnswer": a.please_specify,
+            "VisitorId": a.VisitorId,
+            "UserId": a.CreatedByUserID,
+        }
+        for a in db_answers
+    ]
     db.commit()
 
-    # Refresh IDs
-    for answer in db_answers:
-        db.refresh(answer)
-
-    return success_response(
-        "Bulk answers submitted",data=
-        [
-            {
-                "Id": a.Id,
-                "QuestionId": a.QuestionId,
-                "ChoiceId": a.ChoiceId,
-                "TextAnswer": a.please_specify,
-                "VisitorId": a.VisitorId,
-                "UserId": a.CreatedByUserID,
-            }
-            for a in db_answers
-        ]
-    )
+    return success_response("Bulk answers submitted", data=data)
 
 
 
@@ -304,7 +311,7 @@ def submit_bulk_answers(
 @router.get("/admin/stats")
 def get_survey_statistics(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Admin: summary of full survey statistics"""
     require_admin(current_user)
@@ -380,7 +387,7 @@ def get_survey_statistics(
 @router.get("/admin/responses")
 def get_all_user_responses(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     require_admin(current_user)
 
@@ -429,7 +436,7 @@ def get_all_user_responses(
 def get_response_details(
     email: Optional[str] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     require_admin(current_user)
 
@@ -477,7 +484,7 @@ def get_response_details(
 @router.get("/admin/export")
 def export_survey_report(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Admin: export full survey dataset (users only)"""
     require_admin(current_user)
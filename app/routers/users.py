@@ -16,32 +16,31 @@ from app.schemas.users import (
     UserUpdate,
     UserStatusUpdate,
 )
-from passlib.context import CryptContext
+from app.auth.passwords import hash_password
 from typing import Optional
 from datetime import datetime
 import os
 from dotenv import load_dotenv
 from app.utils.response import success_response, error_response
+from app.settings import get_settings, public_base_url
 from app.database import get_db
-from app.utils.utils import get_current_user, extract_email_domain
+from app.utils.utils import get_current_user, extract_email_domain, invalidate_cached_user
 from app.auth.tokens import create_verification_token
-from app.utils.email import send_email, send_domain_refused_email
+from app.utils.email import queue_email
 from app.utils.paths import static_path
+from app.routers.auth import invalidate_registration_lookups
 from app.models.dashboard import DownloadRequest, DownloadItem, BibliographyDownloadRequest
 
 load_dotenv()
-FRONTEND_BASE_URL = os.getenv("FRONTEND_BASE_URL", "")
+FRONTEND_BASE_URL = get_settings().FRONTEND_BASE_URL
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 
 def _photo_url(request: Request, photo_path: Optional[str]) -> Optional[str]:
     if not photo_path:
         return None
-    base_url = str(request.base_url).rstrip("/")
-    return f"{base_url}/{photo_path.lstrip('/')}"
+    return f"{public_base_url(request)}/{photo_path.lstrip('/')}"
 
 
 def _serialize_user(user: User, request: Request ,download_items=None) -> dict:
@@ -256,6 +255,7 @@ def update_user(user_update: UserUpdate, user_id: int = Path(...), current=Depen
     db_user.UpdatedByUserID = current.UserID
 
     db.commit()
+    invalidate_cached_user(user_id)
     db.refresh(db_user)
 
     user_dict = db_user.__dict__.copy()
@@ -281,7 +281,7 @@ def admin_create_user(
     if existing_user:
         return error_response("Email already registered","هذا البريد مسجل بالفعل" ,"EMAIL_EXISTS")
 
-    hashed_password = pwd_context.hash(user.Password)
+    hashed_password = hash_password(user.Password)
 
     new_user = User(
         FirstName=user.FirstName,
@@ -312,7 +312,7 @@ def admin_create_user(
     db.refresh(new_user)
 
     token = create_verification_token(user.Email, expires_minutes=None)
-    base_frontend = FRONTEND_BASE_URL or str(request.base_url).rstrip("/")
+    base_frontend = FRONTEND_BASE_URL or public_base_url(request)
     verify_url = f"{base_frontend}/auth/verify-email?token={token}"
     email_body = f"""
     <div style="font-family:'Segoe UI',Arial,sans-serif;color:#1f2937;max-width:520px;margin:auto;">
@@ -328,7 +328,7 @@ def admin_create_user(
         <p style="margin-top:32px;">Best regards,<br/>NGD Team</p>
     </div>
     """
-    background_tasks.add_task(send_email, "Verify your NGD account", email_body, user.Email)
+    background_tasks.add_task(queue_email, "send_email", "Verify your NGD account", email_body, user.Email)
 
     return success_response("User created and invitation sent.","تم انشاء الحساب بنجاح وارسال بريد التحقق", _serialize_user(new_user, request))
 
@@ -351,6 +351,7 @@ def update_user_status(
     user.UpdatedAt = datetime.utcnow()
     user.UpdatedByUserID = current.UserID
     db.commit()
+    invalidate_cached_user(user_id)
 
     return success_response("User active upated successfully"," تم تنشيط المستخدم بنجاح" ,{"user_id": user_id, "is_active": user.IsActive})
 
@@ -383,6 +384,7 @@ def upload_profile_photo(user_id: int, file: UploadFile = File(...), current=Dep
     user.UpdatedAt = datetime.utcnow()
     user.UpdatedByUserID = current.UserID
     db.commit()
+    invalidate_cached_user(user_id)
 
     return success_response("Photo uploaded successfully","تم تعديل الصورة بنجاح" ,{"photo_url": user.PhotoPath})
 
@@ -400,6 +402,7 @@ def delete_user(user_id: int, current=Depends(get_current_user), db: Session = D
 
     user.IsDeleted = True
     db.commit()
+    invalidate_cached_user(user_id)
 
     return success_response("User marked as deleted successfully", "تم حذف المستخدم بنجاح")
 
@@ -433,6 +436,8 @@ def approve_user(user_id: int, current=Depends(get_current_user), db: Session =
             db.add(Domain(Domain=domain_value, Type="accept"))
 
     db.commit()
+    invalidate_cached_user(user_id)
+    invalidate_registration_lookups()
 
     return success_response(f"User ID {user_id} approved and activated successfully.", "تم الموافقه على المستخدم وتفعيله بنجاح",{"user_id": user_id})
 
@@ -463,7 +468,7 @@ def refuse_user(
         else:
             db.add(Domain(Domain=domain_value, Type="refused"))
 
-        background_tasks.add_task(send_domain_refused_email, user.Email, domain_value)
+        background_tasks.add_task(queue_email, "send_domain_refused_email", user.Email, domain_value)
 
     user.IsApproved = False
     user.IsActive = False
@@ -472,5 +477,7 @@ def refuse_user(
     user.UpdatedByUserID = current.UserID
 
     db.commit()
+    invalidate_cached_user(user_id)
+    invalidate_registration_lookups()
 
     return success_response("User refused and notified.", "تم رفض المستخدم واشعاره" ,{"user_id": user_id})
@@ -1,16 +1,16 @@
-import os, shutil
+import os
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request
 from sqlalchemy.orm import Session
 from datetime import datetime
 from typing import Optional
-from urllib.parse import quote
 from app.database import get_db
 from app.models.videos import Video
-from app.models.users import User
 from app.auth.jwt_bearer import JWTBearer
 from app.utils.response import success_response, error_response
-from app.utils.utils import get_current_user , require_admin
-from app.utils.paths import static_path, static_file_paths, normalize_static_subpath
+from app.settings import public_base_url
+from app.utils.utils import get_current_user , require_admin, CurrentUser
+from app.utils.paths import static_path, static_file_paths, normalize_static_subpath, url_path
+from app.utils.uploads import unique_filename, copy_upload
 
 router = APIRouter(prefix="/videos", tags=["Videos"])
 
@@ -21,9 +21,8 @@ def build_image_url(request: Request, image_path: Optional[str]) -> Optional[str
     relative_path = normalize_static_subpath(image_path) if image_path else ""
     if not relative_path:
         return None
-    base_url = str(request.base_url).rstrip("/")
-    encoded = quote(relative_path, safe="/")
-    return f"{base_url}/static/{encoded}"
+    base_url = public_base_url(request)
+    return f"{base_url}/static/{url_path(relative_path)}"
 
 
 # ---------- Public ----------
@@ -56,15 +55,14 @@ def create_video(
     DescriptionAr: Optional[str] = Form(None),
     image: UploadFile = File(None),
     db: Session = Depends(get_db),
-    user: User = Depends(require_admin)
+    user: CurrentUser = Depends(require_admin)
 ):
     image_path = None
     if image:
-        filename = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{image.filename}"
+        filename = unique_filename(image.filename)
         save_path, image_path = static_file_paths(filename, "videos")
 
-        with open(save_path, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
+        copy_upload(image.file, save_path)
     else:
         image_path = None
 
@@ -106,7 +104,7 @@ def update_video(
     DescriptionAr: Optional[str] = Form(None),
     image: UploadFile = File(None),
     db: Session = Depends(get_db),
-    user: User = Depends(require_admin)
+    user: CurrentUser = Depends(require_admin)
 ):
     db_video = db.query(Video).filter(Video.VideoID == video_id).first()
     if not db_video:
@@ -129,10 +127,9 @@ def update_video(
                 os.remove(old_path)
 
         # 2️⃣ Save new image
-        filename = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{image.filename}"
+        filename = unique_filename(image.filename)
         save_path, relative_path = static_file_paths(filename, "videos")
-        with open(save_path, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
+        copy_upload(image.file, save_path)
 
         # 3️⃣ Update the database field
         db_video.ImagePath = relative_path
@@ -161,7 +158,7 @@ def update_video(
 
 
 @router.delete("/{video_id}")
-def delete_video(video_id: int, db: Session = Depends(get_db), user: User = Depends(require_admin)):
+def delete_video(video_id: int, db: Session = Depends(get_db), user: CurrentUser = Depends(require_admin)):
     db_video = db.query(Video).filter(Video.VideoID == video_id, Video.IsDeleted == False).first()
     if not db_video:
         return error_response("Video not found", error_code="VIDEO_NOT_FOUND")
@@ -81,5 +81,5 @@ async def auto_track(visitor: VisitorCreate, request: Request, db: Session = Dep
         "IPAddress": ip_address,
         "SessionID": session_id,
         "CountryID": visitor.CountryID,
-        "VisitAt": now.isoformat()
+        "VisitAt": now
     })
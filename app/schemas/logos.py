@@ -2,7 +2,7 @@ from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
 
-VALID_CATEGORIES = {"partner", "benefits"}
+VALID_CATEGORIES = frozenset({"partner", "benefits"})
 
 class LogoBase(BaseModel):
     NameEn: Optional[str]
@@ -22,7 +22,7 @@ class LogoCreate(BaseModel):
 
     def validate_category(self):
         if self.Category.lower() not in VALID_CATEGORIES:
-            raise ValueError(f"Invalid Category. Allowed values: {VALID_CATEGORIES}")
+            raise ValueError(f"Invalid Category. Allowed values: {sorted(VALID_CATEGORIES)}")
 
 class LogoUpdate(BaseModel):
     NameEn: Optional[str] = None
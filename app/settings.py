@@ -0,0 +1,43 @@
+# settings.py
+import os
+from functools import lru_cache
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_file=os.path.join(os.path.dirname(__file__), ".env"),
+        extra="ignore",
+    )
+
+    # Public origin of this API, used to build absolute static/photo URLs
+    PUBLIC_BASE_URL: str = ""
+    # Origin of the frontend, used in email links
+    FRONTEND_BASE_URL: str = ""
+    # CDN that origin-pulls /static; when set, static asset URLs point at it
+    CDN_BASE_URL: str = ""
+    # Global search uses CONTAINS against SQL Server full-text indexes instead
+    # of LIKE '%term%'; only enable once the indexes exist
+    SEARCH_FULLTEXT: bool = False
+
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
+
+def public_base_url(request) -> str:
+    """Configured PUBLIC_BASE_URL, or the request's base URL when it is not set."""
+    base_url = get_settings().PUBLIC_BASE_URL
+    if base_url:
+        return base_url.rstrip("/")
+    return str(request.base_url).rstrip("/")
+
+
+def static_base_url(request) -> str:
+    """Base URL for files under /static: CDN_BASE_URL if set, else this API's /static."""
+    cdn_url = get_settings().CDN_BASE_URL
+    if cdn_url:
+        return cdn_url.rstrip("/")
+    return f"{public_base_url(request)}/static"
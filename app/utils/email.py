@@ -1,4 +1,5 @@
 from fastapi import BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -7,6 +8,7 @@ from email import encoders
 import os
 from typing import Iterable, Optional
 from dotenv import load_dotenv
+from jinja2 import Environment, FileSystemLoader
 from app.utils.paths import static_path
 
 # Load environment variables
@@ -26,6 +28,9 @@ SYSTEM_EMAIL = os.getenv("SYSTEM_EMAIL", SMTP_USERNAME)
 MAIL_TLS = os.getenv("MAIL_TLS", "True").lower() == "true"
 MAIL_SSL = os.getenv("MAIL_SSL", "False").lower() == "true"
 
+# When set, emails are handed to the arq worker (app/workers/email.py) through Redis
+REDIS_URL = os.getenv("REDIS_URL")
+
 # -------------------------
 # File Directories
 # -------------------------
@@ -33,6 +38,21 @@ CONTACT_DIR = static_path("contact", ensure=True)
 REQUEST_DIR = static_path("requests", ensure=True)
 ADMIN_UPLOAD_DIR = static_path("requests", "reply", ensure=True)
 
+# -------------------------
+# Email Templates
+# -------------------------
+# Compiled once and kept for the life of the process; values are HTML-escaped
+_template_env = Environment(
+    loader=FileSystemLoader(os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates", "emails")),
+    autoescape=True,
+    auto_reload=False,
+    cache_size=-1,
+)
+
+
+def render_email_template(name: str, **context) -> str:
+    return _template_env.get_template(name).render(**context)
+
 # -------------------------
 # Email Helper Functions
 # -------------------------
@@ -131,12 +151,12 @@ def send_request_email(request_number: str, category: str, user_email: str, firs
             "You can reply to this email if you have additional information to share."
         ]
     )
-    background_tasks.add_task(send_email, subject, body, user_email)
+    background_tasks.add_task(queue_email, "send_email", subject, body, user_email)
 
     # also notify system admin
     admin_subject = f"New Request Submitted: {request_number}"
     admin_body = f"<p>A new request has been submitted for category <b>{category}</b>.</p>"
-    background_tasks.add_task(send_email, admin_subject, admin_body, SYSTEM_EMAIL)
+    background_tasks.add_task(queue_email, "send_email", admin_subject, admin_body, SYSTEM_EMAIL)
 
 def send_reply_email(request_number: str, user_email: str, reply_body: str, background_tasks: BackgroundTasks):
     subject = f"NGD - Response to your request {request_number}"
@@ -149,7 +169,7 @@ def send_reply_email(request_number: str, user_email: str, reply_body: str, back
             "If you have further questions, just reply to this email."
         ]
     )
-    background_tasks.add_task(send_email, subject, body, user_email)
+    background_tasks.add_task(queue_email, "send_email", subject, body, user_email)
 
 
 def send_domain_refused_email(user_email: str, domain: str):
@@ -171,6 +191,50 @@ def send_domain_refused_email(user_email: str, domain: str):
 
 
 
+# -------------------------
+# Email Queue
+# -------------------------
+# Jobs the worker knows how to run, keyed by job name
+EMAIL_JOBS = {
+    "send_email": send_email,
+    "send_email_with_attachment": send_email_with_attachment,
+    "send_domain_refused_email": send_domain_refused_email,
+}
+
+_email_queue = None
+
+
+async def init_email_queue():
+    """Open the arq Redis pool once at startup if REDIS_URL is configured."""
+    global _email_queue
+    if REDIS_URL and _email_queue is None:
+        from arq import create_pool
+        from arq.connections import RedisSettings
+        _email_queue = await create_pool(RedisSettings.from_dsn(REDIS_URL))
+
+
+async def close_email_queue():
+    global _email_queue
+    if _email_queue is not None:
+        await _email_queue.close()
+        _email_queue = None
+
+
+async def queue_email(job_name: str, *args):
+    """
+    Hand an email job to the worker queue, or send it in-process when no
+    queue is configured. Meant to be scheduled with BackgroundTasks so the
+    response never waits on Redis or SMTP.
+    """
+    if _email_queue is not None:
+        await _email_queue.enqueue_job(job_name, *args)
+        return
+    await run_in_threadpool(EMAIL_JOBS[job_name], *args)
+
+
+
+
+
 # ----------------------------------------------
 ##################################################3
 # test with   mailersend for test
@@ -0,0 +1,58 @@
+# utils/faq_cache.py
+import threading
+from typing import List, NamedTuple, Optional, Tuple
+
+from cachetools import TTLCache
+from sqlalchemy.orm import Session
+
+from app.models.faq import FAQ
+
+
+class FAQIndex(NamedTuple):
+    total: int                          # non-deleted FAQs in scope, any language
+    keys: List[str]                     # normalize_question(question), one per item
+    items: List[Tuple[int, str, str]]   # (FAQID, question, answer) in the requested language
+
+
+# FAQ search index per (lang, category); dropped on any FAQ write, and on TTL
+# so other workers pick up changes too
+_FAQ_CACHE = TTLCache(maxsize=64, ttl=300)
+_FAQ_LOCK = threading.Lock()
+
+
+def normalize_question(text: str) -> str:
+    """Lowercased, sorted tokens: fuzz.ratio on these equals token_sort_ratio."""
+    return " ".join(sorted(text.lower().split()))
+
+
+def _build_index(db: Session, lang: str, category_id: Optional[int]) -> FAQIndex:
+    if lang == "ar":
+        columns = (FAQ.FAQID, FAQ.QuestionAr, FAQ.AnswerAr)
+    else:
+        columns = (FAQ.FAQID, FAQ.QuestionEn, FAQ.AnswerEn)
+
+    query = db.query(*columns).filter(FAQ.IsDelete == False)
+    if category_id:
+        query = query.filter(FAQ.CategoryID == category_id)
+    rows = query.all()
+
+    items = [(faq_id, question, answer or "") for faq_id, question, answer in rows if question]
+    return FAQIndex(
+        total=len(rows),
+        keys=[normalize_question(question) for _, question, _ in items],
+        items=items,
+    )
+
+
+def get_faq_index(db: Session, lang: str, category_id: Optional[int] = None) -> FAQIndex:
+    key = (lang, category_id or None)
+    with _FAQ_LOCK:
+        index = _FAQ_CACHE.get(key)
+        if index is None:
+            index = _FAQ_CACHE[key] = _build_index(db, lang, category_id)
+    return index
+
+
+def invalidate_faq_cache():
+    with _FAQ_LOCK:
+        _FAQ_CACHE.clear()
@@ -0,0 +1,43 @@
+# utils/pagination.py
+from typing import Optional, Tuple
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def keyset_page(
+    db: AsyncSession,
+    stmt,
+    created_col,
+    key_col,
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Tuple[list, Optional[str]]:
+    """
+    One page of stmt (a select of a single entity), newest first on
+    (created_col, key_col), with NULL created_col rows last.
+
+    The cursor is the key of the last row already sent; its created_col is
+    read back in the same statement, so the comparison uses the stored
+    DATETIME value rather than a client round-tripped one. The next page
+    seeks past it in the index instead of skipping OFFSET rows.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    Raises ValueError for a malformed cursor.
+    """
+    if cursor:
+        key = int(cursor)
+        created = select(created_col).where(key_col == key).scalar_subquery()
+        stmt = stmt.where(or_(
+            created_col < created,
+            and_(created_col == created, key_col < key),
+            # NULLs sort after every date, and among themselves by key
+            and_(created_col.is_(None), or_(created.is_not(None), key_col < key)),
+        ))
+
+    # One extra row tells us whether another page exists
+    rows = (await db.scalars(stmt.order_by(created_col.desc(), key_col.desc()).limit(limit + 1))).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, str(getattr(rows[-1], key_col.key))
@@ -1,5 +1,7 @@
 import os
+import re
 from typing import Tuple
+from urllib.parse import quote
 
 # _CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 # _APP_DIR = os.path.dirname(_CURRENT_DIR)
@@ -25,6 +27,40 @@ def _normalize_parts(parts):
                 yield chunk
 
 
+# Stored paths that are already full URLs (e.g. files moved to object storage)
+# are returned as-is instead of being put under /static
+ABSOLUTE_URL_PREFIXES = ("http://", "https://")
+
+# Anything quote() would escape in a single path segment / a whole relative path
+_NEEDS_QUOTE_RE = re.compile(r"[^A-Za-z0-9_.~-]")
+_PATH_NEEDS_QUOTE_RE = re.compile(r"[^A-Za-z0-9_.~/-]")
+
+
+def url_filename(path: str) -> str:
+    """
+    URL-quoted basename of a stored file path, for building static URLs.
+
+    Plain str slicing instead of os.path.basename, and quote() is skipped for
+    names that are already URL-safe (the common case for generated names).
+    """
+    name = path[max(path.rfind("/"), path.rfind("\\")) + 1:]
+    if _NEEDS_QUOTE_RE.search(name) is None:
+        return name
+    return quote(name)
+
+
+def url_path(path: str) -> str:
+    """
+    URL-quoted form of a relative static path (slashes kept).
+
+    Uploads are stored under safe_filename/content-hashed names, so the path
+    written at upload time is normally URL-safe already and quote() is skipped.
+    """
+    if _PATH_NEEDS_QUOTE_RE.search(path) is None:
+        return path
+    return quote(path)
+
+
 def static_path(*parts: str, ensure: bool = False) -> str:
     """
     Build an absolute path inside the configured static root.
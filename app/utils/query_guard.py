@@ -0,0 +1,49 @@
+# utils/query_guard.py
+import logging
+import os
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+APP_ENV = os.getenv("APP_ENV", "production").lower()
+# Same SELECT issued this many times in one request is reported as N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "3"))
+
+logger = logging.getLogger("app.query_guard")
+logger.setLevel(logging.WARNING)
+
+_request_queries: ContextVar[Optional[Counter]] = ContextVar("request_queries", default=None)
+
+
+def _count_select(conn, cursor, statement, parameters, context, executemany):
+    counts = _request_queries.get()
+    if counts is not None and statement.lstrip()[:6].upper() == "SELECT":
+        counts[statement] += 1
+
+
+def install_query_guard(app, *engines):
+    """
+    Dev only: warn when a request repeats the same SELECT (lazy loads in a loop).
+
+    Pass every engine the routers use; for an AsyncEngine the listener goes on
+    its sync_engine, where cursor events fire.
+    """
+    for engine in engines:
+        event.listen(getattr(engine, "sync_engine", engine), "before_cursor_execute", _count_select)
+
+    @app.middleware("http")
+    async def n_plus_one_guard(request, call_next):
+        counts = Counter()
+        token = _request_queries.set(counts)
+        try:
+            return await call_next(request)
+        finally:
+            _request_queries.reset(token)
+            for statement, n in counts.items():
+                if n >= N_PLUS_ONE_THRESHOLD:
+                    logger.warning(
+                        "Possible N+1 on %s %s: same query ran %d times\n%s",
+                        request.method, request.url.path, n, statement,
+                    )
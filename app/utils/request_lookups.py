@@ -0,0 +1,51 @@
+# utils/request_lookups.py
+from cachetools import TTLCache
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.lookups import Category, Format, Projection, RequestInformation, Status, ComplaintScreen
+from app.schemas.lookups import (
+    CategorySchema, FormatSchema, ProjectionSchema,
+    RequestInformationSchema, StatusSchema, ComplaintScreenSchema
+)
+
+# Request lookups are reference data: keep the built payload and the category
+# names (for email subjects) in memory. No lock: the handlers are async and a
+# concurrent miss just builds the same payload twice.
+_LOOKUPS_CACHE = TTLCache(maxsize=1, ttl=300)
+
+
+async def _build_request_lookups(db: AsyncSession) -> dict:
+    # All categories in one query: the public list skips deleted ones, the name
+    # map keeps them so older requests still resolve
+    categories = (await db.scalars(select(Category))).all()
+    projections = (await db.scalars(select(Projection))).all()
+    formats = (await db.scalars(select(Format).where(Format.IsDeleted == 0))).all()
+    request_info = (await db.scalars(select(RequestInformation).where(RequestInformation.IsDeleted == 0))).all()
+    statuses = (await db.scalars(select(Status))).all()
+    complaint_screens = (await db.scalars(select(ComplaintScreen).where(ComplaintScreen.IsDeleted == 0))).all()
+
+    return {
+        "payload": {
+            "categories": [CategorySchema.from_orm(c).dict() for c in categories if c.IsDeleted == 0],
+            "projections": [ProjectionSchema.from_orm(p).dict() for p in projections],
+            "formats": [FormatSchema.from_orm(f).dict() for f in formats],
+            "request_information": [RequestInformationSchema.from_orm(r).dict() for r in request_info],
+            "statuses": [StatusSchema.from_orm(s).dict() for s in statuses],
+            "complaint_screens": [ComplaintScreenSchema.from_orm(cs).dict() for cs in complaint_screens],
+        },
+        "category_names": {c.Id: c.Name for c in categories},
+        "projection_ids": frozenset(p.Id for p in projections),
+    }
+
+
+async def get_request_lookups(db: AsyncSession) -> dict:
+    cached = _LOOKUPS_CACHE.get("lookups")
+    if cached is None:
+        cached = _LOOKUPS_CACHE["lookups"] = await _build_request_lookups(db)
+    return cached
+
+
+def invalidate_request_lookups():
+    """Drop the cached request lookups so the next call reloads them."""
+    _LOOKUPS_CACHE.clear()
@@ -1,4 +1,10 @@
 # utils/response.py
+import hashlib
+from operator import attrgetter
+
+import orjson
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
 
 def success_response(message_en: str, message_ar: str = None, data: dict = None):
     """
@@ -13,6 +19,17 @@ def success_response(message_en: str, message_ar: str = None, data: dict = None)
     }
 
 
+def row_to_dict(fields):
+    """
+    Converter copying the given attributes off an ORM row (or column row) into
+    a dict, for response schemas whose fields are model columns. The database
+    already typed the values, so list endpoints skip per-row pydantic validation.
+    """
+    fields = tuple(fields)
+    values = attrgetter(*fields) if len(fields) > 1 else (lambda row: (getattr(row, fields[0]),))
+    return lambda row: dict(zip(fields, values(row)))
+
+
 def error_response(message_en: str, message_ar: str = None, error_code: str = None):
     """
     Standard error response with both English and Arabic messages.
@@ -23,3 +40,25 @@ def error_response(message_en: str, message_ar: str = None, error_code: str = No
         "message_ar": message_ar or message_en,
         "error_code": error_code
     }
+
+
+def etag_response(request: Request, payload) -> Response:
+    """
+    Serialize a response payload once and tag it with a hash of the body.
+    Returns 304 Not Modified (no body) when the client's If-None-Match
+    already holds that tag.
+    """
+    # orjson handles dicts, lists, datetime and date natively; jsonable_encoder
+    # only runs for anything else (ORM objects, Decimal, ...)
+    body = orjson.dumps(payload, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+    etag = f'"{hashlib.md5(body, usedforsecurity=False).hexdigest()}"'
+    # no-cache: clients may store it but must revalidate, which is what makes the 304 possible
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+
+    return Response(body, media_type="application/json", headers=headers)
@@ -0,0 +1,16 @@
+# utils/static_files.py
+from fastapi.staticfiles import StaticFiles
+
+# Folders whose files are stored under content-hashed names and never rewritten
+IMMUTABLE_PREFIXES = ("contact/", "Logos/", "manual_guides/", "News/", "dataset/", "Products/")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles that lets browsers and the CDN cache immutable uploads for a year."""
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if self.get_path(scope).replace("\\", "/").startswith(IMMUTABLE_PREFIXES):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
@@ -0,0 +1,225 @@
+# utils/uploads.py
+import hashlib
+import os
+import secrets
+import shutil
+import string
+import tempfile
+import time
+from typing import AsyncIterator, BinaryIO, Optional
+
+import aiofiles
+from fastapi.concurrency import run_in_threadpool
+
+from app.database import SessionLocal
+
+# Read/write uploads in 1 MiB chunks so large files never sit in memory at once
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_SIZE = 50 * 1024 * 1024
+
+
+class _FilenameTable(dict):
+    # str.translate table: characters outside [A-Za-z0-9._-] become "_"
+    def __missing__(self, codepoint):
+        return "_"
+
+
+_SAFE_FILENAME_TABLE = _FilenameTable(
+    (ord(c), c) for c in string.ascii_letters + string.digits + "._-"
+)
+
+
+def safe_filename(filename: str) -> str:
+    """Strip any client-supplied directories and replace unsafe characters."""
+    return os.path.basename(filename or "").translate(_SAFE_FILENAME_TABLE)
+
+
+def _content_hash():
+    # blake2b is considerably faster than sha256 and 96 bits is plenty for naming
+    return hashlib.blake2b(digest_size=12)
+
+
+def hashed_filename(data: bytes, filename: str) -> str:
+    """Content-addressed name, so a stored file never changes and can be cached forever."""
+    digest = _content_hash()
+    digest.update(data)
+    return f"{digest.hexdigest()}_{safe_filename(filename)}"
+
+
+def unique_filename(filename: str) -> str:
+    """Random name keeping only the extension, for files that get replaced or deleted."""
+    return f"{secrets.token_urlsafe(12)}{os.path.splitext(safe_filename(filename))[1]}"
+
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload exceeds the allowed size."""
+
+
+class EmptyUpload(ValueError):
+    """Raised when a raw-body upload carries no data."""
+
+
+def _on_disk(fileobj: BinaryIO) -> bool:
+    # UploadFile.file is a SpooledTemporaryFile; only once it has rolled over
+    # is there a real fd to hand to sendfile (fileno() would force a rollover)
+    return hasattr(os, "sendfile") and getattr(fileobj, "_rolled", False)
+
+
+def copy_upload(fileobj: BinaryIO, destination: str) -> int:
+    """
+    Blocking copy of an upload to destination, returning the bytes written.
+
+    Uploads already spooled to disk are copied in the kernel (copy_file_range,
+    else os.sendfile), so the data never passes through Python; in-memory ones
+    use 1 MiB copyfileobj chunks.
+    """
+    with open(destination, "wb") as out:
+        if not _on_disk(fileobj):
+            shutil.copyfileobj(fileobj, out, UPLOAD_CHUNK_SIZE)
+            return out.tell()
+
+        src = fileobj.fileno()
+        offset = fileobj.tell()
+        written = 0
+        # copy_file_range can reflink or copy server-side (btrfs, xfs, NFS);
+        # older kernels refuse it across filesystems, so sendfile finishes the copy.
+        # Both write at the destination's file position, so the switch is seamless
+        if hasattr(os, "copy_file_range"):
+            try:
+                while copied := os.copy_file_range(src, out.fileno(), UPLOAD_CHUNK_SIZE * 16, offset + written):
+                    written += copied
+                return written
+            except OSError:
+                pass
+        while sent := os.sendfile(out.fileno(), src, offset + written, UPLOAD_CHUNK_SIZE * 16):
+            written += sent
+        return written
+
+
+def cleanup_file(path: str, attempts: int = 3, delay: float = 0.5) -> None:
+    """
+    Remove a file that is no longer referenced; meant to run as a background
+    task. Transient OS errors (e.g. the file is briefly locked) are retried.
+    """
+    for attempt in range(attempts):
+        try:
+            os.remove(path)
+            return
+        except FileNotFoundError:
+            return
+        except OSError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(delay * 2 ** attempt)
+
+
+def cleanup_unreferenced(column, value: str, path: Optional[str] = None) -> None:
+    """
+    Background task: remove the file stored as value in column (found at path
+    when the column holds a static-relative path) unless a row still points at it.
+
+    Uploads are content-addressed, so an identical upload may reuse the file
+    at any moment; the reference check runs here, right before the delete,
+    rather than during the request. Opens its own session, since the request's
+    is closed by the time background tasks run.
+    """
+    with SessionLocal() as db:
+        if db.query(column).filter(column == value).first() is not None:
+            return
+    cleanup_file(path or value)
+
+
+def store_upload(
+    fileobj: BinaryIO,
+    directory: str,
+    filename: str,
+    max_size: Optional[int] = MAX_UPLOAD_SIZE
+) -> str:
+    """
+    Stream a file into directory under its content-addressed name
+    (see hashed_filename), hashing chunks as they are written.
+
+    Returns the stored filename. Re-uploading identical content reuses the
+    existing file instead of writing a second copy. Blocking; call it from a
+    sync endpoint or through run_in_threadpool.
+    """
+    digest = _content_hash()
+    written = 0
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := fileobj.read(UPLOAD_CHUNK_SIZE):
+                written += len(chunk)
+                if max_size and written > max_size:
+                    raise UploadTooLarge(f"Upload exceeds {max_size} bytes")
+                digest.update(chunk)
+                out.write(chunk)
+
+        name = _finalize_stored(tmp_path, directory, digest, filename)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return name
+
+
+async def store_stream(
+    chunks: AsyncIterator[bytes],
+    directory: str,
+    filename: str,
+    max_size: Optional[int] = MAX_UPLOAD_SIZE
+) -> str:
+    """
+    Async counterpart of store_upload for a raw request body
+    (request.stream()): chunks are hashed and written as they arrive, so the
+    file reaches disk in one pass with no spooled multipart copy. The blocking
+    file-system steps (temp file, final rename) run in the threadpool.
+
+    Returns the stored filename. Raises EmptyUpload for an empty body.
+    """
+    digest = _content_hash()
+    written = 0
+    buffer = bytearray()
+    tmp_path = await run_in_threadpool(_new_temp_file, directory)
+    try:
+        async with aiofiles.open(tmp_path, "wb") as out:
+            async for chunk in chunks:
+                written += len(chunk)
+                if max_size and written > max_size:
+                    raise UploadTooLarge(f"Upload exceeds {max_size} bytes")
+                digest.update(chunk)
+                buffer += chunk
+                # Network chunks are small; write in UPLOAD_CHUNK_SIZE batches
+                if len(buffer) >= UPLOAD_CHUNK_SIZE:
+                    await out.write(bytes(buffer))
+                    buffer.clear()
+            if buffer:
+                await out.write(bytes(buffer))
+        if not written:
+            raise EmptyUpload("Upload is empty")
+
+        name = await run_in_threadpool(_finalize_stored, tmp_path, directory, digest, filename)
+    except BaseException:
+        # Synchronous on purpose: it must still run when the request is cancelled
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return name
+
+
+def _new_temp_file(directory: str) -> str:
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    os.close(fd)
+    return tmp_path
+
+
+def _finalize_stored(tmp_path: str, directory: str, digest, filename: str) -> str:
+    # Move the finished temp file to its content-addressed name, or drop it
+    # when identical content is already stored
+    name = f"{digest.hexdigest()}_{safe_filename(filename)}"
+    destination = os.path.join(directory, name)
+    if os.path.exists(destination):
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, destination)
+    return name
@@ -3,18 +3,76 @@ from app.database import get_db
 from app.models.users import User
 from sqlalchemy.orm import Session
 from fastapi import Depends, HTTPException, status, Request
-from typing import Optional
+from typing import Any, Optional
+from dataclasses import make_dataclass
+from cachetools import TTLCache
+import threading
 
 
 
+def _column_type(column):
+    try:
+        return Optional[column.type.python_type]
+    except NotImplementedError:
+        return Any
+
+
+# What get_current_user returns: a frozen copy of the User columns, with no
+# relationships and no session. Assigning to it raises instead of being lost;
+# load the User from the session to change it.
+CurrentUser = make_dataclass(
+    "CurrentUser",
+    [(column.key, _column_type(column)) for column in User.__table__.columns],
+    frozen=True,
+    slots=True,
+)
+
+
+# short-lived cache of authenticated users so each request skips the Users lookup.
+# Per process: invalidate_cached_user only reaches this worker, so on the
+# others a deactivated or demoted user keeps access until the entry expires (30 s)
+_USER_CACHE = TTLCache(maxsize=10_000, ttl=30)
+_USER_CACHE_LOCK = threading.Lock()
+_USER_FIELDS = tuple(column.key for column in User.__table__.columns)
+
+
+def _snapshot_user(user: User) -> CurrentUser:
+    # plain copy of the columns, safe to share across requests and sessions
+    return CurrentUser(**{field: getattr(user, field) for field in _USER_FIELDS})
+
+
+def invalidate_cached_user(user_id: Optional[int] = None):
+    """
+    Forget the cached user (or every cached user) after it was changed.
+    Only clears this process's cache; other workers catch up on TTL expiry.
+    """
+    with _USER_CACHE_LOCK:
+        if user_id is None:
+            _USER_CACHE.clear()
+        else:
+            _USER_CACHE.pop(user_id, None)
 
 
 # this method is used for get the current user that is login 
-def get_current_user(payload: dict = Depends(JWTBearer()), db: Session = Depends(get_db)) -> User:
-    user = db.query(User).filter(User.UserID == payload["user_id"]).first()
+def get_current_user(payload: dict = Depends(JWTBearer()), db: Session = Depends(get_db)) -> CurrentUser:
+    """
+    Return the logged in user as a read-only snapshot of its columns,
+    cached per process for up to 30 seconds.
+    """
+    user_id = payload["user_id"]
+    with _USER_CACHE_LOCK:
+        cached = _USER_CACHE.get(user_id)
+    if cached is not None:
+        return cached
+
+    user = db.query(User).filter(User.UserID == user_id).first()
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-    return user
+
+    cached = _snapshot_user(user)
+    with _USER_CACHE_LOCK:
+        _USER_CACHE[user_id] = cached
+    return cached
 
 
 def get_optional_user(request: Request, db: Session = Depends(get_db)) -> Optional[User]:
@@ -31,7 +89,7 @@ def get_optional_user(request: Request, db: Session = Depends(get_db)) -> Option
     return None
 
 # this is method is used for check the user is Admin or not with Role 1 for Super Admins 
-def require_admin(user: User = Depends(get_current_user)) -> User:
+def require_admin(user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
     if user.RoleID != 1:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admins only")
     return user
@@ -55,17 +113,16 @@ def _resolve_identity(request: Request, payload: Optional[dict]):
 
 
 
+# Common invisible Unicode spaces, deleted in one str.translate pass
+_INVISIBLE_CHARS_TABLE = str.maketrans("", "", "\u00A0\u200B\u200C\u200D\u200E\u200F\u202C\uFEFF")
+
+
 # this method is used for making clean text for arabic words that if have any spaces or something like this 
 def clean_text(value: str) -> str:
     if not value:
         return value
-    # Trim spaces
-    cleaned = value.strip()
-    # Remove common invisible Unicode spaces
-    bad_chars = ["\u00A0", "\u200B", "\u200C", "\u200D", "\u200E", "\u200F", "\u202C", "\uFEFF"]
-    for bad in bad_chars:
-        cleaned = cleaned.replace(bad, "")
-    return cleaned
+    # Trim spaces, then remove common invisible Unicode spaces
+    return value.strip().translate(_INVISIBLE_CHARS_TABLE)
 
 
 def extract_email_domain(email: str) -> Optional[str]:
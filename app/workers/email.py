@@ -0,0 +1,37 @@
+# app/workers/email.py
+"""
+arq worker that delivers queued emails outside the API process.
+
+Run it next to the API with:
+    arq app.workers.email.WorkerSettings
+"""
+import asyncio
+from arq import Retry
+from arq.worker import func
+from arq.connections import RedisSettings
+from app.utils.email import EMAIL_JOBS, REDIS_URL
+
+MAX_TRIES = 5
+
+
+def _make_job(name: str, sender):
+    async def job(ctx, *args):
+        try:
+            await asyncio.to_thread(sender, *args)
+        except Exception as exc:
+            # Exponential backoff for transient SMTP failures: 10s, 20s, 40s, ...
+            raise Retry(defer=10 * 2 ** (ctx["job_try"] - 1)) from exc
+
+    # arq names jobs after __qualname__ by default, which would be
+    # "_make_job.<locals>.job" for all of them; register under the name queue_email uses
+    return func(job, name=name)
+
+
+class WorkerSettings:
+    functions = [_make_job(name, sender) for name, sender in EMAIL_JOBS.items()]
+    redis_settings = RedisSettings.from_dsn(REDIS_URL or "redis://localhost:6379")
+    max_tries = MAX_TRIES
+
+
+# Every job queue_email can enqueue must have a worker function under the same name
+assert {f.name for f in WorkerSettings.functions} == set(EMAIL_JOBS), "email worker job names out of sync"